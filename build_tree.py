@@ -1,44 +1,72 @@
 import os
-import json
+from storage import open_backend
+from utils import human_readable_size
 
-def build_directory_tree(json_file):
-    with open(json_file, 'r') as f:
-        data = json.load(f)
+def build_directory_tree(inventory_file, include_files=False):
+    """Builds the directory tree of an inventory in any of the storage formats.
+
+    A directory node is {"count", "size", "children"}, where count and size
+    cover everything below the directory and children maps names to nodes.
+    The tree is built from the backend's directory rollup alone, so it costs
+    the number of directories, not files. With include_files, every file is
+    also added as a {"size"} node, which reads every record.
+    """
+    backend = open_backend(inventory_file)
+    backend.load()
+    totals = backend.recursive_directory_totals()
 
     tree = {}
-    for item in data:
-        full_path = item.get('full_path')
-        if not full_path:
-            continue
-
-        path_parts = os.path.normpath(full_path).split(os.sep)
-        current = tree
-        for part in path_parts:
-            if part not in current:
-                current[part] = {}
-            current = current[part]
+    nodes = {}
+    def directory_node(path):
+        node = nodes.get(path)
+        if node is None:
+            parent, name = os.path.split(path)
+            siblings = tree if not name or parent == path else directory_node(parent)["children"]
+            stats = totals.get(path, {"count": 0, "size": 0})
+            node = nodes[path] = siblings[name or path] = {"count": stats["count"], "size": stats["size"], "children": {}}
+        return node
+
+    for directory in totals:
+        directory_node(directory)
+
+    if include_files:
+        for item in backend.iter_records():
+            full_path = item.get('full_path')
+            if not full_path:
+                continue
+            directory_node(os.path.dirname(full_path))["children"][os.path.basename(full_path)] = {"size": item["file_size_bytes"]}
 
     return tree
 
+def describe(name, node):
+    if "children" in node:
+        # Roots such as "/" or "C:\\" already end with a separator
+        label = name if name.endswith(("/", "\\")) else name + "/"
+        return f"{label} ({node['count']} file(s), {human_readable_size(node['size'])})"
+    return f"{name} ({human_readable_size(node['size'])})"
+
 def print_tree(node, prefix=""):
     for name, child in node.items():
-        print(f"{prefix}├── {name}/")
-        print_tree(child, prefix + "│   ")
+        print(f"{prefix}├── {describe(name, child)}")
+        if "children" in child:
+            print_tree(child["children"], prefix + "│   ")
 
 def save_tree_as_markdown(node, file_path, level=0):
     with open(file_path, "w") as f:
         def write_node(node, level):
             for name, child in node.items():
-                f.write(f"{'  ' * level}- {name}/\n")
-                write_node(child, level + 1)
+                f.write(f"{'  ' * level}- {describe(name, child)}\n")
+                if "children" in child:
+                    write_node(child["children"], level + 1)
         write_node(node, level)
 
 if __name__ == "__main__":
     import sys
-    if len(sys.argv) != 2:
-        print("Usage: python build_tree.py <json_file>")
+    arguments = [argument for argument in sys.argv[1:] if argument != "--files"]
+    if len(arguments) != 1:
+        print("Usage: python build_tree.py <inventory_file> [--files]")
     else:
-        tree = build_directory_tree(sys.argv[1])
+        tree = build_directory_tree(arguments[0], include_files="--files" in sys.argv[1:])
         print_tree(tree)
 
         # Save the tree structure as a Markdown file
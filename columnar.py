@@ -0,0 +1,992 @@
+# This is version Point2N Branch, developed by arrfour
+
+import os
+import zlib
+import bisect
+import itertools
+import datetime
+from array import array
+from collections import OrderedDict
+
+# Most recently used directory paths (and path ids) PathStore keeps cached
+PATH_CACHE_SIZE = 4096
+
+# Characters that separate path components on this platform
+SEPARATORS = os.sep + (os.altsep or "")
+
+# Outcomes of ColumnarInventory.upsert, also the keys of the merge counts the backends report
+ADDED = "added"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+
+# Key of the merge counts for records a rescan found deleted
+REMOVED = "removed"
+
+# Searches narrow their candidates by intersecting trigram postings until this few rows are left to check
+VERIFY_CANDIDATES = 64
+
+# Fields every inventory record carries, in the order they are written; anything else goes into the per-row extras
+RECORD_FIELDS = ["file_name", "file_extension", "file_size_bytes", "last_modified_timestamp", "last_modified_iso", "full_path", "hostname"]
+
+class StringTable:
+    """Interns repeated strings (hosts, extensions, directories) and hands out small integer ids."""
+
+    def __init__(self):
+        self.values = []
+        self.ids = {}
+
+    def intern(self, value):
+        """Returns the id of value, adding it to the table if it is new."""
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = len(self.values)
+            self.ids[value] = string_id
+            self.values.append(value)
+        return string_id
+
+    def get(self, value):
+        """Returns the id of value, or None if the table has never seen it."""
+        return self.ids.get(value)
+
+    def __getitem__(self, string_id):
+        return self.values[string_id]
+
+    def __len__(self):
+        return len(self.values)
+
+class PathStore:
+    """Directory paths stored as a trie of (parent id, last component) nodes.
+
+    Every directory is one node pointing at its parent, and each path component
+    is interned once, so a deep hierarchy costs a few bytes per directory instead
+    of one full path string each. Nodes without a parent are the roots of the
+    trie ("/", "C:\\", "\\\\server\\share\\", or any path that does not split
+    cleanly) and hold their whole path. Parents are always added before their
+    children, so a node's id is larger than its parent's.
+
+    The store works like a StringTable of directory paths: intern(), get() and
+    indexing by id take and return full paths. Full paths are rebuilt by joining
+    the components up to the root, with the most recent ones cached. Because
+    parents precede children, every directory under a prefix is found in one
+    pass over the parent ids without rebuilding each stored path.
+    """
+
+    def __init__(self, components=None, parents=None, component_ids=None):
+        self.components = StringTable() if components is None else components
+        self.parents = array("i") if parents is None else parents
+        self.component_ids = array("I") if component_ids is None else component_ids
+        self.roots = None
+        self.children = None
+        self.paths = OrderedDict()
+        self.ids = OrderedDict()
+
+    def __len__(self):
+        return len(self.parents)
+
+    def __iter__(self):
+        for node in range(len(self.parents)):
+            yield self[node]
+
+    @staticmethod
+    def split(path):
+        """Returns (parent path, last component), or (None, path) if path is a root of the trie."""
+        head, sep, tail = path.rpartition(os.sep)
+        if (head and tail and head[-1] not in SEPARATORS and (os.altsep is None or os.altsep not in tail)
+                and (os.name != 'nt' or os.path.splitdrive(head)[1])):
+            # The common case, where os.path.join(head, tail) is just head + os.sep + tail
+            return head, tail
+        head, tail = os.path.split(path)
+        if not tail or os.path.join(head, tail) != path:
+            return None, path
+        return head, tail
+
+    def index(self):
+        """Returns the {parent id << 32 | component id: node} lookup, building it (and the roots) on first use."""
+        if self.children is None:
+            self.roots = {}
+            self.children = {}
+            for node, (parent, component_id) in enumerate(zip(self.parents, self.component_ids)):
+                if parent < 0:
+                    self.roots[self.components[component_id]] = node
+                else:
+                    self.children[parent << 32 | component_id] = node
+        return self.children
+
+    @staticmethod
+    def remember(cache, key, value):
+        cache[key] = value
+        if len(cache) > PATH_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    def cached(self, cache, key):
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+    def intern(self, path):
+        """Returns the id of a directory path, adding it (and any missing parents) if it is new."""
+        node = self.cached(self.ids, path)
+        if node is not None:
+            return node
+        children = self.index()
+        parent, component = self.split(path)
+        component_id = self.components.intern(component)
+        if parent is None:
+            node = self.roots.get(component)
+            if node is None:
+                node = self.roots[component] = self.add(-1, component_id)
+        else:
+            parent_id = self.intern(parent)
+            node = children.get(parent_id << 32 | component_id)
+            if node is None:
+                node = children[parent_id << 32 | component_id] = self.add(parent_id, component_id)
+        self.remember(self.ids, path, node)
+        return node
+
+    def add(self, parent_id, component_id):
+        self.parents.append(parent_id)
+        self.component_ids.append(component_id)
+        return len(self.parents) - 1
+
+    def get(self, path):
+        """Returns the id of a directory path, or None if the store has never seen it."""
+        node = self.cached(self.ids, path)
+        if node is not None:
+            return node
+        children = self.index()
+        parent, component = self.split(path)
+        if parent is None:
+            node = self.roots.get(component)
+        else:
+            parent_id = self.get(parent)
+            component_id = self.components.get(component)
+            if parent_id is None or component_id is None:
+                return None
+            node = children.get(parent_id << 32 | component_id)
+        if node is not None:
+            self.remember(self.ids, path, node)
+        return node
+
+    def __getitem__(self, node):
+        path = self.cached(self.paths, node)
+        if path is None:
+            # Walk up to the nearest cached ancestor (or the root), then join back down, caching each level
+            chain = []
+            current = node
+            while path is None:
+                parent = self.parents[current]
+                if parent < 0:
+                    path = self.components[self.component_ids[current]]
+                    self.remember(self.paths, current, path)
+                    break
+                chain.append(current)
+                path = self.cached(self.paths, parent)
+                current = parent
+            for current in reversed(chain):
+                path = os.path.join(path, self.components[self.component_ids[current]])
+                self.remember(self.paths, current, path)
+        return path
+
+    def root_of(self, node):
+        """Returns the id of the root a node hangs under."""
+        while self.parents[node] >= 0:
+            node = self.parents[node]
+        return node
+
+    def subtree(self, node):
+        """Returns the ids of node and of every directory below it."""
+        inside = bytearray(len(self.parents))
+        inside[node] = 1
+        found = [node]
+        for current in range(node + 1, len(self.parents)):
+            parent = self.parents[current]
+            if parent >= node and inside[parent]:
+                inside[current] = 1
+                found.append(current)
+        return found
+
+    def under_prefix(self, prefix):
+        """Returns the ids of every directory whose path, followed by a separator, starts with prefix.
+
+        A single pass in id order settles each directory from its parent: the
+        path itself is only rebuilt and compared for directories whose parent
+        lies on the way to prefix.
+        """
+        inside = bytearray(len(self.parents))
+        towards = bytearray(len(self.parents))
+        found = set()
+        for node, parent in enumerate(self.parents):
+            if parent >= 0 and inside[parent]:
+                inside[node] = 1
+                found.add(node)
+            elif parent < 0 or towards[parent]:
+                path = self[node]
+                if os.path.join(path, "").startswith(prefix):
+                    inside[node] = 1
+                    found.add(node)
+                elif prefix.startswith(path):
+                    towards[node] = 1
+        return found
+
+    def copy(self):
+        """Returns a store of the same directories with its own path caches and lookup index.
+
+        Reads reorder and evict the caches, so a store read from another thread
+        needs caches of its own. The component table is shared; it is only ever
+        appended to.
+        """
+        return PathStore(self.components, array("i", self.parents), array("I", self.component_ids))
+
+    def ancestors(self, nodes):
+        """Returns the given nodes together with all of their parents."""
+        found = set()
+        for node in nodes:
+            while node >= 0 and node not in found:
+                found.add(node)
+                node = self.parents[node]
+        return found
+
+class PathIndex:
+    """Hash index from (directory id, file name) to row, kept in one flat array of slots.
+
+    Open addressing with linear probing: each slot holds row + 1, or 0 when
+    empty, and the table stays at most half full. The key hash is a CRC-32 of
+    the name seeded with the directory id, so it is the same in every process
+    and the table can be written into a snapshot and mapped back unchanged.
+    The index reads the keys from the dir_ids and names columns it was given,
+    so those must be updated in place. At four bytes a slot it costs about a
+    tenth of a dict of (directory id, name) tuples.
+    """
+
+    def __init__(self, dir_ids, names, slots=None):
+        self.dir_ids = dir_ids
+        self.names = names
+        if slots is None:
+            self.rebuild()
+        else:
+            self.slots = slots
+            self.mask = len(slots) - 1
+
+    @staticmethod
+    def table_size(rows):
+        size = 8
+        while size < 2 * rows:
+            size *= 2
+        return size
+
+    @staticmethod
+    def key_hash(dir_id, name):
+        return zlib.crc32(name.encode("utf-8", "surrogateescape"), dir_id)
+
+    def rebuild(self, size=None):
+        self.slots = array("I", bytes(4 * (size or self.table_size(len(self.names)))))
+        self.mask = len(self.slots) - 1
+        for row, (dir_id, name) in enumerate(zip(self.dir_ids, self.names)):
+            self.insert(dir_id, name, row)
+
+    def insert(self, dir_id, name, row):
+        slot = self.key_hash(dir_id, name) & self.mask
+        while self.slots[slot]:
+            slot = (slot + 1) & self.mask
+        self.slots[slot] = row + 1
+
+    def slot_of(self, dir_id, name):
+        """Returns the slot holding the key, or None."""
+        slots = self.slots
+        slot = self.key_hash(dir_id, name) & self.mask
+        while slots[slot]:
+            row = slots[slot] - 1
+            if self.dir_ids[row] == dir_id and self.names[row] == name:
+                return slot
+            slot = (slot + 1) & self.mask
+        return None
+
+    def find(self, dir_id, name):
+        """Returns the row holding the key, or None."""
+        slot = self.slot_of(dir_id, name)
+        return None if slot is None else self.slots[slot] - 1
+
+    def add(self, dir_id, name, row):
+        """Indexes a row just appended to the columns."""
+        if 2 * len(self.names) > len(self.slots):
+            self.rebuild(2 * len(self.slots))
+        else:
+            self.insert(dir_id, name, row)
+
+    def move(self, dir_id, name, new_row):
+        """Points the key at the row its record was moved to."""
+        self.slots[self.slot_of(dir_id, name)] = new_row + 1
+
+    def remove(self, dir_id, name):
+        """Drops the key, shifting later entries of its probe run back so lookups still find them."""
+        slots = self.slots
+        hole = self.slot_of(dir_id, name)
+        slot = hole
+        while True:
+            slot = (slot + 1) & self.mask
+            if not slots[slot]:
+                break
+            row = slots[slot] - 1
+            home = self.key_hash(self.dir_ids[row], self.names[row]) & self.mask
+            # The entry can fill the hole unless its home slot lies cyclically in (hole, slot]
+            if (slot - home) & self.mask >= (slot - hole) & self.mask:
+                slots[hole] = slots[slot]
+                hole = slot
+        slots[hole] = 0
+
+def trigrams(text):
+    """Returns the set of three-character substrings of text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class TrigramIndex:
+    """Substring index over file names: for each trigram of a lowercased name, the rows holding it.
+
+    The postings are kept in compressed sparse row form (sorted trigram keys,
+    one offset per key into a flat array of rows), which a snapshot stores as
+    is and maps back, so the index is not rebuilt on every start. Rows
+    appended since go into per-trigram arrays on top, and entries of removed
+    or moved rows are marked dead rather than cut out of the flat array;
+    once those changes add up to a quarter of the postings they are merged
+    back in. A search intersects the shortest postings of the term's
+    trigrams and then checks the remaining candidates against their names.
+    """
+
+    def __init__(self, names, keys=None, offsets=None, rows=None):
+        self.names = names
+        if keys is None:
+            self.rebuild()
+        else:
+            self.keys, self.offsets, self.rows = keys, offsets, rows
+            self.added = {}
+            self.dead = {}
+            self.changes = 0
+
+    def rebuild(self):
+        postings = {}
+        for row, name in enumerate(self.names):
+            for gram in trigrams(name.lower()):
+                rows = postings.get(gram)
+                if rows is None:
+                    rows = postings[gram] = []
+                rows.append(row)
+        self.keys = sorted(postings)
+        self.offsets = array("Q", [0])
+        self.rows = array("I")
+        for gram in self.keys:
+            self.rows.extend(postings[gram])
+            self.offsets.append(len(self.rows))
+        self.added = {}
+        self.dead = {}
+        self.changes = 0
+
+    def copy(self, names):
+        """Returns an index over names, a copy of the names this one covers, that later changes here do not affect."""
+        index = TrigramIndex(names, self.keys, self.offsets, self.rows)
+        index.added = {gram: array("I", rows) for gram, rows in self.added.items()}
+        index.dead = {gram: set(rows) for gram, rows in self.dead.items()}
+        index.changes = self.changes
+        return index
+
+    def base_range(self, gram):
+        """Returns the (start, end) of gram's postings in the flat rows array."""
+        position = bisect.bisect_left(self.keys, gram)
+        if position < len(self.keys) and self.keys[position] == gram:
+            return self.offsets[position], self.offsets[position + 1]
+        return 0, 0
+
+    def posting_size(self, gram):
+        start, end = self.base_range(gram)
+        return end - start + len(self.added.get(gram, ()))
+
+    def postings(self, gram):
+        """Yields the rows posted under gram; dead entries are included."""
+        start, end = self.base_range(gram)
+        return itertools.chain(self.rows[start:end], self.added.get(gram, ()))
+
+    def add(self, row, name):
+        """Posts a row that now holds name."""
+        for gram in trigrams(name.lower()):
+            dead = self.dead.get(gram)
+            if dead is not None and row in dead:
+                # The row's earlier entry under this trigram is valid again
+                dead.discard(row)
+                if not dead:
+                    del self.dead[gram]
+            else:
+                self.added.setdefault(gram, array("I")).append(row)
+            self.changes += 1
+
+    def remove(self, row, name):
+        """Marks the entries of a row that no longer holds name as dead."""
+        for gram in trigrams(name.lower()):
+            self.dead.setdefault(gram, set()).add(row)
+            self.changes += 1
+
+    def packed(self):
+        """Returns (keys, offsets, rows) with the added entries merged in and the dead ones dropped."""
+        if not self.added and not self.dead:
+            return self.keys, self.offsets, self.rows
+        keys = []
+        offsets = array("Q", [0])
+        rows = array("I")
+        for gram in sorted(set(self.keys).union(self.added)):
+            start = len(rows)
+            rows.extend(self.postings(gram))
+            dead = self.dead.get(gram)
+            if dead:
+                live = [row for row in rows[start:] if row not in dead]
+                del rows[start:]
+                rows.extend(live)
+            if len(rows) > start:
+                keys.append(gram)
+                offsets.append(len(rows))
+        return keys, offsets, rows
+
+    def search(self, term):
+        """Returns the rows, in order, whose lowercased name contains term; term must be lowercase and at least three characters."""
+        if self.changes > len(self.rows) // 4 + VERIFY_CANDIDATES:
+            self.keys, self.offsets, self.rows = self.packed()
+            self.added, self.dead, self.changes = {}, {}, 0
+        grams = sorted(trigrams(term), key=self.posting_size)
+        found = set(self.postings(grams[0]))
+        for gram in grams[1:]:
+            # Checking a few candidates directly is cheaper than walking a much longer posting list
+            if len(found) <= VERIFY_CANDIDATES or self.posting_size(gram) > 8 * len(found):
+                break
+            found.intersection_update(self.postings(gram))
+        names = self.names
+        return sorted(row for row in found if row < len(names) and term in names[row].lower())
+
+class SizeIndex:
+    """The rows ordered by size, largest first, for top-N queries.
+
+    The order is built once with a sort and then kept current lazily: a row
+    whose size changed, or that now holds another record, is marked dirty
+    instead of being moved in the order. Walking the order skips dirty rows
+    and rows past the end, and merges the dirty rows back in at their current
+    size. The order is sorted again once the dirty rows pass an eighth of it.
+    """
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.rebuild()
+
+    def rebuild(self):
+        self.rows = array("I", sorted(range(len(self.sizes)), key=self.sizes.__getitem__, reverse=True))
+        self.dirty = set()
+
+    def touch(self, row):
+        """Marks a row whose size changed, or that now holds another record."""
+        self.dirty.add(row)
+
+    def descending(self):
+        """Yields every row, largest file first."""
+        if len(self.dirty) > len(self.rows) // 8 + VERIFY_CANDIDATES:
+            self.rebuild()
+        sizes = self.sizes
+        count = len(sizes)
+        dirty = self.dirty
+        changed = sorted((row for row in dirty if row < count), key=sizes.__getitem__, reverse=True)
+        position = 0
+        for row in self.rows:
+            if row >= count or row in dirty:
+                continue
+            size = sizes[row]
+            while position < len(changed) and sizes[changed[position]] > size:
+                yield changed[position]
+                position += 1
+            yield row
+        yield from changed[position:]
+
+class DirectoryRows:
+    """The rows ordered by directory id, for finding the files of given directories.
+
+    Built once with a sort and kept current lazily like SizeIndex: a row that
+    was appended, or that now holds another record, is marked dirty. The rows
+    of a directory are one bisected run of the order, skipping dirty rows and
+    rows past the end, plus the dirty rows now in that directory. The order is
+    sorted again once the dirty rows pass an eighth of it.
+    """
+
+    def __init__(self, dir_ids):
+        self.dir_ids = dir_ids
+        self.rebuild()
+
+    def rebuild(self):
+        self.rows = array("I", sorted(range(len(self.dir_ids)), key=self.dir_ids.__getitem__))
+        self.keys = array("I", (self.dir_ids[row] for row in self.rows))
+        self.dirty = set()
+
+    def touch(self, row):
+        """Marks a row that was appended, or that now holds another record."""
+        self.dirty.add(row)
+
+    def rows_in(self, dir_ids):
+        """Returns the rows whose directory is in the set dir_ids."""
+        if len(self.dirty) > len(self.rows) // 8 + VERIFY_CANDIDATES:
+            self.rebuild()
+        current = self.dir_ids
+        count = len(current)
+        dirty = self.dirty
+        found = [row for row in dirty if row < count and current[row] in dir_ids]
+        for dir_id in dir_ids:
+            start = bisect.bisect_left(self.keys, dir_id)
+            end = bisect.bisect_right(self.keys, dir_id, start)
+            found.extend(row for row in self.rows[start:end] if row < count and row not in dirty)
+        return found
+
+class DirectoryRollup:
+    """File counts and bytes per directory, both directly in it and in its whole subtree.
+
+    Built with one pass over the rows and one over the directories from the
+    last id back (parents precede children in the PathStore), then kept
+    current on every change: a file added, removed or resized adjusts its
+    directory and each ancestor, which costs the depth of its path. The totals
+    of any directory are then read without touching the rows.
+    """
+
+    def __init__(self, directories, dir_ids, sizes):
+        self.directories = directories
+        self.rebuild(dir_ids, sizes)
+
+    def rebuild(self, dir_ids, sizes):
+        nodes = len(self.directories)
+        file_counts = array("q", bytes(8 * nodes))
+        file_sizes = array("q", bytes(8 * nodes))
+        for dir_id, size in zip(dir_ids, sizes):
+            file_counts[dir_id] += 1
+            file_sizes[dir_id] += size
+        total_counts = array("q", file_counts)
+        total_sizes = array("q", file_sizes)
+        children = {}
+        parents = self.directories.parents
+        for node in range(nodes - 1, -1, -1):
+            parent = parents[node]
+            if parent >= 0:
+                total_counts[parent] += total_counts[node]
+                total_sizes[parent] += total_sizes[node]
+                children.setdefault(parent, []).append(node)
+        self.file_counts, self.file_sizes = file_counts, file_sizes
+        self.total_counts, self.total_sizes = total_counts, total_sizes
+        self.children = children
+        self.known = nodes
+
+    def grow(self):
+        """Takes in the directories added to the PathStore since the rollup last looked."""
+        parents = self.directories.parents
+        for node in range(self.known, len(parents)):
+            for values in (self.file_counts, self.file_sizes, self.total_counts, self.total_sizes):
+                values.append(0)
+            if parents[node] >= 0:
+                self.children.setdefault(parents[node], []).append(node)
+        self.known = len(parents)
+
+    def add(self, dir_id, count, size):
+        """Adds count files holding size bytes to a directory and its ancestors; negative values remove them."""
+        if dir_id >= self.known:
+            self.grow()
+        self.file_counts[dir_id] += count
+        self.file_sizes[dir_id] += size
+        parents = self.directories.parents
+        node = dir_id
+        while node >= 0:
+            self.total_counts[node] += count
+            self.total_sizes[node] += size
+            node = parents[node]
+
+    def totals(self, node):
+        """Returns (files, bytes) in a directory and everything below it."""
+        if node >= self.known:
+            return 0, 0
+        return self.total_counts[node], self.total_sizes[node]
+
+    def subdirectories(self, node):
+        """Returns the directories directly below node that hold any files, at any depth."""
+        return [child for child in self.children.get(node, ()) if child < self.known and self.total_counts[child]]
+
+class SummaryTotals:
+    """Running totals for the dashboard, kept current as rows change.
+
+    Holds the total bytes, the files and bytes of each (host id, root
+    directory id) pair, and the row of the newest file. Only removing the
+    newest file, or making it older, loses track of it; it is then found
+    again with one pass on the next request.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.roots = {}
+        self.size = 0
+        self.groups = {}
+        for host_id, dir_id, size in zip(columns.host_ids, columns.dir_ids, columns.sizes):
+            self.count_in(host_id, dir_id, 1, size)
+        self.newest = None
+
+    def count_in(self, host_id, dir_id, count, size):
+        root = self.roots.get(dir_id)
+        if root is None:
+            root = self.roots[dir_id] = self.columns.directories.root_of(dir_id)
+        stats = self.groups.get((host_id, root))
+        if stats is None:
+            stats = self.groups[host_id, root] = [0, 0]
+        stats[0] += count
+        stats[1] += size
+        if not stats[0]:
+            del self.groups[host_id, root]
+        self.size += size
+
+    def added(self, row):
+        columns = self.columns
+        self.count_in(columns.host_ids[row], columns.dir_ids[row], 1, columns.sizes[row])
+        if self.newest is not None and columns.mtimes[row] > columns.mtimes[self.newest]:
+            self.newest = row
+
+    def updated(self, row, host_id, size, mtime):
+        """Accounts for a row that is about to be overwritten with a new host, size and modification time."""
+        columns = self.columns
+        dir_id = columns.dir_ids[row]
+        self.count_in(columns.host_ids[row], dir_id, -1, -columns.sizes[row])
+        self.count_in(host_id, dir_id, 1, size)
+        if row == self.newest:
+            if mtime < columns.mtimes[row]:
+                self.newest = None
+        elif self.newest is not None and mtime > columns.mtimes[self.newest]:
+            self.newest = row
+
+    def removed(self, row):
+        columns = self.columns
+        self.count_in(columns.host_ids[row], columns.dir_ids[row], -1, -columns.sizes[row])
+        if row == self.newest:
+            self.newest = None
+
+    def moved(self, old_row, new_row):
+        if old_row == self.newest:
+            self.newest = new_row
+
+    def newest_row(self):
+        mtimes = self.columns.mtimes
+        if self.newest is None and mtimes:
+            self.newest = max(range(len(mtimes)), key=mtimes.__getitem__)
+        return self.newest
+
+class ColumnarInventory:
+    """Inventory records stored column by column instead of as one dict per file.
+
+    Sizes and modification times live in typed arrays, hostnames and extensions
+    are interned once in string tables and directories once in a PathStore, all
+    referenced by id, and only the base name is kept per file, so full_path is
+    rebuilt from the directory trie on demand. last_modified_iso is derived from the timestamp.
+    Any other record fields (e.g. content_hash) are kept per row in `extras`.
+
+    The container is itself a read-only sequence of records: indexing or
+    iterating it builds plain record dicts, so existing callers keep working.
+    """
+
+    def __init__(self, records=None):
+        self.hosts = StringTable()
+        self.extensions = StringTable()
+        self.directories = PathStore()
+        self.names = []
+        self.sizes = array("q")
+        self.mtimes = array("d")
+        self.host_ids = array("I")
+        self.ext_ids = array("I")
+        self.dir_ids = array("I")
+        self.extras = {}
+        self.positions = None
+        self.trigrams = None
+        self.size_order = None
+        self.dir_rows = None
+        self.rollup = None
+        self.summary = None
+        if records is not None:
+            self.extend(records)
+
+    # Record view
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self.record(i) for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        return self.record(row)
+
+    def __iter__(self):
+        for row in range(len(self.names)):
+            yield self.record(row)
+
+    def full_path(self, row):
+        return os.path.join(self.directories[self.dir_ids[row]], self.names[row])
+
+    def record(self, row):
+        """Builds the record dict for one row."""
+        timestamp = self.mtimes[row]
+        record = {
+            "file_name": self.names[row],
+            "file_extension": self.extensions[self.ext_ids[row]],
+            "file_size_bytes": self.sizes[row],
+            "last_modified_timestamp": timestamp,
+            "last_modified_iso": datetime.datetime.fromtimestamp(timestamp).isoformat(),
+            "full_path": self.full_path(row),
+            "hostname": self.hosts[self.host_ids[row]]
+        }
+        extra = self.extras.get(row)
+        if extra:
+            record.update(extra)
+        return record
+
+    # Updates
+    def row_key(self, full_path):
+        """Returns the (directory id, name) key of a path, or None if its directory is unknown."""
+        dir_id = self.directories.get(os.path.dirname(full_path))
+        if dir_id is None:
+            return None
+        return dir_id, os.path.basename(full_path)
+
+    def position_index(self):
+        """Returns the PathIndex of the rows, building it on first use."""
+        if self.positions is None:
+            self.positions = PathIndex(self.dir_ids, self.names)
+        return self.positions
+
+    def trigram_index(self):
+        """Returns the TrigramIndex of the file names, building it on first use."""
+        if self.trigrams is None:
+            self.trigrams = TrigramIndex(self.names)
+        return self.trigrams
+
+    def search_names(self, term):
+        """Returns the rows whose file name contains term, ignoring case."""
+        term = term.lower()
+        if len(term) < 3:
+            # Too short to have a trigram: check every name
+            return [row for row, name in enumerate(self.names) if term in name.lower()]
+        return self.trigram_index().search(term)
+
+    def find(self, full_path):
+        """Returns the row holding full_path, or None."""
+        key = self.row_key(full_path)
+        return None if key is None else self.position_index().find(*key)
+
+    def encode(self, item):
+        full_path = item["full_path"]
+        extra = {key: value for key, value in item.items() if key not in RECORD_FIELDS}
+        return (
+            self.directories.intern(os.path.dirname(full_path)), os.path.basename(full_path),
+            item["file_size_bytes"], item["last_modified_timestamp"],
+            self.hosts.intern(item.get("hostname", "Unknown Host")),
+            self.extensions.intern(item.get("file_extension", "")), extra
+        )
+
+    def append(self, item):
+        """Adds a record as a new row, without checking for an existing one."""
+        dir_id, name, size, mtime, host_id, ext_id, extra = self.encode(item)
+        row = len(self.names)
+        self.dir_ids.append(dir_id)
+        self.names.append(name)
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+        self.host_ids.append(host_id)
+        self.ext_ids.append(ext_id)
+        if extra:
+            self.extras[row] = extra
+        if self.positions is not None:
+            self.positions.add(dir_id, name, row)
+        if self.trigrams is not None:
+            self.trigrams.add(row, name)
+        if self.size_order is not None:
+            self.size_order.touch(row)
+        if self.dir_rows is not None:
+            self.dir_rows.touch(row)
+        if self.rollup is not None:
+            self.rollup.add(dir_id, 1, size)
+        if self.summary is not None:
+            self.summary.added(row)
+        return row
+
+    def extend(self, records):
+        for item in records:
+            self.append(item)
+
+    def upsert(self, item, seen=None):
+        """Inserts a record, or overwrites the row that has the same full_path.
+
+        Returns ADDED, UPDATED, or UNCHANGED if the row already held exactly
+        this record. seen, if given, is a bytearray with a byte for each row
+        that existed when it was made; the byte of the row the record matched
+        is set. Upserting only appends rows, so those rows keep their numbers.
+        """
+        dir_id, name, size, mtime, host_id, ext_id, extra = self.encode(item)
+        row = self.position_index().find(dir_id, name)
+        if row is None:
+            self.append(item)
+            return ADDED
+        if seen is not None and row < len(seen):
+            seen[row] = 1
+        if (self.sizes[row] == size and self.mtimes[row] == mtime and self.host_ids[row] == host_id
+                and self.ext_ids[row] == ext_id and self.extras.get(row, {}) == extra):
+            return UNCHANGED
+        if self.sizes[row] != size:
+            if self.size_order is not None:
+                self.size_order.touch(row)
+            if self.rollup is not None:
+                self.rollup.add(dir_id, 0, size - self.sizes[row])
+        if self.summary is not None:
+            self.summary.updated(row, host_id, size, mtime)
+        self.sizes[row] = size
+        self.mtimes[row] = mtime
+        self.host_ids[row] = host_id
+        self.ext_ids[row] = ext_id
+        if extra:
+            self.extras[row] = extra
+        else:
+            self.extras.pop(row, None)
+        return UPDATED
+
+    def drop_rows(self, doomed):
+        """Removes the given rows; returns how many were removed.
+
+        Each removed row is filled with the current last row, so only the
+        removed and moved rows are touched and the path index is patched rather
+        than rebuilt. Row order is therefore not preserved across removals.
+        """
+        columns = [self.sizes, self.mtimes, self.host_ids, self.ext_ids, self.dir_ids, self.names]
+        index = self.positions
+        if self.trigrams is not None and len(doomed) > len(self.names) // 4:
+            # Cheaper to build the name index again on the next search than to patch it
+            self.trigrams = None
+        names_index = self.trigrams
+        for row in sorted(doomed, reverse=True):
+            # Every row above this one is being kept, so the last row can fill it
+            last = len(self.names) - 1
+            if index is not None:
+                index.remove(self.dir_ids[row], self.names[row])
+            if names_index is not None:
+                names_index.remove(row, self.names[row])
+                if row != last:
+                    names_index.remove(last, self.names[last])
+                    names_index.add(row, self.names[last])
+            if self.size_order is not None and row != last:
+                self.size_order.touch(row)
+            if self.dir_rows is not None and row != last:
+                self.dir_rows.touch(row)
+            if self.rollup is not None:
+                self.rollup.add(self.dir_ids[row], -1, -self.sizes[row])
+            if self.summary is not None:
+                self.summary.removed(row)
+                self.summary.moved(last, row)
+            self.extras.pop(row, None)
+            if row != last:
+                for values in columns:
+                    values[row] = values[last]
+                extra = self.extras.pop(last, None)
+                if extra:
+                    self.extras[row] = extra
+                if index is not None:
+                    index.move(self.dir_ids[row], self.names[row], row)
+            for values in columns:
+                values.pop()
+        return len(doomed)
+
+    def remove_rows(self, row_predicate):
+        """Removes every row for which row_predicate(row) is true; returns how many were removed."""
+        return self.drop_rows([row for row in range(len(self.names)) if row_predicate(row)])
+
+    def delete_paths(self, paths):
+        """Removes the rows of the given full paths; returns how many were removed."""
+        return self.drop_rows(set(row for row in (self.find(path) for path in paths) if row is not None))
+
+    def copy(self):
+        """Returns a snapshot of the rows that later updates to this container do not affect.
+
+        The host and extension tables are shared; they are only ever appended
+        to. The path store gets its own copy (see PathStore.copy), so the
+        snapshot can be read from another thread while this container changes.
+        """
+        snapshot = ColumnarInventory()
+        snapshot.hosts = self.hosts
+        snapshot.extensions = self.extensions
+        snapshot.directories = self.directories.copy()
+        snapshot.names = list(self.names)
+        for column in ("sizes", "mtimes", "host_ids", "ext_ids", "dir_ids"):
+            values = getattr(self, column)
+            setattr(snapshot, column, array(values.typecode, values))
+        snapshot.extras = dict(self.extras)
+        if self.trigrams is not None:
+            snapshot.trigrams = self.trigrams.copy(snapshot.names)
+        return snapshot
+
+    def clear(self):
+        self.__init__()
+
+    # Aggregates, answered from the columns without building records
+    def summary_totals(self):
+        """Returns the SummaryTotals of the rows, building them on first use."""
+        if self.summary is None:
+            self.summary = SummaryTotals(self)
+        return self.summary
+
+    def total_size(self):
+        return self.summary_totals().size
+
+    def rows_with(self, column, value_id):
+        return [row for row, current in enumerate(column) if current == value_id]
+
+    def used_values(self, column, table):
+        return sorted(table[string_id] for string_id in set(column))
+
+    def size_index(self):
+        """Returns the SizeIndex of the rows, building it on first use."""
+        if self.size_order is None:
+            self.size_order = SizeIndex(self.sizes)
+        return self.size_order
+
+    def directory_rows(self):
+        """Returns the DirectoryRows of the rows, building it on first use."""
+        if self.dir_rows is None:
+            self.dir_rows = DirectoryRows(self.dir_ids)
+        return self.dir_rows
+
+    def directory_rollup(self):
+        """Returns the DirectoryRollup of the rows, building it on first use."""
+        if self.rollup is None:
+            self.rollup = DirectoryRollup(self.directories, self.dir_ids, self.sizes)
+        return self.rollup
+
+    def largest_rows(self, top_n, row_filter=None):
+        """Returns the top_n largest rows for which row_filter(row) is true (all rows without one), largest first."""
+        rows = self.size_index().descending()
+        if row_filter is not None:
+            rows = filter(row_filter, rows)
+        return list(itertools.islice(rows, top_n))
+
+    def largest_rows_by(self, top_n, group_of, groups=None):
+        """Returns {group: rows} with the top_n largest rows of every group, where group_of(row) is a row's group.
+
+        The rows are walked largest first, so the walk stops as soon as each of
+        the expected number of groups (if given) has top_n rows.
+        """
+        found = {}
+        if top_n <= 0:
+            return found
+        full = 0
+        for row in self.size_index().descending():
+            rows = found.setdefault(group_of(row), [])
+            if len(rows) < top_n:
+                rows.append(row)
+                if len(rows) == top_n:
+                    full += 1
+                    if full == groups:
+                        break
+        return found
+
+    def hostnames(self):
+        """Returns the sorted hostnames that still have rows."""
+        hosts = self.hosts
+        return sorted(set(hosts[host_id] for host_id, root in self.summary_totals().groups))
+
+    def most_recent_row(self):
+        return self.summary_totals().newest_row()
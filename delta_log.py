@@ -0,0 +1,94 @@
+# This is version Point2N Branch, developed by arrfour
+
+import os
+import json
+
+class DeltaLog:
+    """Append-only log of inventory changes kept next to the inventory snapshot.
+
+    Every line is one JSON change: {"op": "upsert", "record": {...}},
+    {"op": "delete", "path": ...}, {"op": "delete_host", "hostname": ...} or
+    {"op": "delete_drive", "drive": ...}. Saving the inventory only has to
+    append and fsync the changes made since the last save. When the snapshot is
+    compacted, the current log is first sealed (renamed aside) so new changes go
+    to a fresh log while the snapshot is rewritten; the sealed log is deleted once
+    the new snapshot is in place. Replaying a sealed log on top of a snapshot that
+    already contains it is harmless, because every change is idempotent.
+    """
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self.sealed_file = log_file + ".sealed"
+        self.handle = None
+        self.entries = 0
+
+    def append(self, entry):
+        """Appends one change; it is durable after the next flush()."""
+        if self.handle is None:
+            self.handle = open(self.log_file, "a")
+        self.handle.write(json.dumps(entry) + "\n")
+        self.entries += 1
+
+    def flush(self):
+        """Flushes and fsyncs the appended changes."""
+        if self.handle is not None:
+            self.handle.flush()
+            os.fsync(self.handle.fileno())
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+    def replay(self):
+        """Yields the changes of the sealed log (if any) and then the current log.
+
+        A partially written last line, left by a crash mid-append, is ignored.
+        """
+        self.entries = 0
+        for path in (self.sealed_file, self.log_file):
+            if not os.path.exists(path):
+                continue
+            with open(path, "r") as f:
+                for line in f:
+                    try:
+                        if not line.endswith("\n"):
+                            raise ValueError("incomplete line")
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    if path == self.log_file:
+                        self.entries += 1
+                    yield entry
+
+    def seal(self):
+        """Moves the current log aside for compaction and starts a new, empty one."""
+        self.flush()
+        self.close()
+        if os.path.exists(self.log_file):
+            if os.path.exists(self.sealed_file):
+                # A previous compaction never finished; its changes must be kept
+                with open(self.sealed_file, "a") as sealed, open(self.log_file, "r") as current:
+                    for line in current:
+                        sealed.write(line)
+                os.remove(self.log_file)
+            else:
+                os.replace(self.log_file, self.sealed_file)
+        self.entries = 0
+
+    def discard_sealed(self):
+        """Deletes the sealed log once a snapshot containing it has been written."""
+        try:
+            os.remove(self.sealed_file)
+        except FileNotFoundError:
+            pass
+
+    def reset(self):
+        """Deletes both logs, e.g. after a full snapshot was written synchronously."""
+        self.close()
+        self.discard_sealed()
+        try:
+            os.remove(self.log_file)
+        except FileNotFoundError:
+            pass
+        self.entries = 0
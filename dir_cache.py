@@ -0,0 +1,86 @@
+# This is version Point2N Branch, developed by arrfour
+
+import os
+import json
+
+class DirectoryCache:
+    """Remembers the mtime and entry count of every scanned directory.
+
+    An incremental scan stats each directory once; when its mtime and entry count
+    still match the cache, the directory is not listed again and its file records
+    are carried over from the existing inventory. Note that rewriting a file in
+    place does not touch its directory's mtime, so a full scan is still needed now
+    and then to refresh sizes and timestamps of modified files.
+    """
+
+    def __init__(self, cache_file="dir_cache.json"):
+        self.cache_file = cache_file
+        self.directories = self.load_cache()
+        self.carried = {}
+        self.visited = {}
+        self.reused = set()
+        self.filter_key = None
+
+    def load_cache(self):
+        """Loads the directory cache from disk."""
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, "r") as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error loading directory cache: {e}")
+        return {}
+
+    def save_cache(self, root_dir):
+        """Saves the cache, dropping directories under root_dir that no longer exist."""
+        prefix = os.path.join(root_dir, "")
+        directories = {
+            path: entry for path, entry in self.directories.items()
+            if path != root_dir and not path.startswith(prefix)
+        }
+        directories.update(self.visited)
+        try:
+            with open(self.cache_file, "w") as f:
+                json.dump(directories, f)
+            self.directories = directories
+        except Exception as e:
+            print(f"Error saving directory cache: {e}")
+
+    def prepare(self, root_dir, inventory, filter_key=None):
+        """Groups the existing inventory records under root_dir by their directory.
+
+        filter_key identifies the scan filter in use; directories cached under a
+        different filter are listed again.
+        """
+        prefix = os.path.join(root_dir, "")
+        self.filter_key = filter_key
+        self.carried = {}
+        self.visited = {}
+        self.reused = set()
+        for item in inventory:
+            full_path = item["full_path"]
+            if full_path.startswith(prefix):
+                self.carried.setdefault(os.path.dirname(full_path), []).append(item)
+
+    def lookup(self, dir_path):
+        """Returns (mtime, records, subdirs); records and subdirs are None if the directory must be listed."""
+        mtime = os.stat(dir_path).st_mtime
+        entry = self.directories.get(dir_path)
+        if entry is None or entry["mtime"] != mtime or entry.get("filter") != self.filter_key:
+            return mtime, None, None
+        records = self.carried.get(dir_path, [])
+        if len(records) + len(entry["subdirs"]) != entry["entries"]:
+            # The inventory no longer holds every record for this directory
+            return mtime, None, None
+        self.visited[dir_path] = entry
+        self.reused.add(dir_path)
+        return mtime, records, [os.path.join(dir_path, name) for name in entry["subdirs"]]
+
+    def update(self, dir_path, mtime, records, subdirs):
+        """Records the state of a directory that was just listed."""
+        self.visited[dir_path] = {
+            "mtime": mtime,
+            "entries": len(records) + len(subdirs),
+            "subdirs": [os.path.basename(subdir) for subdir in subdirs],
+            "filter": self.filter_key
+        }
@@ -0,0 +1,156 @@
+# This is version Point2N Branch, developed by arrfour
+
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+
+# Bytes read from each end of a file for the cheap sampled hash
+SAMPLE_SIZE = 64 * 1024
+
+# Read buffer used for full content hashes
+CHUNK_SIZE = 1024 * 1024
+
+# Files hashed in parallel
+DEFAULT_HASH_WORKERS = 8
+
+def sample_hash(file_path, size):
+    """Hashes the first and last SAMPLE_SIZE bytes of a file together with its size."""
+    digest = hashlib.blake2b(str(size).encode())
+    with open(file_path, "rb") as f:
+        if size <= 2 * SAMPLE_SIZE:
+            # The sample covers the whole file
+            digest.update(f.read())
+        else:
+            digest.update(f.read(SAMPLE_SIZE))
+            f.seek(-SAMPLE_SIZE, os.SEEK_END)
+            digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+def full_hash(file_path, size):
+    """Hashes the whole file, streaming it through one reusable buffer."""
+    digest = hashlib.blake2b(str(size).encode())
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+class FingerprintCache:
+    """Caches sampled and full hashes by (full_path, size, mtime) so unchanged files are never re-read."""
+
+    def __init__(self, cache_file="fingerprint_cache.json"):
+        self.cache_file = cache_file
+        self.entries = self.load_cache()
+        self.used = {}
+
+    def load_cache(self):
+        """Loads the fingerprint cache from disk."""
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, "r") as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error loading fingerprint cache: {e}")
+        return {}
+
+    def save_cache(self, records, root=None):
+        """Saves the cache, dropping entries for files that are gone from the inventory or changed.
+
+        With root, records only covers the files under root; entries of other
+        files are kept as they are.
+        """
+        if root is not None:
+            prefix = os.path.join(root, "")
+            for full_path, entry in self.entries.items():
+                if not full_path.startswith(prefix):
+                    self.used.setdefault(full_path, entry)
+        for item in records:
+            entry = self.entries.get(item["full_path"])
+            if item["full_path"] not in self.used and entry is not None:
+                if entry["size"] == item["file_size_bytes"] and entry["mtime"] == item["last_modified_timestamp"]:
+                    self.used[item["full_path"]] = entry
+        try:
+            with open(self.cache_file, "w") as f:
+                json.dump(self.used, f)
+            self.entries = self.used
+        except Exception as e:
+            print(f"Error saving fingerprint cache: {e}")
+
+    def entry(self, item):
+        """Returns the cache entry for a record, starting a fresh one if the file changed."""
+        full_path = item["full_path"]
+        entry = self.used.get(full_path) or self.entries.get(full_path)
+        if entry is None or entry["size"] != item["file_size_bytes"] or entry["mtime"] != item["last_modified_timestamp"]:
+            entry = {"size": item["file_size_bytes"], "mtime": item["last_modified_timestamp"]}
+        self.used[full_path] = entry
+        return entry
+
+def hash_stage(items, cache, key, hash_function, workers, desc):
+    """Fills cache[key] for every item that does not have it yet, hashing on a thread pool."""
+    pending = [item for item in items if key not in cache.entry(item)]
+
+    def compute(item):
+        try:
+            return item, hash_function(item["full_path"], item["file_size_bytes"])
+        except OSError:
+            # Unreachable or unreadable file: leave it without a fingerprint
+            return item, None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item, value in tqdm(executor.map(compute, pending), total=len(pending), desc=desc, unit="file"):
+            if value is not None:
+                cache.entry(item)[key] = value
+
+def group_by(items, key_function):
+    """Groups items by key, keeping only groups with more than one member."""
+    groups = {}
+    for item in items:
+        key = key_function(item)
+        if key is not None:
+            groups.setdefault(key, []).append(item)
+    return [group for group in groups.values() if len(group) > 1]
+
+def fingerprint_records(records, cache_file="fingerprint_cache.json", workers=DEFAULT_HASH_WORKERS, root=None):
+    """Adds a content_hash to every record that may have a duplicate.
+
+    Hashing is staged so that as little data as possible is read: only files whose
+    size collides with another file are sampled (head and tail), and only files
+    whose samples also collide are hashed in full. Returns the number of records
+    given a content_hash. Pass root when records are only the files under it, so
+    cached hashes of files elsewhere are kept.
+    """
+    cache = FingerprintCache(cache_file)
+
+    same_size = [item for group in group_by(records, lambda item: item["file_size_bytes"] or None) for item in group]
+    hash_stage(same_size, cache, "sample", sample_hash, workers, "Sampling files")
+
+    same_sample = [item for group in group_by(same_size, lambda item: cache.entry(item).get("sample")) for item in group]
+    for item in same_sample:
+        entry = cache.entry(item)
+        if item["file_size_bytes"] <= 2 * SAMPLE_SIZE and "sample" in entry:
+            # Small files were read whole by the sampling stage
+            entry["full"] = entry["sample"]
+    hash_stage(same_sample, cache, "full", full_hash, workers, "Hashing files")
+
+    fingerprinted = 0
+    for item in records:
+        item.pop("content_hash", None)
+    for item in same_sample:
+        content_hash = cache.entry(item).get("full")
+        if content_hash is not None:
+            item["content_hash"] = content_hash
+            fingerprinted += 1
+
+    cache.save_cache(records, root)
+    return fingerprinted
+
+def find_duplicates(records):
+    """Returns groups of records that share a content_hash, largest wasted space first."""
+    groups = group_by(records, lambda item: item.get("content_hash"))
+    return sorted(groups, key=lambda group: group[0]["file_size_bytes"] * (len(group) - 1), reverse=True)
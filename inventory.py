@@ -1,64 +1,235 @@
 # This is version Point2N Branch, developed by arrfour
 
 import os
-import json
 from utils import human_readable_size
+from storage import open_backend, write_json_records, LARGEST_GROUPS
+from transfer import read_records, write_records
+
+def format_merge_counts(counts):
+    """Formats the counts returned by merge_inventory or replace_scan for display."""
+    text = f"{counts['added']} added, {counts['updated']} updated, {counts['unchanged']} unchanged"
+    if "removed" in counts:
+        text += f", {counts['removed']} removed"
+    return text
 
 class InventoryManager:
-    def __init__(self, output_file):
+    def __init__(self, output_file, backend=None, read_only=False):
+        """read_only shares a binary snapshot with a writer in another process instead of loading a private copy."""
         self.output_file = output_file
-        self.inventory = self.load_inventory()
+        self.read_only = read_only
+        self.backend = backend or open_backend(output_file, read_only=read_only)
+        self.load_inventory()
+
+    @property
+    def inventory(self):
+        """The inventory records; a list for the JSON backend, a live view for SQLite."""
+        self.backend.refresh()
+        return self.backend.records()
+
+    @inventory.setter
+    def inventory(self, records):
+        self.backend.replace(records)
 
     def save_inventory(self):
-        """Saves the current inventory to the output file in the local folder."""
+        """Saves the current inventory through the storage backend."""
         try:
-            # Ensure the output file path is in the local folder
-            local_path = os.path.join(os.getcwd(), self.output_file)
+            local_path = self.backend.location()
             print(f"DEBUG: Saving inventory to local path: {local_path}")
 
-            with open(local_path, "w") as f:
-                json.dump(self.inventory, f, indent=4)
+            self.backend.save()
 
             print(f"DEBUG: Inventory successfully saved to {local_path}")
         except Exception as e:
             print(f"Error saving inventory: {e}")
 
     def load_inventory(self):
-        """Loads the inventory from the output file in the local folder."""
+        """Loads the inventory through the storage backend."""
         try:
-            # Ensure the output file path is in the local folder
-            local_path = os.path.join(os.getcwd(), self.output_file)
+            local_path = self.backend.location()
             if os.path.exists(local_path):
                 print(f"DEBUG: Loading inventory from local path: {local_path}")
-
-                with open(local_path, "r") as f:
-                    return json.load(f)
+            elif os.path.exists(local_path + ".log"):
+                print(f"DEBUG: Loading inventory from its change log: {local_path}.log")
             else:
                 print(f"DEBUG: {local_path} does not exist. Initializing empty inventory.")
+            self.backend.load()
         except Exception as e:
             print(f"Error loading inventory: {e}")
-        return []
+        return self.inventory
 
-    def merge_inventory(self, new_inventory):
-        """Merges new inventory data into the existing inventory."""
+    def close(self):
+        """Brings the stored inventory file up to date and releases it; call on a clean shutdown."""
         try:
-            # Debug log: Start merging
-            print(f"DEBUG: Merging {len(new_inventory)} new items into inventory.")
+            self.backend.close()
+        except Exception as e:
+            print(f"Error closing inventory: {e}")
 
-            inventory_dict = {item["full_path"]: item for item in self.inventory}
-            for new_item in new_inventory:
-                inventory_dict[new_item["full_path"]] = new_item
+    def merge_inventory(self, new_inventory, save=True):
+        """Merges new inventory data into the existing inventory.
 
-            self.inventory = list(inventory_dict.values())
+        new_inventory may be any iterable of records, such as a stream read back
+        from the scan journal. It is consumed once; records are upserted by
+        full_path through the backend's persistent path index, so a merge costs
+        time in proportion to the new records, not to the whole inventory.
+        Returns {"added", "updated", "unchanged"} counts, or None if the merge failed.
+        """
+        try:
+            # Debug log: Start merging
+            print("DEBUG: Merging new items into inventory.")
+
+            counts = self.backend.upsert(new_inventory)
 
             # Debug log: Merge complete
-            print(f"DEBUG: Merge complete. Total inventory size: {len(self.inventory)}")
+            print(f"DEBUG: Merge complete. {format_merge_counts(counts)}. Total inventory size: {self.backend.count()}")
+
+            if save:
+                self.save_inventory()
+            return counts
+        except Exception as e:
+            print(f"Error merging inventory: {e}")
+            return None
+
+    def replace_scan(self, root, hostname, new_inventory, keep=(), save=True, complete=True, scan_filter=None):
+        """Merges a rescan of root, removing hostname's records under root that it no longer found.
+
+        Records are merged as in merge_inventory. Paths in keep (and anything
+        under them) are never removed; pass the paths the scan could not read,
+        so a transient error does not look like a deletion. With the ScanFilter
+        the scan ran with, only records that the filter admits can be removed;
+        files it skipped are left alone. Pass complete=False
+        when the traversal itself failed: what it found is merged, but nothing
+        is removed. Returns {"added", "updated", "unchanged", "removed"} counts,
+        or None if the merge failed.
+        """
+        try:
+            if complete:
+                print(f"DEBUG: Replacing inventory records under {root} for host {hostname}.")
+                admitted = None
+                if scan_filter is not None:
+                    admitted = lambda full_path, size: scan_filter.admits(full_path, size, root)
+                counts = self.backend.replace_under(root, hostname, new_inventory, keep, admitted)
+            else:
+                print(f"DEBUG: Scan of {root} did not complete; merging without removing records.")
+                counts = dict(self.backend.upsert(new_inventory), removed=0)
+
+            print(f"DEBUG: Rescan merged. {format_merge_counts(counts)}. Total inventory size: {self.backend.count()}")
 
-            self.save_inventory()
+            if save:
+                self.save_inventory()
+            return counts
         except Exception as e:
             print(f"Error merging inventory: {e}")
+            return None
+
+    def add_scan_root(self, root):
+        """Tells the backend that records from a scan of root are about to be merged."""
+        self.backend.add_root(root)
+
+    def remove_host(self, hostname):
+        """Removes every record of a host and saves; returns how many were removed."""
+        removed = self.backend.remove_host(hostname)
+        self.save_inventory()
+        return removed
+
+    def remove_drive(self, drive):
+        """Removes every record on a drive and saves; returns how many were removed."""
+        removed = self.backend.remove_drive(drive)
+        self.save_inventory()
+        return removed
+
+    def import_json(self, json_file):
+        """Merges an existing JSON inventory file into this inventory."""
+        return self.import_file(json_file)
+
+    def export_json(self, json_file):
+        """Writes the whole inventory to a JSON file in the classic list format."""
+        self.backend.refresh()
+        write_json_records(self.backend.iter_records(), json_file)
+
+    def import_file(self, path, save=True):
+        """Merges an inventory file shipped from another site into this inventory.
+
+        The format is taken from the file name: .ndjson/.jsonl, .csv or .json,
+        optionally compressed as .gz or .xz. Records are streamed from the file
+        into the merge, so the file is never loaded whole. Returns the merge
+        counts, or None if the merge failed.
+        """
+        return self.merge_inventory(read_records(path), save=save)
+
+    def export_file(self, path):
+        """Streams the whole inventory to path in the format its name selects; returns how many records were written."""
+        self.backend.refresh()
+        return write_records(self.backend.iter_records(), path)
+
+    # Queries are answered by the backend, which can push them down to an index. A read-only
+    # manager first picks up any snapshot the writer has published since the last query.
+    def search_by_name(self, term):
+        self.backend.refresh()
+        return self.backend.search_by_name(term)
+
+    def filter_by_extension(self, extension):
+        self.backend.refresh()
+        return self.backend.filter_by_extension(extension)
+
+    def query(self, file_query, order=None, limit=None):
+        """Returns (plan, records) for a FileQuery, with the records streamed in order up to limit (see query.py)."""
+        self.backend.refresh()
+        return self.backend.find(file_query, order, limit)
+
+    def largest_files(self, top_n, hostname=None, extension=None, directory=None):
+        self.backend.refresh()
+        return self.backend.largest_files(top_n, hostname, extension, directory)
+
+    def largest_files_by(self, top_n, group):
+        """Returns {value: records} with the top_n largest files of each host, extension or drive.
+
+        group is one of LARGEST_GROUPS: "hostname", "extension" or "drive".
+        """
+        if group not in LARGEST_GROUPS:
+            raise ValueError(f"Cannot group the largest files by {group}; expected one of {', '.join(LARGEST_GROUPS)}")
+        self.backend.refresh()
+        return self.backend.largest_files_by(top_n, group)
+
+    def most_recent_file(self):
+        self.backend.refresh()
+        return self.backend.most_recent_file()
+
+    def directory_totals(self):
+        self.backend.refresh()
+        return self.backend.directory_totals()
+
+    def recursive_directory_totals(self):
+        self.backend.refresh()
+        return self.backend.recursive_directory_totals()
+
+    def directory_total(self, directory):
+        """Returns {"count", "size"} for everything under directory, read from the directory rollup rather than the files."""
+        self.backend.refresh()
+        return self.backend.directory_total(os.path.normpath(directory))
+
+    def subdirectory_totals(self, directory):
+        """Returns {subdirectory: {"count", "size"}} with the recursive totals of each directory directly below one."""
+        self.backend.refresh()
+        return self.backend.subdirectory_totals(os.path.normpath(directory))
+
+    def host_drive_totals(self):
+        self.backend.refresh()
+        return self.backend.host_drive_totals()
+
+    def hostnames(self):
+        self.backend.refresh()
+        return self.backend.hostnames()
+
+    def drives(self):
+        self.backend.refresh()
+        return self.backend.drives()
+
+    def records_under(self, root_dir):
+        self.backend.refresh()
+        return self.backend.records_under(root_dir)
 
     def get_summary_statistics(self):
-        total_files = len(self.inventory)
-        total_size = sum(item["file_size_bytes"] for item in self.inventory)
-        return total_files, human_readable_size(total_size)
\ No newline at end of file
+        self.backend.refresh()
+        total_files = self.backend.count()
+        total_size = self.backend.total_size()
+        return total_files, human_readable_size(total_size)
@@ -0,0 +1,91 @@
+# This is version Point2N Branch, developed by arrfour
+
+import time
+import threading
+
+# Completed directory listings per adjustment window
+DEFAULT_WINDOW = 16
+
+# Pause added per listing once concurrency is already at its minimum
+DELAY_STEP = 0.005
+
+# Longest pause ever added per listing
+MAX_DELAY = 1.0
+
+class IOGovernor:
+    """Adapts scan concurrency and request rate to hold a filesystem latency budget.
+
+    Every directory listing is timed and divided by the number of calls it made
+    (one readdir plus one stat per file), giving a per-call latency. After each
+    window of listings the governor follows AIMD: while latency is within the
+    budget it adds one concurrent listing (or removes some pacing delay), and when
+    the budget is exceeded it halves concurrency. Once concurrency is down to its
+    minimum, further slowdowns double a per-listing delay instead, which lowers
+    the request rate.
+    """
+
+    def __init__(self, target_latency, max_concurrency, min_concurrency=1, window=DEFAULT_WINDOW):
+        self.target_latency = target_latency
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = min(min_concurrency, self.max_concurrency)
+        self.window = window
+        self.limit = float(min(4, self.max_concurrency))
+        self.delay = 0.0
+        self.active = 0
+        self.condition = threading.Condition()
+        self.samples = []
+        self.calls = 0
+        self.total_latency = 0.0
+        self.increases = 0
+        self.decreases = 0
+        self.started = time.monotonic()
+
+    def acquire(self):
+        """Waits for a free listing slot, then applies any pacing delay."""
+        with self.condition:
+            while self.active >= int(self.limit):
+                self.condition.wait()
+            self.active += 1
+            delay = self.delay
+        if delay:
+            time.sleep(delay)
+
+    def release(self, elapsed, calls):
+        """Records a finished listing that took `elapsed` seconds for `calls` filesystem calls."""
+        calls = max(1, calls)
+        with self.condition:
+            self.active -= 1
+            self.calls += calls
+            self.total_latency += elapsed
+            self.samples.append(elapsed / calls)
+            if len(self.samples) >= self.window:
+                self.adjust(sum(self.samples) / len(self.samples))
+                self.samples = []
+            self.condition.notify_all()
+
+    def adjust(self, latency):
+        """Applies one AIMD step for the latency observed over the last window."""
+        if latency > self.target_latency:
+            self.decreases += 1
+            if self.limit > self.min_concurrency:
+                self.limit = max(self.min_concurrency, self.limit / 2)
+            else:
+                self.delay = min(MAX_DELAY, max(DELAY_STEP, self.delay * 2))
+        else:
+            self.increases += 1
+            if self.delay:
+                self.delay = max(0.0, self.delay - DELAY_STEP)
+            elif self.limit < self.max_concurrency:
+                self.limit = min(self.max_concurrency, self.limit + 1)
+
+    def effective_rate(self):
+        """Returns the filesystem calls per second achieved so far."""
+        elapsed = time.monotonic() - self.started
+        return self.calls / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        """Returns a one-line summary of the rate and limits the scan ran at."""
+        average_ms = 1000 * self.total_latency / self.calls if self.calls else 0.0
+        return (f"{self.effective_rate():.0f} calls/s effective, {average_ms:.2f} ms/call average "
+                f"(budget {self.target_latency * 1000:g} ms), final concurrency {int(self.limit)}, "
+                f"delay {self.delay * 1000:.0f} ms, {self.increases} up / {self.decreases} down adjustments")
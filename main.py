@@ -1,6 +1,7 @@
 # This is version Point2N Branch, developed by arrfour
 
 import os
+import sys
 import json
 from ui import display_main_menu
 from inventory import InventoryManager
@@ -9,25 +10,41 @@ from colorama import Fore, Style
 
 highlight_fg = Fore.YELLOW  # Define the highlight_fg variable
 
+# The inventory is kept as a binary snapshot; earlier versions used a JSON file
+DEFAULT_INVENTORY = "file_inventory.inv"
+LEGACY_INVENTORY = "file_inventory.json"
+
 # Ensure necessary files exist
-for file_name in ["file_inventory.json", "last_scan.json"]:
+for file_name in ["last_scan.json"]:
     if not os.path.exists(file_name):
         with open(file_name, "w") as f:
-            if file_name == "file_inventory.json":
-                json.dump([], f, indent=4)  # Initialize as empty list
-            elif file_name == "last_scan.json":
+            if file_name == "last_scan.json":
                 json.dump({"last_scan": None}, f, indent=4)  # Initialize with null last scan
         print(f"DEBUG: Created missing file: {file_name}")
 
 if __name__ == "__main__":
-    output_file = "file_inventory.json"
+    # An optional argument selects the inventory file: .inv (binary snapshot), .json, .db/.sqlite (SQLite),
+    # or a .shards directory (one snapshot per host and scan root).
+    # --read-only shares a .inv snapshot with another process that is scanning into it.
+    arguments = [argument for argument in sys.argv[1:] if argument != "--read-only"]
+    read_only = "--read-only" in sys.argv[1:]
+    output_file = arguments[0] if arguments else DEFAULT_INVENTORY
 
     # Initialize inventory manager
-    inventory_manager = InventoryManager(output_file)
+    inventory_manager = InventoryManager(output_file, read_only=read_only)
+
+    # Import an inventory left by an earlier version once
+    if (not read_only and output_file == DEFAULT_INVENTORY and not os.path.exists(output_file)
+            and os.path.exists(LEGACY_INVENTORY)):
+        print(f"DEBUG: Importing {LEGACY_INVENTORY} into {DEFAULT_INVENTORY}")
+        inventory_manager.import_json(LEGACY_INVENTORY)
 
     # Display main menu
     display_main_menu(inventory_manager)
 
+    # Fold pending changes into the inventory file
+    inventory_manager.close()
+
     # Exit message after main menu loop ends
     clear_screen()
     print(highlight_fg + "This is version Point2N Branch, developed by arrfour. Thanks for using my silly app!" + Style.RESET_ALL)
\ No newline at end of file
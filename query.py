@@ -0,0 +1,212 @@
+# This is version Point2N Branch, developed by arrfour
+
+import os
+import re
+import csv
+import sys
+import time
+import fnmatch
+import datetime
+
+from storage import record_drive
+from transfer import CSV_FIELDS, chunked, csv_rows, ndjson_lines
+
+# Sort keys accepted on the command line, and the record field each one orders by
+SORT_FIELDS = {"size": "file_size_bytes", "mtime": "last_modified_timestamp", "name": "file_name",
+               "path": "full_path", "host": "hostname"}
+
+# Aggregations: "total" sums every match, the others sum the matches per value of a record
+AGGREGATES = {
+    "total": lambda item: None,
+    "host": lambda item: item.get("hostname", "Unknown Host"),
+    "extension": lambda item: item["file_extension"],
+    "drive": lambda item: record_drive(item["full_path"]),
+    "directory": lambda item: os.path.dirname(item["full_path"]),
+}
+
+SIZE_UNITS = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024 ** 2, "MB": 1024 ** 2,
+              "G": 1024 ** 3, "GB": 1024 ** 3, "T": 1024 ** 4, "TB": 1024 ** 4}
+
+class FileQuery:
+    """Predicates over inventory records; a record matches when every predicate that is set holds.
+
+    name is a substring of the file name and glob a shell pattern for it, both
+    ignoring case; regex is searched for in the file name. extension ignores
+    case, prefix is a directory the file must lie under, sizes are inclusive
+    bounds in bytes, and modified_after/modified_before bound the modification
+    timestamp (after inclusive, before exclusive). Backends push as many of
+    the predicates as they can down to their indexes (see InventoryBackend.find).
+    """
+
+    def __init__(self, name=None, glob=None, regex=None, extension=None, hostname=None, prefix=None,
+                 min_size=None, max_size=None, modified_after=None, modified_before=None):
+        self.name = name
+        self.glob = glob
+        self.regex = regex
+        self.pattern = re.compile(regex) if regex is not None else None
+        self.extension = extension
+        self.hostname = hostname
+        self.prefix = prefix
+        self.min_size = min_size
+        self.max_size = max_size
+        self.modified_after = modified_after
+        self.modified_before = modified_before
+
+    def index_term(self):
+        """Returns a text every matching file name contains, ignoring case, long enough for a trigram lookup; or None.
+
+        That is the name itself, or else the longest literal run of the glob.
+        """
+        if self.name is not None and len(self.name) >= 3:
+            return self.name
+        if self.glob is not None:
+            literal = max(re.split(r"[*?]|\[[^\]]*\]?", self.glob), key=len)
+            if len(literal) >= 3:
+                return literal
+        return None
+
+    def name_matches(self, file_name):
+        lowered = file_name.lower()
+        return ((self.name is None or self.name.lower() in lowered)
+                and (self.glob is None or fnmatch.fnmatchcase(lowered, self.glob.lower()))
+                and (self.pattern is None or self.pattern.search(file_name) is not None))
+
+    def size_matches(self, size):
+        return (self.min_size is None or size >= self.min_size) and (self.max_size is None or size <= self.max_size)
+
+    def time_matches(self, timestamp):
+        return ((self.modified_after is None or timestamp >= self.modified_after)
+                and (self.modified_before is None or timestamp < self.modified_before))
+
+    def matches(self, item):
+        return (self.name_matches(item["file_name"])
+                and (self.extension is None or item["file_extension"].lower() == self.extension.lower())
+                and (self.hostname is None or item.get("hostname", "Unknown Host") == self.hostname)
+                and (self.prefix is None or item["full_path"].startswith(os.path.join(self.prefix, "")))
+                and self.size_matches(item["file_size_bytes"])
+                and self.time_matches(item["last_modified_timestamp"]))
+
+def parse_size(text):
+    """Parses a size such as 4096, 512K, 1.5G or 2TB into bytes."""
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([A-Za-z]*)\s*", text)
+    if not match or match.group(2).upper() not in SIZE_UNITS:
+        raise ValueError(f"Not a size: {text} (expected e.g. 4096, 512K, 1.5G)")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+def parse_time(text):
+    """Parses a Unix timestamp or an ISO date such as 2024-01-31 or 2024-01-31T12:00 into a timestamp."""
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise ValueError(f"Not a date: {text} (expected e.g. 2024-01-31 or 2024-01-31T12:00)")
+
+def aggregate(records, group):
+    """Sums the files and bytes of records per value of an AGGREGATES entry; largest totals first."""
+    group_of = AGGREGATES[group]
+    totals = {}
+    for item in records:
+        stats = totals.setdefault(group_of(item), [0, 0])
+        stats[0] += 1
+        stats[1] += item["file_size_bytes"]
+    rows = sorted(totals.items(), key=lambda entry: entry[1][1], reverse=True)
+    if group == "total":
+        return [{"files": files, "bytes": size} for value, (files, size) in rows] or [{"files": 0, "bytes": 0}]
+    return [{group: value, "files": files, "bytes": size} for value, (files, size) in rows]
+
+def write_results(rows, output_format, out, fields=None):
+    """Streams result rows to out as NDJSON or CSV and returns how many were written."""
+    written = 0
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(fields or CSV_FIELDS)
+        rows = csv_rows(rows) if fields is None else ([row.get(field, "") for field in fields] for row in rows)
+        for chunk in chunked(rows):
+            writer.writerows(chunk)
+            written += len(chunk)
+    else:
+        for chunk in chunked(ndjson_lines(rows)):
+            out.writelines(chunk)
+            written += len(chunk)
+    return written
+
+def run_query(manager, file_query, order=None, limit=None, group=None, output_format="ndjson", out=None):
+    """Runs a query against an InventoryManager and streams the results; returns (results written, plan).
+
+    Matching records are streamed from the backend, so memory stays bounded
+    unless the results must be sorted without a limit (or by something no
+    index provides). With group, the matches are summed per group instead and
+    limit keeps the largest groups.
+    """
+    out = out or sys.stdout
+    if group is None:
+        plan, records = manager.query(file_query, order, limit)
+        return write_results(records, output_format, out), plan
+    plan, records = manager.query(file_query)
+    rows = aggregate(records, group)[:limit]
+    fields = ([] if group == "total" else [group]) + ["files", "bytes"]
+    return write_results(rows, output_format, out, fields), plan
+
+def main(arguments):
+    import argparse
+    import contextlib
+
+    parser = argparse.ArgumentParser(
+        prog="python query.py",
+        description="Query an inventory without the menus. Results are written to stdout as NDJSON or CSV; "
+                    "the result count, query time and plan go to stderr.")
+    parser.add_argument("inventory", help="inventory file: .inv, .json, .db/.sqlite or a .shards directory")
+    parser.add_argument("--name", help="file name contains this, ignoring case")
+    parser.add_argument("--glob", help="file name matches this shell pattern, ignoring case (e.g. '*.mkv')")
+    parser.add_argument("--regex", help="file name matches this regular expression")
+    parser.add_argument("--extension", help="file extension, e.g. .iso (ignoring case)")
+    parser.add_argument("--host", help="hostname")
+    parser.add_argument("--prefix", help="only files under this directory")
+    parser.add_argument("--min-size", type=parse_size, help="at least this size, e.g. 100M")
+    parser.add_argument("--max-size", type=parse_size, help="at most this size, e.g. 2G")
+    parser.add_argument("--after", type=parse_time, help="modified at or after this date or timestamp")
+    parser.add_argument("--before", type=parse_time, help="modified before this date or timestamp")
+    parser.add_argument("--sort", choices=sorted(SORT_FIELDS), help="sort by this field")
+    parser.add_argument("--desc", action="store_true", help="sort in descending order")
+    parser.add_argument("--limit", type=int, help="stop after this many results (or groups)")
+    parser.add_argument("--aggregate", choices=sorted(AGGREGATES), help="sum files and bytes per group instead of listing files")
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson", help="output format (default ndjson)")
+    parser.add_argument("--read-only", action="store_true", help="share a .inv snapshot with a process that is scanning into it")
+    options = parser.parse_args(arguments)
+
+    try:
+        file_query = FileQuery(options.name, options.glob, options.regex, options.extension, options.host, options.prefix,
+                               options.min_size, options.max_size, options.after, options.before)
+    except re.error as e:
+        parser.error(f"invalid --regex: {e}")
+    order = (SORT_FIELDS[options.sort], options.desc) if options.sort else None
+
+    # Loading prints progress; keep stdout for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        from inventory import InventoryManager
+        manager = InventoryManager(options.inventory, read_only=options.read_only)
+
+    start = time.perf_counter()
+    try:
+        written, plan = run_query(manager, file_query, order, options.limit, options.aggregate, options.format)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader (e.g. head) stopped early; point stdout at devnull so the exit flush does not fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 0
+    finally:
+        with contextlib.redirect_stdout(sys.stderr):
+            manager.close()
+    elapsed = time.perf_counter() - start
+    print(f"{written} result(s) in {elapsed:.3f}s (plan: {plan})", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    # Examples:
+    #   python query.py file_inventory.inv --extension .iso --min-size 1G --sort size --desc --limit 100
+    #   python query.py file_inventory.db --prefix /share/projects --after 2024-01-01 --format csv > recent.csv
+    #   python query.py file_inventory.inv --glob '*.mkv' --aggregate host
+    sys.exit(main(sys.argv[1:]))
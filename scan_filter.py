@@ -0,0 +1,138 @@
+# This is version Point2N Branch, developed by arrfour
+
+import os
+import json
+import fnmatch
+
+# Directory names pruned by default: VCS metadata, package caches, snapshots and recycle bins
+DEFAULT_EXCLUDED_DIRS = [
+    ".git", ".svn", "node_modules", "__pycache__",
+    ".snapshot", ".snapshots", "#snapshot", "@eaDir",
+    "#recycle", "$RECYCLE.BIN", ".Trash*", "System Volume Information"
+]
+
+class ScanFilter:
+    """Include/exclude rules applied while a directory is being listed.
+
+    Excluded directories are never descended into, and files rejected by
+    extension or glob are skipped before they are stat'ed. Size limits can
+    only be checked after the stat.
+    """
+
+    def __init__(self, extensions=None, include_globs=None, exclude_globs=None,
+                 min_size=None, max_size=None, max_depth=None, exclude_dirs=None):
+        self.extensions = [ext.lower() if ext.startswith(".") else f".{ext.lower()}" for ext in extensions or []]
+        self.include_globs = list(include_globs or [])
+        self.exclude_globs = list(exclude_globs or [])
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_depth = max_depth
+        self.exclude_dirs = list(DEFAULT_EXCLUDED_DIRS if exclude_dirs is None else exclude_dirs)
+        self.excluded_dir_patterns = [name.lower() for name in self.exclude_dirs]
+
+    def to_dict(self):
+        """Returns the filter as a JSON-serializable dict."""
+        return {
+            "extensions": self.extensions,
+            "include_globs": self.include_globs,
+            "exclude_globs": self.exclude_globs,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "max_depth": self.max_depth,
+            "exclude_dirs": self.exclude_dirs
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a filter from a dict produced by to_dict."""
+        return cls(**data)
+
+    def describe(self):
+        """Returns a one-line summary for menus."""
+        parts = []
+        if self.extensions:
+            parts.append("ext " + ",".join(self.extensions))
+        if self.include_globs:
+            parts.append("include " + ",".join(self.include_globs))
+        if self.exclude_globs:
+            parts.append("exclude " + ",".join(self.exclude_globs))
+        if self.min_size is not None:
+            parts.append(f">= {self.min_size}B")
+        if self.max_size is not None:
+            parts.append(f"<= {self.max_size}B")
+        if self.max_depth is not None:
+            parts.append(f"depth <= {self.max_depth}")
+        parts.append(f"{len(self.exclude_dirs)} pruned dir name(s)")
+        return "; ".join(parts)
+
+    def allows_dir(self, name, depth):
+        """Returns True if a subdirectory at the given depth should be descended into."""
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        lowered = name.lower()
+        return not any(fnmatch.fnmatchcase(lowered, pattern) for pattern in self.excluded_dir_patterns)
+
+    def allows_name(self, name):
+        """Returns True if a file passes the extension and glob rules; checked before stat."""
+        if self.extensions and os.path.splitext(name)[1].lower() not in self.extensions:
+            return False
+        if self.include_globs and not any(fnmatch.fnmatch(name, pattern) for pattern in self.include_globs):
+            return False
+        return not any(fnmatch.fnmatch(name, pattern) for pattern in self.exclude_globs)
+
+    def allows_size(self, size):
+        """Returns True if a file size is within the configured limits."""
+        if self.min_size is not None and size < self.min_size:
+            return False
+        return self.max_size is None or size <= self.max_size
+
+    def admits(self, full_path, size, root_dir):
+        """Returns True if a scan of root_dir with this filter would list the file.
+
+        A rescan only treats the stored files it would have listed as deleted
+        when it does not find them; the others were skipped, not deleted.
+        """
+        directory, name = os.path.split(full_path)
+        prefix = os.path.join(root_dir, "")
+        relative = directory[len(prefix):] if directory.startswith(prefix) else ""
+        if relative:
+            for depth, part in enumerate(relative.split(os.sep), start=1):
+                if not self.allows_dir(part, depth):
+                    return False
+        return self.allows_name(name) and self.allows_size(size)
+
+def directory_depth(dir_path, root_dir):
+    """Returns how many levels below root_dir a directory is (0 for the root itself)."""
+    prefix = os.path.join(root_dir, "")
+    if not dir_path.startswith(prefix):
+        return 0
+    relative = dir_path[len(prefix):]
+    return relative.count(os.sep) + 1 if relative else 0
+
+def load_target_filter(target, targets_file="scan_targets.json"):
+    """Returns the filter saved for a scan target, or None if it has none."""
+    try:
+        if os.path.exists(targets_file):
+            with open(targets_file, "r") as f:
+                data = json.load(f).get(target)
+            if data is not None:
+                return ScanFilter.from_dict(data)
+    except Exception as e:
+        print(f"Error loading scan filter for {target}: {e}")
+    return None
+
+def save_target_filter(target, scan_filter, targets_file="scan_targets.json"):
+    """Saves (or, with scan_filter=None, clears) the filter for a scan target."""
+    try:
+        targets = {}
+        if os.path.exists(targets_file):
+            with open(targets_file, "r") as f:
+                targets = json.load(f)
+        if scan_filter is None:
+            targets.pop(target, None)
+        else:
+            targets[target] = scan_filter.to_dict()
+        with open(targets_file, "w") as f:
+            json.dump(targets, f, indent=4)
+    except Exception as e:
+        print(f"Error saving scan filter for {target}: {e}")
@@ -0,0 +1,116 @@
+# This is version Point2N Branch, developed by arrfour
+
+import os
+import json
+import threading
+import datetime
+
+class ScanJournal:
+    """Append-only record stream that also lets an interrupted scan be resumed.
+
+    The journal is a newline-delimited JSON file. The first line describes the
+    scan (root and settings); every following line is one completed directory
+    with its file records, subdirectories and the paths in it that could not be
+    read. Records are written here as they
+    are found rather than collected in memory, and are streamed back from disk
+    when the scan is merged into the inventory. Because a directory and its
+    records are written as a single line, a crash can at worst lose the
+    directory that was being written, which is simply listed again on resume.
+    """
+
+    def __init__(self, journal_file="scan_journal.ndjson"):
+        self.journal_file = journal_file
+        self.lock = threading.Lock()
+        self.handle = None
+
+    def exists(self):
+        """Returns True if an unfinished scan left a journal behind."""
+        return os.path.exists(self.journal_file)
+
+    def start(self, root_dir, settings):
+        """Starts a new journal for a scan of root_dir, discarding any previous one."""
+        self.handle = open(self.journal_file, "w")
+        header = {"root": root_dir, "settings": settings, "started": datetime.datetime.now().isoformat()}
+        self.write_line(header)
+
+    def read_header(self):
+        """Returns the header of the existing journal, or None if it is missing or unreadable."""
+        try:
+            with open(self.journal_file, "r") as f:
+                return json.loads(f.readline())
+        except Exception as e:
+            return None
+
+    def resume(self):
+        """Reads the journal and reopens it for appending.
+
+        Returns (header, pending_dirs, files, total_size, errors): the directories
+        that were discovered but never completed, the count and size of the files
+        already recorded, and the errors logged in the completed directories, so
+        the resumed scan still keeps what they could not read. A partially
+        written last line is cut off first so that new checkpoints start on a
+        clean line.
+        """
+        done = set()
+        discovered = []
+        errors = []
+        files = 0
+        total_size = 0
+        good_offset = 0
+        with open(self.journal_file, "rb") as f:
+            header_line = f.readline()
+            header = json.loads(header_line)
+            good_offset = len(header_line)
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete line")
+                    entry = json.loads(line)
+                except ValueError:
+                    # Partially written last line from the interrupted run
+                    break
+                good_offset += len(line)
+                done.add(entry["path"])
+                discovered.extend(entry["subdirs"])
+                errors.extend(entry.get("errors", []))
+                files += len(entry["records"])
+                total_size += sum(item["file_size_bytes"] for item in entry["records"])
+        os.truncate(self.journal_file, good_offset)
+        pending = [path for path in [header["root"]] + discovered if path not in done]
+        self.handle = open(self.journal_file, "a")
+        return header, pending, files, total_size, errors
+
+    def iter_records(self):
+        """Streams every record in the journal back, one directory line at a time."""
+        with open(self.journal_file, "r") as f:
+            f.readline()  # Header
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                yield from entry["records"]
+
+    def write_line(self, entry):
+        """Appends one JSON line and flushes it so it survives the process dying."""
+        with self.lock:
+            self.handle.write(json.dumps(entry) + "\n")
+            self.handle.flush()
+
+    def directory_done(self, dir_path, records, subdirs, errors=()):
+        """Checkpoints a directory whose listing has completed, with the error log entries it produced."""
+        self.write_line({"path": dir_path, "subdirs": subdirs, "records": records, "errors": list(errors)})
+
+    def close(self):
+        """Closes the journal, keeping it on disk for a later resume."""
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+    def finish(self):
+        """Closes and deletes the journal once the scan has been saved."""
+        self.close()
+        try:
+            os.remove(self.journal_file)
+        except OSError as e:
+            print(f"Error removing scan journal: {e}")
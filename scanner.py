@@ -6,97 +6,478 @@ import string
 from tqdm import tqdm
 from pathlib import Path
 from utils import human_readable_size, print_header
+from dir_cache import DirectoryCache
+from fingerprint import fingerprint_records
+from scan_journal import ScanJournal
+from scan_filter import ScanFilter, directory_depth, load_target_filter
+from io_governor import IOGovernor
+from inventory import format_merge_counts
+import time
 import datetime
 import socket
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import asyncio
+
+# Number of directory listings kept in flight by the threaded scan engine
+DEFAULT_WORKERS = 16
+
+# Upper bound on blocking scandir/stat calls run at once by the asyncio scan engine
+DEFAULT_MAX_THREADS = 64
+
+# Records handed to the asyncio engine's consumer at a time
+DEFAULT_BATCH_SIZE = 1000
+
+# Traversal engines selectable from the scan menu
+SCAN_ENGINES = ["walk", "threads", "async"]
+
+def path_hostname(file_path):
+    """Returns the host that owns a path: the server of a UNC path, otherwise this machine."""
+    if file_path.startswith("\\"):
+        # Network path
+        return file_path.split("\\")[2]
+    # Drive letter or local path
+    return socket.gethostname()
+
+def metadata_from_entry(entry, hostname):
+    """Builds a metadata record from an os.DirEntry, reusing the stat result cached on the entry."""
+    stat_result = entry.stat()
+    modified_timestamp = stat_result.st_mtime
+    return {
+        "file_name": entry.name,
+        "file_extension": os.path.splitext(entry.name)[1],
+        "file_size_bytes": stat_result.st_size,
+        "last_modified_timestamp": modified_timestamp,
+        "last_modified_iso": datetime.datetime.fromtimestamp(modified_timestamp).isoformat(),
+        "full_path": entry.path,
+        "hostname": hostname
+    }
+
+def list_directory(dir_path, hostname, error_log=None, scan_filter=None, depth=0):
+    """Lists a single directory with os.scandir and returns (records, subdirectories).
+
+    Symlinked directories are not followed, matching os.walk. Files that cannot be
+    stat'ed, or whose timestamp cannot be converted to a date, are recorded in
+    error_log (when given) and skipped. With a scan_filter,
+    excluded subdirectories are left out and excluded file names are never stat'ed;
+    depth is the directory's level below the scan root.
+    """
+    records = []
+    subdirs = []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if scan_filter is None or scan_filter.allows_dir(entry.name, depth + 1):
+                        subdirs.append(entry.path)
+                elif (scan_filter is None or scan_filter.allows_name(entry.name)) and entry.is_file():
+                    record = metadata_from_entry(entry, hostname)
+                    if scan_filter is None or scan_filter.allows_size(record["file_size_bytes"]):
+                        records.append(record)
+            except (OSError, ValueError, OverflowError) as e:
+                if error_log is not None:
+                    error_log.append({"file_path": entry.path, "error": str(e)})
+    return records, subdirs
+
+def make_directory_reader(hostname, error_log=None, dir_cache=None, journal=None, scan_filter=None, root_dir=None, governor=None):
+    """Returns a read_directory(dir_path) -> (records, subdirs) function shared by all scan engines.
+
+    The reader applies the scan filter (depths are measured from root_dir), reuses
+    unchanged directories from the incremental cache (if any), checkpoints every
+    completed directory to the scan journal (if any), and logs inaccessible
+    directories instead of raising, so the scan keeps going. With an I/O governor,
+    every directory's filesystem calls wait for a slot and are timed.
+    """
+    def read_directory(dir_path):
+        depth = directory_depth(dir_path, root_dir) if scan_filter is not None and root_dir is not None else 0
+        records, subdirs = [], []
+        errors = []
+        if governor is not None:
+            governor.acquire()
+            started = time.monotonic()
+        try:
+            if dir_cache is None:
+                records, subdirs = list_directory(dir_path, hostname, errors, scan_filter, depth)
+            else:
+                mtime, records, subdirs = dir_cache.lookup(dir_path)
+                if records is None:
+                    records, subdirs = list_directory(dir_path, hostname, errors, scan_filter, depth)
+                    dir_cache.update(dir_path, mtime, records, subdirs)
+        except OSError as e:
+            # Inaccessible directory: log it and keep scanning
+            errors.append({"file_path": dir_path, "error": str(e)})
+            records, subdirs = [], []
+        finally:
+            if governor is not None:
+                governor.release(time.monotonic() - started, 1 + len(records))
+        if error_log is not None:
+            error_log.extend(errors)
+        if journal is not None:
+            # The errors are journaled too, so a resumed scan still keeps what this directory could not read
+            journal.directory_done(dir_path, records, subdirs, errors)
+        return records, subdirs
+    return read_directory
+
+def scan_directory(start_dirs, read_directory, error_log=None):
+    """Yields a metadata record for every file under start_dirs.
+
+    Directories are walked depth-first from an explicit stack, so no full file list
+    is ever built and only the directories still waiting to be listed are held in
+    memory. A directory whose listing fails is recorded in error_log and skipped.
+    """
+    stack = list(reversed(start_dirs))
+    while stack:
+        dir_path = stack.pop()
+        try:
+            records, subdirs = read_directory(dir_path)
+        except Exception as e:
+            if error_log is not None:
+                error_log.append({"file_path": dir_path, "error": str(e)})
+            continue
+        yield from records
+        stack.extend(reversed(subdirs))
+
+def scan_directory_parallel(start_dirs, read_directory, workers=DEFAULT_WORKERS, error_log=None):
+    """Yields a metadata record for every file under start_dirs using a pool of worker threads.
+
+    Workers share a queue of directories still to be listed, so up to `workers`
+    readdir/stat round trips are in flight at once. This pays off on high-latency
+    network mounts where a single thread spends most of its time waiting.
+    Records are yielded in the order directories finish, not in walk order.
+    A directory whose listing fails is recorded in error_log, so the merge keeps
+    what the inventory already has under it instead of treating it as empty.
+    """
+    if not start_dirs:
+        return
+    dir_queue = queue.Queue()
+    results = queue.Queue()
+    stop = threading.Event()
+    lock = threading.Lock()
+    pending = [len(start_dirs)]  # Directories queued or being listed
+
+    def worker():
+        while True:
+            dir_path = dir_queue.get()
+            if dir_path is None or stop.is_set():
+                return
+            try:
+                records, subdirs = read_directory(dir_path)
+            except Exception as e:
+                if error_log is not None:
+                    error_log.append({"file_path": dir_path, "error": str(e)})
+                records, subdirs = [], []
+            with lock:
+                pending[0] += len(subdirs) - 1
+                finished = pending[0] == 0
+            for subdir in subdirs:
+                dir_queue.put(subdir)
+            results.put(records)
+            if finished:
+                results.put(None)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, workers))]
+    for dir_path in start_dirs:
+        dir_queue.put(dir_path)
+    for thread in threads:
+        thread.start()
 
-def extract_metadata(file_path, hostname):
-    """Extracts basic metadata for a given file, including hostname."""
     try:
-        file_name = os.path.basename(file_path)
-        file_extension = os.path.splitext(file_name)[1]
-        file_size_bytes = os.path.getsize(file_path)
-        modified_timestamp = os.path.getmtime(file_path)
-        modified_date = datetime.datetime.fromtimestamp(modified_timestamp).isoformat()
-
-        # Determine hostname for the file
-        if file_path.startswith("\\") or ":\\" in file_path:
-            # Network path or drive letter
-            target_hostname = file_path.split("\\")[2] if file_path.startswith("\\") else socket.gethostname()
-        else:
-            # Local path
-            target_hostname = socket.gethostname()
-
-        return {
-            "file_name": file_name,
-            "file_extension": file_extension,
-            "file_size_bytes": file_size_bytes,
-            "last_modified_timestamp": modified_timestamp,
-            "last_modified_iso": modified_date,
-            "full_path": file_path,
-            "hostname": target_hostname
-        }
-    except Exception as e:
-        return None
+        while True:
+            records = results.get()
+            if records is None:
+                break
+            yield from records
+    finally:
+        stop.set()
+        for _ in threads:
+            dir_queue.put(None)
 
-def traverse_and_extract(root_dir, hostname):
-    """Traverses the directory and extracts metadata for each file."""
-    inventory = []
-    total_size = 0
-    error_log = []
-    all_files = [os.path.join(dp, f) for dp, dn, filenames in os.walk(root_dir) for f in filenames]
+class HostSemaphore(asyncio.Semaphore):
+    """Semaphore that remembers its limit, used to size the walker task pool."""
+
+    def __init__(self, limit):
+        super().__init__(limit)
+        self.limit = limit
+
+async def walk_root(start_dirs, read_directory, semaphore, executor, records_queue, error_log=None):
+    """Walks one root with a pool of tasks sharing a directory queue.
+
+    Every scandir/stat call runs on the bounded executor while holding the
+    root's host semaphore, so shares on the same host share one concurrency limit.
+    A directory whose listing fails is recorded in error_log rather than
+    treated as empty.
+    """
+    loop = asyncio.get_running_loop()
+    dirs = asyncio.Queue()
+    for dir_path in start_dirs:
+        dirs.put_nowait(dir_path)
+
+    async def worker():
+        while True:
+            dir_path = await dirs.get()
+            try:
+                async with semaphore:
+                    records, subdirs = await loop.run_in_executor(executor, read_directory, dir_path)
+            except Exception as e:
+                if error_log is not None:
+                    error_log.append({"file_path": dir_path, "error": str(e)})
+                records, subdirs = [], []
+            for subdir in subdirs:
+                dirs.put_nowait(subdir)
+            if records:
+                await records_queue.put(records)
+            dirs.task_done()
+
+    tasks = [asyncio.create_task(worker()) for _ in range(semaphore.limit)]
+    try:
+        await dirs.join()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+async def batch_records(records_queue, on_batch, batch_size=DEFAULT_BATCH_SIZE):
+    """Consumes records from the walkers and hands them to on_batch in batches."""
+    batch = []
+    while True:
+        records = await records_queue.get()
+        if records is None:
+            break
+        batch.extend(records)
+        if len(batch) >= batch_size:
+            on_batch(batch)
+            batch = []
+    if batch:
+        on_batch(batch)
+
+async def scan_async(roots, on_batch, host_limit=DEFAULT_WORKERS, max_threads=DEFAULT_MAX_THREADS,
+                     batch_size=DEFAULT_BATCH_SIZE, error_log=None, dir_cache=None, journal=None, start_dirs=None,
+                     scan_filters=None, governor=None):
+    """Scans all roots concurrently on one event loop.
+
+    Roots on the same host share a semaphore of host_limit in-flight listings;
+    all blocking filesystem calls share an executor of max_threads threads.
+    start_dirs resumes a single-root scan from its pending directories, and
+    scan_filters maps roots to their ScanFilter.
+    """
+    semaphores = {}
+    records_queue = asyncio.Queue(maxsize=max_threads)
+    consumer = asyncio.create_task(batch_records(records_queue, on_batch, batch_size))
+    with ThreadPoolExecutor(max_workers=max_threads) as executor:
+        walkers = []
+        for root in roots:
+            host = path_hostname(root)
+            if host not in semaphores:
+                semaphores[host] = HostSemaphore(host_limit)
+            scan_filter = (scan_filters or {}).get(root)
+            read_directory = make_directory_reader(host, error_log, dir_cache, journal, scan_filter, root, governor)
+            walkers.append(walk_root(start_dirs if start_dirs is not None else [root], read_directory, semaphores[host], executor, records_queue,
+                                     error_log))
+        try:
+            await asyncio.gather(*walkers)
+        finally:
+            await records_queue.put(None)
+            await consumer
+
+def scan_directory_async(root_dir, host_limit=DEFAULT_WORKERS, error_log=None, dir_cache=None, journal=None, start_dirs=None,
+                         scan_filter=None, governor=None):
+    """Runs scan_async on a background event loop and yields its records.
+
+    This lets the asyncio engine be used anywhere the record generators of the
+    other engines are, e.g. from start_scan.
+    """
+    batches = queue.Queue(maxsize=4)
+    failure = []
 
-    for file_path in tqdm(all_files, desc="Processing files", unit="file"):
+    def run():
         try:
-            metadata = extract_metadata(file_path, hostname)
-            if metadata:
-                inventory.append(metadata)
-                total_size += metadata["file_size_bytes"]
+            asyncio.run(scan_async([root_dir], batches.put, host_limit, error_log=error_log,
+                                   dir_cache=dir_cache, journal=journal, start_dirs=start_dirs,
+                                   scan_filters={root_dir: scan_filter}, governor=governor))
         except Exception as e:
-            error_log.append({"file_path": file_path, "error": str(e)})
+            failure.append(e)
+        finally:
+            batches.put(None)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    while True:
+        batch = batches.get()
+        if batch is None:
+            break
+        yield from batch
+    thread.join()
+    if failure:
+        raise failure[0]
+
+def iter_scan(root_dir, engine="walk", workers=DEFAULT_WORKERS, error_log=None, dir_cache=None, journal=None,
+              start_dirs=None, scan_filter=None, governor=None):
+    """Returns a record generator for root_dir using the selected traversal engine.
 
+    The hostname recorded on every file is resolved once from root_dir. When
+    start_dirs is given, the walk starts from those directories instead of the
+    root, which is how an interrupted scan is resumed (and how a shard of a
+    larger root is scanned, with filter depths still measured from root_dir).
+    """
+    if start_dirs is None:
+        start_dirs = [root_dir]
+    if engine == "async":
+        return scan_directory_async(root_dir, workers, error_log, dir_cache, journal, start_dirs, scan_filter, governor)
+    read_directory = make_directory_reader(path_hostname(root_dir), error_log, dir_cache, journal, scan_filter, root_dir, governor)
+    if engine == "threads":
+        return scan_directory_parallel(start_dirs, read_directory, workers, error_log)
+    return scan_directory(start_dirs, read_directory, error_log)
+
+def write_error_log(error_log):
+    """Saves scan errors to error_log.json."""
     if error_log:
         with open("error_log.json", "w") as f:
             json.dump(error_log, f, indent=4)
 
-    return inventory, total_size
+def traverse_and_stream(root_dir, journal, engine="walk", workers=DEFAULT_WORKERS, dir_cache=None, start_dirs=None,
+                        scan_filter=None, governor=None):
+    """Traverses the directory, writing records to the scan journal instead of a list.
+
+    Returns (files, total_size, error_log, complete); the records themselves are
+    read back with journal.iter_records(). complete is False when the traversal
+    itself failed partway, in which case root_dir is also in error_log.
+    """
+    files = 0
+    total_size = 0
+    error_log = []
+    complete = True
+
+    try:
+        for metadata in tqdm(iter_scan(root_dir, engine, workers, error_log, dir_cache, journal, start_dirs, scan_filter, governor), desc="Processing files", unit="file"):
+            files += 1
+            total_size += metadata["file_size_bytes"]
+    except Exception as e:
+        print(f"Error scanning {root_dir}: {e}")
+        error_log.append({"file_path": root_dir, "error": str(e)})
+        complete = False
+
+    write_error_log(error_log)
 
-def start_scan(folder, inventory_manager):
-    """Starts the scanning process for a given folder."""
-    print_header(f"Scanning: {folder}")
+    return files, total_size, error_log, complete
 
-    # Determine hostname based on the operating system
+def detect_hostname():
+    """Determines the hostname based on the operating system."""
     if os.name == 'nt':  # Windows
-        hostname = os.getenv('COMPUTERNAME', 'Unknown Host')
+        return os.getenv('COMPUTERNAME', 'Unknown Host')
     elif os.name == 'posix':  # Linux or macOS
         try:
-            hostname = socket.gethostname()
+            return socket.gethostname()
         except Exception as e:
-            hostname = "Unknown Host"
-    else:
-        hostname = "Unknown Host"
+            return "Unknown Host"
+    return "Unknown Host"
+
+def start_scan(folder, inventory_manager, engine="walk", workers=DEFAULT_WORKERS, incremental=False, fingerprint=False, resume=False,
+               scan_filter=None, latency_budget=None):
+    """Starts the scanning process for a given folder.
+
+    With incremental=True, directories whose mtime and entry count are unchanged
+    since the previous incremental scan are not listed again; their records are
+    carried over from the current inventory. With fingerprint=True, files under
+    the folder that may have duplicates there are given a content_hash.
+
+    Progress is checkpointed to the scan journal as directories complete. If the
+    scan is interrupted, resume=True continues it from the journal instead of
+    starting over.
+
+    scan_filter defaults to the filter saved for this folder in scan_targets.json.
+    latency_budget (milliseconds per filesystem call) turns on the I/O governor,
+    which adapts concurrency and request rate to stay within the budget.
+    """
+    print_header(f"{'Resuming' if resume else 'Scanning'}: {folder}")
+
+    hostname = detect_hostname()
 
     # Debug log: Hostname detection
     print(f"DEBUG: Detected hostname: {hostname}")
 
     # Debug log: Start scanning
-    print(f"DEBUG: Starting scan for folder: {folder}")
+    print(f"DEBUG: Starting scan for folder: {folder} (engine: {engine}, workers: {workers})")
 
-    new_inventory, total_size = traverse_and_extract(folder, hostname)
+    if scan_filter is None:
+        scan_filter = load_target_filter(folder)
+    if scan_filter is not None:
+        print(f"DEBUG: Scan filter: {scan_filter.describe()}")
+
+    journal = ScanJournal()
+    if resume:
+        header, start_dirs, resumed_files, resumed_size, resumed_errors = journal.resume()
+        print(f"DEBUG: Resuming scan started {header['started']}: {resumed_files} files already found, {len(start_dirs)} directories left.")
+    else:
+        journal.start(folder, {
+            "engine": engine, "workers": workers, "incremental": incremental, "fingerprint": fingerprint,
+            "scan_filter": scan_filter.to_dict() if scan_filter is not None else None,
+            "latency_budget": latency_budget
+        })
+        start_dirs, resumed_files, resumed_size, resumed_errors = None, 0, 0, []
+
+    dir_cache = None
+    if incremental:
+        dir_cache = DirectoryCache()
+        dir_cache.prepare(folder, inventory_manager.records_under(folder), scan_filter.to_dict() if scan_filter is not None else None)
+
+    governor = None
+    if latency_budget:
+        governor = IOGovernor(latency_budget / 1000, workers)
+
+    try:
+        files_found, total_size, error_log, complete = traverse_and_stream(folder, journal, engine, workers, dir_cache, start_dirs,
+                                                                           scan_filter, governor)
+    except KeyboardInterrupt:
+        journal.close()
+        print("\nScan interrupted. Progress was saved; choose 'Resume last scan' to continue.")
+        return
+    journal.close()
+    files_found += resumed_files
+    total_size += resumed_size
+    if resumed_errors:
+        error_log = resumed_errors + error_log
+        write_error_log(error_log)
+
+    if dir_cache is not None:
+        dir_cache.save_cache(folder)
+        print(f"DEBUG: Incremental scan reused {len(dir_cache.reused)} unchanged directories.")
 
     # Debug log: Scan results
-    print(f"DEBUG: Scan completed. Files found: {len(new_inventory)}, Total size: {total_size}")
+    print(f"DEBUG: Scan completed. Files found: {files_found}, Total size: {total_size}")
+    if governor is not None:
+        print(f"✔ I/O governor: {governor.report()}")
 
-    if new_inventory:
-        inventory_manager.merge_inventory(new_inventory)
+    # The scan replaces what was recorded under the folder for its host, so files deleted since the last
+    # scan are removed; paths that could not be read this time or that the filter skipped are kept, and a
+    # scan that failed partway removes nothing. Records are streamed from the journal rather than held in a list.
+    inventory_manager.add_scan_root(folder)
+    merge_counts = inventory_manager.replace_scan(folder, path_hostname(folder), journal.iter_records(),
+                                                  keep=[error["file_path"] for error in error_log], save=False,
+                                                  complete=complete, scan_filter=scan_filter)
 
+    if files_found:
         # Debug log: Inventory merged
         print(f"DEBUG: Inventory merged. Total files in inventory: {len(inventory_manager.inventory)}")
 
-        inventory_manager.save_inventory()
+        if fingerprint:
+            # Only the scanned host's files under the folder are read; other hosts' paths may not exist
+            # here, or name different files
+            scan_host = path_hostname(folder)
+            records = [item for item in inventory_manager.records_under(folder) if item.get("hostname") == scan_host]
+            previous_hashes = [item.get("content_hash") for item in records]
+            fingerprinted = fingerprint_records(records, root=folder)
+            # Write back only the records whose hash changed
+            hashed = [item for item, previous in zip(records, previous_hashes) if item.get("content_hash") != previous]
+            inventory_manager.merge_inventory(hashed, save=False)
+            print(f"DEBUG: Fingerprinted {fingerprinted} duplicate candidates.")
+
+    inventory_manager.save_inventory()
 
-        # Debug log: Inventory saved
-        print(f"DEBUG: Inventory saved to {inventory_manager.output_file}")
+    # Debug log: Inventory saved
+    print(f"DEBUG: Inventory saved to {inventory_manager.output_file}")
 
+    if files_found:
         # Update last scan timestamp
         update_last_scan()
 
@@ -104,10 +485,142 @@ def start_scan(folder, inventory_manager):
         print(f"✔ Total data size: {human_readable_size(total_size)}")
     else:
         print("No files were found during the scan.")
+    if merge_counts is not None:
+        print(f"✔ Files: {format_merge_counts(merge_counts)}")
+
+    # The scan is safely in the inventory; the checkpoints are no longer needed
+    journal.finish()
 
     # Debugging helper: Ensure `merge_inventory` is functioning correctly
     print(f"DEBUG: Final inventory size: {len(inventory_manager.inventory)}")
 
+def resume_scan(inventory_manager):
+    """Resumes the scan recorded in the scan journal, using its original settings."""
+    header = ScanJournal().read_header()
+    if header is None:
+        print("No interrupted scan to resume.")
+        return
+    settings = dict(header["settings"])
+    if settings.get("scan_filter") is not None:
+        settings["scan_filter"] = ScanFilter.from_dict(settings["scan_filter"])
+    start_scan(header["root"], inventory_manager, resume=True, **settings)
+
+def scan_shard(shard_path, root_dir, engine="walk", workers=DEFAULT_WORKERS, scan_filter=None, latency_budget=None):
+    """Scans one shard of root_dir in a worker process.
+
+    Returns (records, total_size, error_log, calls), where calls counts the
+    filesystem calls made under the shard's I/O governor (0 without one).
+    """
+    error_log = []
+    governor = IOGovernor(latency_budget / 1000, workers) if latency_budget else None
+    records = list(iter_scan(root_dir, engine, workers, error_log, start_dirs=[shard_path],
+                             scan_filter=scan_filter, governor=governor))
+    return records, sum(item["file_size_bytes"] for item in records), error_log, governor.calls if governor else 0
+
+def plan_shards(roots, error_log, scan_filters=None):
+    """Splits roots into (shard_path, root) shards: one per top-level subdirectory of each root.
+
+    Files sitting directly in a root are listed here, in the parent process, and
+    returned alongside the shards.
+    """
+    root_records = []
+    shards = []
+    for root in roots:
+        try:
+            records, subdirs = list_directory(root, path_hostname(root), error_log, (scan_filters or {}).get(root))
+        except OSError as e:
+            error_log.append({"file_path": root, "error": str(e)})
+            continue
+        root_records.extend(records)
+        shards.extend((subdir, root) for subdir in subdirs)
+    return root_records, shards
+
+def scan_roots(roots, inventory_manager, processes=None, engine="walk", workers=DEFAULT_WORKERS, latency_budget=None):
+    """Scans several roots (drives, mounts or folders) at once on a process pool.
+
+    Each top-level subdirectory of every root becomes a shard scanned by its own
+    worker process. Shard results are merged into the inventory in one pass and
+    saved once, instead of running one start_scan per root. With engine="async"
+    all roots are instead walked on one event loop with per-host limits. Each
+    root uses the filter saved for it in scan_targets.json, if any. latency_budget
+    (milliseconds per filesystem call) throttles every shard with its own governor.
+    """
+    print_header(f"Scanning {len(roots)} root(s)")
+    print(f"DEBUG: Starting multi-root scan for: {', '.join(roots)} (processes: {processes or os.cpu_count()})")
+
+    error_log = []
+    scan_filters = {root: load_target_filter(root) for root in roots}
+    started = time.monotonic()
+    calls = 0
+    complete = True
+    if engine == "async":
+        # A single event loop covers every root, so there is nothing to shard
+        new_inventory = []
+        with tqdm(desc="Processing files", unit="file") as progress:
+            def add_batch(batch):
+                new_inventory.extend(batch)
+                progress.update(len(batch))
+            governor = IOGovernor(latency_budget / 1000, workers) if latency_budget else None
+            try:
+                asyncio.run(scan_async(roots, add_batch, workers, error_log=error_log, scan_filters=scan_filters, governor=governor))
+            except Exception as e:
+                print(f"Error scanning {', '.join(roots)}: {e}")
+                error_log.extend({"file_path": root, "error": str(e)} for root in roots)
+                complete = False
+            calls = governor.calls if governor else 0
+        total_size = sum(item["file_size_bytes"] for item in new_inventory)
+        print(f"DEBUG: Async multi-root scan completed. Files found: {len(new_inventory)}, Total size: {total_size}")
+    else:
+        new_inventory, shards = plan_shards(roots, error_log, scan_filters)
+        total_size = sum(item["file_size_bytes"] for item in new_inventory)
+
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {
+                executor.submit(scan_shard, shard, root, engine, workers, scan_filters[root], latency_budget): shard
+                for shard, root in shards
+            }
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Scanning shards", unit="shard"):
+                try:
+                    records, shard_size, shard_errors, shard_calls = future.result()
+                except Exception as e:
+                    error_log.append({"file_path": futures[future], "error": str(e)})
+                    continue
+                new_inventory.extend(records)
+                total_size += shard_size
+                error_log.extend(shard_errors)
+                calls += shard_calls
+        print(f"DEBUG: Multi-root scan completed. Shards: {len(shards)}, Files found: {len(new_inventory)}, Total size: {total_size}")
+
+    write_error_log(error_log)
+    if latency_budget:
+        print(f"✔ I/O governor: {calls / max(time.monotonic() - started, 1e-9):.0f} calls/s effective across all roots (budget {latency_budget} ms)")
+
+    # Each root's scan replaces what was recorded under it, so deleted files are removed; paths that
+    # could not be read are kept, and a root that could not be listed at all (or whose scan failed
+    # partway) keeps everything under it
+    keep = [error["file_path"] for error in error_log]
+    for root in roots:
+        inventory_manager.add_scan_root(root)
+    totals = None
+    for root in roots:
+        prefix = os.path.join(root, "")
+        root_records = (item for item in new_inventory if item["full_path"].startswith(prefix))
+        counts = inventory_manager.replace_scan(root, path_hostname(root), root_records, keep, save=False, complete=complete,
+                                                scan_filter=scan_filters[root])
+        if counts is not None:
+            totals = counts if totals is None else {outcome: totals[outcome] + count for outcome, count in counts.items()}
+    # The merged inventory is saved once
+    inventory_manager.save_inventory()
+
+    if new_inventory:
+        update_last_scan()
+        print(f"✔ Metadata extracted and saved to: {inventory_manager.output_file}")
+        print(f"✔ Total data size: {human_readable_size(total_size)}")
+    else:
+        print("No files were found during the scan.")
+    if totals is not None:
+        print(f"✔ Files: {format_merge_counts(totals)}")
+
 def update_last_scan():
     """Updates the last scan timestamp in a JSON file."""
     scan_file = "last_scan.json"
@@ -0,0 +1,527 @@
+# This is version Point2N Branch, developed by arrfour
+
+import os
+import sys
+import json
+import mmap
+import struct
+import bisect
+from array import array
+from columnar import ColumnarInventory, PathIndex, PathStore, StringTable, TrigramIndex
+
+# File signature and format version of binary inventory snapshots
+MAGIC = b"NASINV\x00\x04"
+
+# Older versions that are still read: version 3 had no name index, version 2 no
+# path index either, and version 1 also stored every directory as a full path string
+MAGIC_V3 = b"NASINV\x00\x03"
+MAGIC_V2 = b"NASINV\x00\x02"
+MAGIC_V1 = b"NASINV\x00\x01"
+
+# magic, byte order (0 little, 1 big), row count, total size in bytes, newest mtime, distinct hosts
+HEADER = struct.Struct("<8sB7xQQdQ")
+
+# Sections in file order; each has an (offset, length) entry in the table after the header.
+# The directory trie is stored as its component strings plus one parent id and one component id per node,
+# path_index holds the slots of the PathIndex over the rows, and the trigram sections the postings of
+# the TrigramIndex over the file names.
+SECTIONS = ["hosts", "extensions", "dir_components", "dir_parents", "dir_component_ids", "names",
+            "sizes", "mtimes", "host_ids", "ext_ids", "dir_ids", "extras", "path_index",
+            "trigram_keys", "trigram_offsets", "trigram_rows"]
+SECTIONS_V3 = SECTIONS[:-3]
+SECTIONS_V2 = SECTIONS_V3[:-1]
+SECTIONS_V1 = ["hosts", "extensions", "directories", "names", "sizes", "mtimes", "host_ids", "ext_ids", "dir_ids", "extras"]
+FORMATS = {MAGIC: SECTIONS, MAGIC_V3: SECTIONS_V3, MAGIC_V2: SECTIONS_V2, MAGIC_V1: SECTIONS_V1}
+SECTION_ENTRY = struct.Struct("<QQ")
+
+# Typecode of every fixed-width numeric column
+NUMERIC_COLUMNS = {"sizes": "q", "mtimes": "d", "host_ids": "I", "ext_ids": "I", "dir_ids": "I"}
+
+# Typecode of the fixed-width sections of the directory trie
+TRIE_COLUMNS = {"dir_parents": "i", "dir_component_ids": "I"}
+
+# Typecode of the path index slots
+INDEX_TYPECODE = "I"
+
+# Typecodes of the fixed-width sections of the trigram index
+TRIGRAM_COLUMNS = {"trigram_offsets": "Q", "trigram_rows": "I"}
+
+def padding(length):
+    """Returns the bytes needed to keep the next section 8-byte aligned."""
+    return b"\0" * (-length % 8)
+
+def encode_strings(values):
+    """Encodes strings as a count, an offset index (count + 1 entries) and one UTF-8 blob."""
+    encoded = [value.encode("utf-8", "surrogateescape") for value in values]
+    offsets = array("Q", [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return struct.pack("<Q", len(encoded)) + offsets.tobytes() + b"".join(encoded)
+
+def encode_extras(extras):
+    """Encodes the per-row extra fields as sorted row numbers plus an offset-indexed JSON blob."""
+    rows = array("Q", sorted(extras))
+    blobs = [json.dumps(extras[row]).encode("utf-8") for row in rows]
+    offsets = array("Q", [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    return struct.pack("<Q", len(rows)) + rows.tobytes() + offsets.tobytes() + b"".join(blobs)
+
+def generation_file(snapshot_file):
+    return snapshot_file + ".gen"
+
+def read_published(snapshot_file):
+    """Returns (generation, path) of the published snapshot; generation 0 if none was ever published.
+
+    The generation file holds the generation number, followed on a second line
+    by the name of the file it was written to when that is not snapshot_file
+    itself (see write_snapshot).
+    """
+    try:
+        with open(generation_file(snapshot_file), "r") as f:
+            lines = f.read().split("\n")
+        generation = int(lines[0])
+    except (FileNotFoundError, ValueError):
+        return 0, snapshot_file
+    if len(lines) > 1 and lines[1]:
+        return generation, os.path.join(os.path.dirname(snapshot_file), lines[1])
+    return generation, snapshot_file
+
+def read_generation(snapshot_file):
+    """Returns the generation of the published snapshot, or 0 if none was ever published."""
+    return read_published(snapshot_file)[0]
+
+def current_snapshot(snapshot_file):
+    """Returns the path of the file holding the published snapshot."""
+    return read_published(snapshot_file)[1]
+
+def publish_generation(snapshot_file, generation, published_file):
+    """Records a new generation and the file it was written to, so readers sharing the snapshot remap."""
+    temp_file = generation_file(snapshot_file) + ".tmp"
+    with open(temp_file, "w") as f:
+        f.write(str(generation))
+        if published_file != snapshot_file:
+            f.write("\n" + os.path.basename(published_file))
+    os.replace(temp_file, generation_file(snapshot_file))
+    return generation
+
+def reader_file(snapshot_file, pid=None):
+    """Returns the registration file of a read-only process sharing the snapshot."""
+    return f"{snapshot_file}.reader-{os.getpid() if pid is None else pid}"
+
+def register_reader(snapshot_file):
+    """Tells writers that this process shares the snapshot, so they publish every save."""
+    try:
+        with open(reader_file(snapshot_file), "w"):
+            pass
+    except OSError as e:
+        # The reader still works; it just only sees the snapshots the writer compacts anyway
+        print(f"Error registering as a reader of {snapshot_file}: {e}")
+
+def unregister_reader(snapshot_file):
+    try:
+        os.remove(reader_file(snapshot_file))
+    except FileNotFoundError:
+        pass
+
+def has_readers(snapshot_file):
+    """Returns True if a read-only process has registered to share the snapshot.
+
+    On POSIX, registrations left by readers that died are removed here; on
+    Windows they stay until deleted, which only costs extra publishing.
+    """
+    directory = os.path.dirname(snapshot_file)
+    prefix = os.path.basename(snapshot_file) + ".reader-"
+    try:
+        names = os.listdir(directory or ".")
+    except FileNotFoundError:
+        return False
+    for name in names:
+        if not name.startswith(prefix) or not name[len(prefix):].isdigit():
+            continue
+        if os.name != 'nt':
+            try:
+                os.kill(int(name[len(prefix):]), 0)
+            except ProcessLookupError:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+                continue
+            except PermissionError:
+                # Alive, but owned by another user
+                pass
+        return True
+    return False
+
+def generation_files(snapshot_file):
+    """Returns the snapshot files written under a generation name (snapshot_file.<generation>)."""
+    directory = os.path.dirname(snapshot_file)
+    prefix = os.path.basename(snapshot_file) + "."
+    try:
+        names = os.listdir(directory or ".")
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, name) for name in names if name.startswith(prefix) and name[len(prefix):].isdigit()]
+
+def remove_stale_generations(snapshot_file, published_file):
+    """Deletes generation-named snapshot files other than the published one that no reader still holds open."""
+    for path in generation_files(snapshot_file):
+        if path != published_file:
+            try:
+                os.remove(path)
+            except OSError:
+                # Still mapped by a reader (Windows); a later save removes it
+                pass
+
+def write_snapshot(columns, snapshot_file):
+    """Writes a columnar inventory as a binary snapshot.
+
+    Host and extension tables are compacted to the entries still in use, and
+    the directory trie to the directories in use and their parents. The name
+    index is built here if the inventory has none yet. The file is
+    written to a temporary path, fsynced and renamed over snapshot_file, so
+    readers never see a partial snapshot, and then the generation is bumped.
+    Processes that still map the previous snapshot keep reading it intact
+    until they remap.
+
+    Windows refuses to replace a file another process has open or mapped, as
+    a read-only reader does. The new generation is then written to
+    snapshot_file.<generation> instead, and the generation file names it;
+    readers open whatever current_snapshot() returns. Generation-named files
+    are deleted once no reader maps them and a later save has replaced
+    snapshot_file again.
+    """
+    remapped = {}
+    tables = {}
+    for name, column in (("hosts", "host_ids"), ("extensions", "ext_ids")):
+        table = getattr(columns, name)
+        used = sorted(set(getattr(columns, column)))
+        new_ids = {old_id: new_id for new_id, old_id in enumerate(used)}
+        tables[name] = [table[old_id] for old_id in used]
+        remapped[column] = array("I", (new_ids[old_id] for old_id in getattr(columns, column)))
+
+    # Parents come before their children, so sorting the kept nodes keeps that order
+    directories = columns.directories
+    used = sorted(directories.ancestors(set(columns.dir_ids)))
+    new_ids = {old_id: new_id for new_id, old_id in enumerate(used)}
+    used_components = sorted(set(directories.component_ids[node] for node in used))
+    new_components = {old_id: new_id for new_id, old_id in enumerate(used_components)}
+    parents = array("i", (new_ids[directories.parents[node]] if directories.parents[node] >= 0 else -1 for node in used))
+    component_ids = array("I", (new_components[directories.component_ids[node]] for node in used))
+    remapped["dir_ids"] = array("I", (new_ids[old_id] for old_id in columns.dir_ids))
+
+    # Rows keep their numbers, so the name index carries over as is
+    trigram_keys, trigram_offsets, trigram_rows = columns.trigram_index().packed()
+
+    sections = {
+        "hosts": encode_strings(tables["hosts"]),
+        "extensions": encode_strings(tables["extensions"]),
+        "dir_components": encode_strings([directories.components[old_id] for old_id in used_components]),
+        "dir_parents": parents.tobytes(),
+        "dir_component_ids": component_ids.tobytes(),
+        "names": encode_strings(columns.names),
+        "extras": encode_extras(columns.extras),
+        # Built against the renumbered directory ids, so the mapped index works as is
+        "path_index": PathIndex(remapped["dir_ids"], columns.names).slots.tobytes(),
+        "trigram_keys": encode_strings(trigram_keys),
+        "trigram_offsets": trigram_offsets.tobytes(),
+        "trigram_rows": trigram_rows.tobytes()
+    }
+    for column, typecode in NUMERIC_COLUMNS.items():
+        values = remapped.get(column)
+        if values is None:
+            values = array(typecode, getattr(columns, column))
+        sections[column] = values.tobytes()
+
+    header = HEADER.pack(MAGIC, 0 if sys.byteorder == "little" else 1, len(columns.names),
+                         sum(columns.sizes), max(columns.mtimes, default=0.0), len(tables["hosts"]))
+    offset = HEADER.size + SECTION_ENTRY.size * len(SECTIONS)
+    table = b""
+    for name in SECTIONS:
+        table += SECTION_ENTRY.pack(offset, len(sections[name]))
+        offset += len(sections[name]) + len(padding(len(sections[name])))
+
+    temp_file = snapshot_file + ".tmp"
+    with open(temp_file, "wb") as f:
+        f.write(header)
+        f.write(table)
+        for name in SECTIONS:
+            f.write(sections[name])
+            f.write(padding(len(sections[name])))
+        f.flush()
+        os.fsync(f.fileno())
+    generation = read_generation(snapshot_file) + 1
+    published_file = snapshot_file
+    try:
+        os.replace(temp_file, snapshot_file)
+    except PermissionError:
+        # snapshot_file is mapped by a reader (Windows): publish this generation under its own name
+        published_file = f"{snapshot_file}.{generation}"
+        os.replace(temp_file, published_file)
+    publish_generation(snapshot_file, generation, published_file)
+    remove_stale_generations(snapshot_file, published_file)
+
+class SnapshotStrings:
+    """A string table or column decoded from the mapped snapshot one entry at a time."""
+
+    def __init__(self, buffer, offset):
+        count = struct.unpack_from("<Q", buffer, offset)[0]
+        index_start = offset + 8
+        self.offsets = buffer[index_start:index_start + 8 * (count + 1)].cast("Q")
+        self.blob_start = index_start + 8 * (count + 1)
+        self.buffer = buffer
+        self.count = count
+        self.ids = None
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        start = self.blob_start + self.offsets[index]
+        end = self.blob_start + self.offsets[index + 1]
+        return bytes(self.buffer[start:end]).decode("utf-8", "surrogateescape")
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    @property
+    def values(self):
+        return self
+
+    def get(self, value):
+        """Returns the id of value, building the reverse lookup on first use."""
+        if self.ids is None:
+            self.ids = {string: string_id for string_id, string in enumerate(self)}
+        return self.ids.get(value)
+
+    def release(self):
+        self.offsets.release()
+
+class SnapshotExtras:
+    """The extra fields of the rows that have any, decoded from the mapped snapshot on demand."""
+
+    def __init__(self, buffer, offset):
+        count = struct.unpack_from("<Q", buffer, offset)[0]
+        rows_start = offset + 8
+        offsets_start = rows_start + 8 * count
+        self.rows = buffer[rows_start:offsets_start].cast("Q")
+        self.offsets = buffer[offsets_start:offsets_start + 8 * (count + 1)].cast("Q")
+        self.blob_start = offsets_start + 8 * (count + 1)
+        self.buffer = buffer
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, row):
+        return self.position(row) is not None
+
+    def position(self, row):
+        position = bisect.bisect_left(self.rows, row)
+        if position < len(self.rows) and self.rows[position] == row:
+            return position
+        return None
+
+    def decode(self, position):
+        start = self.blob_start + self.offsets[position]
+        end = self.blob_start + self.offsets[position + 1]
+        return json.loads(bytes(self.buffer[start:end]))
+
+    def get(self, row, default=None):
+        position = self.position(row)
+        return default if position is None else self.decode(position)
+
+    def __getitem__(self, row):
+        position = self.position(row)
+        if position is None:
+            raise KeyError(row)
+        return self.decode(position)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def items(self):
+        for position, row in enumerate(self.rows):
+            yield row, self.decode(position)
+
+    def release(self):
+        self.rows.release()
+        self.offsets.release()
+
+class SnapshotView(ColumnarInventory):
+    """Read-only inventory backed by a memory-mapped binary snapshot.
+
+    Opening a snapshot only parses the header and the section table; numeric
+    columns are memoryviews straight into the mapping and strings are decoded
+    when a record is built, so opening costs the same whatever the inventory
+    size. The header carries the row count, total size, newest modification
+    time and host count, so the summary totals, the hostnames and the newest
+    file need no pass over the rows. The
+    directory trie, the path index and the name index are mapped the same way,
+    so finding a path or searching names after a reload needs no index build.
+    Version 1 snapshots, which stored full directory paths, are read by
+    rebuilding the trie on open; indexes a snapshot lacks are built on first use. Every
+    read-only method of ColumnarInventory works on the view; materialize()
+    copies it into a regular, writable ColumnarInventory.
+    """
+
+    def __init__(self, snapshot_file):
+        self.snapshot_file = snapshot_file
+        self.file = open(snapshot_file, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.map)
+        self.raw_columns = {}
+        magic, byte_order, self.row_count, self.size_total, self.newest_mtime, self.host_count = HEADER.unpack_from(self.buffer, 0)
+        if magic not in FORMATS:
+            self.close()
+            raise ValueError(f"{snapshot_file} is not an inventory snapshot")
+        self.swapped = byte_order != (0 if sys.byteorder == "little" else 1)
+        sections = {}
+        for i, name in enumerate(FORMATS[magic]):
+            sections[name] = SECTION_ENTRY.unpack_from(self.buffer, HEADER.size + i * SECTION_ENTRY.size)
+
+        self.hosts = SnapshotStrings(self.buffer, sections["hosts"][0])
+        self.extensions = SnapshotStrings(self.buffer, sections["extensions"][0])
+        self.names = SnapshotStrings(self.buffer, sections["names"][0])
+        self.extras = SnapshotExtras(self.buffer, sections["extras"][0])
+        for column, typecode in NUMERIC_COLUMNS.items():
+            setattr(self, column, self.numeric_section(sections[column], column, typecode))
+        self.mtimes_section = sections["mtimes"]
+        if magic != MAGIC_V1:
+            self.directories = PathStore(
+                SnapshotStrings(self.buffer, sections["dir_components"][0]),
+                *(self.numeric_section(sections[name], name, typecode) for name, typecode in TRIE_COLUMNS.items())
+            )
+        else:
+            # Version 1 kept full directory paths: rebuild the trie from them once and renumber the rows
+            directory_strings = SnapshotStrings(self.buffer, sections["directories"][0])
+            self.directories = PathStore()
+            new_ids = [self.directories.intern(directory) for directory in directory_strings]
+            directory_strings.release()
+            old_ids = self.dir_ids
+            self.dir_ids = array("I", (new_ids[dir_id] for dir_id in old_ids))
+            if isinstance(old_ids, memoryview):
+                old_ids.release()
+                self.raw_columns.pop("dir_ids").release()
+        self.positions = None
+        if "path_index" in sections:
+            self.positions = PathIndex(self.dir_ids, self.names,
+                                       self.numeric_section(sections["path_index"], "path_index", INDEX_TYPECODE))
+        self.size_order = None
+        self.dir_rows = None
+        self.rollup = None
+        self.summary = None
+        self.trigrams = None
+        if "trigram_keys" in sections:
+            trigram_keys = SnapshotStrings(self.buffer, sections["trigram_keys"][0])
+            if len(trigram_keys):
+                self.trigrams = TrigramIndex(self.names, trigram_keys, *(
+                    self.numeric_section(sections[name], name, typecode) for name, typecode in TRIGRAM_COLUMNS.items()))
+            else:
+                trigram_keys.release()
+
+    def numeric_section(self, section, name, typecode):
+        """Returns a fixed-width section as a memoryview into the mapping, or as an array if it needs byte swapping."""
+        offset, length = section
+        raw = self.buffer[offset:offset + length]
+        if self.swapped:
+            # Written on a machine of the other byte order: decode into a regular array instead
+            values = array(typecode)
+            values.frombytes(raw)
+            values.byteswap()
+            raw.release()
+            return values
+        self.raw_columns[name] = raw
+        return raw.cast(typecode)
+
+    def __len__(self):
+        return self.row_count
+
+    def total_size(self):
+        return self.size_total
+
+    def hostnames(self):
+        # Snapshots keep only the hosts still in use, so the host table holds exactly host_count names
+        return sorted(self.hosts[host_id] for host_id in range(self.host_count))
+
+    def most_recent_row(self):
+        """Returns the first row with the newest mtime of the header, found by a byte search of the mapped column."""
+        if not self.row_count:
+            return None
+        if self.swapped:
+            return self.mtimes.index(self.newest_mtime)
+        offset, length = self.mtimes_section
+        needle = struct.pack("=d", self.newest_mtime)
+        position = self.map.find(needle, offset, offset + length)
+        while position >= 0 and (position - offset) % len(needle):
+            position = self.map.find(needle, position + 1, offset + length)
+        if position < 0:
+            # Only a newest mtime that compares equal without the same bytes (0.0 and -0.0) gets here
+            return super().most_recent_row()
+        return (position - offset) // len(needle)
+
+    def materialize(self):
+        """Copies the snapshot into a writable ColumnarInventory."""
+        columns = ColumnarInventory()
+        for name in ("hosts", "extensions"):
+            setattr(columns, name, self.copy_strings(getattr(self, name)))
+        directories = self.directories
+        if isinstance(directories.components, SnapshotStrings):
+            columns.directories = PathStore(self.copy_strings(directories.components),
+                                            self.copy_numeric("dir_parents", directories.parents),
+                                            self.copy_numeric("dir_component_ids", directories.component_ids))
+        else:
+            columns.directories = directories
+        columns.names = list(self.names)
+        for column in NUMERIC_COLUMNS:
+            setattr(columns, column, self.copy_numeric(column, getattr(self, column)))
+        columns.extras = dict(self.extras.items())
+        if self.positions is not None:
+            # The index slots only point at rows, so they carry over to the copied columns unchanged
+            columns.positions = PathIndex(columns.dir_ids, columns.names, self.copy_numeric("path_index", self.positions.slots))
+        if self.trigrams is not None:
+            columns.trigrams = TrigramIndex(columns.names, list(self.trigrams.keys),
+                                            self.copy_numeric("trigram_offsets", self.trigrams.offsets),
+                                            self.copy_numeric("trigram_rows", self.trigrams.rows))
+        return columns
+
+    @staticmethod
+    def copy_strings(strings):
+        table = StringTable()
+        table.values = list(strings)
+        table.ids = {value: string_id for string_id, value in enumerate(table.values)}
+        return table
+
+    def copy_numeric(self, name, values):
+        copied = array(NUMERIC_COLUMNS.get(name) or TRIE_COLUMNS.get(name) or TRIGRAM_COLUMNS.get(name) or INDEX_TYPECODE)
+        raw = self.raw_columns.get(name)
+        if raw is not None:
+            copied.frombytes(raw)
+        else:
+            copied.extend(values)
+        return copied
+
+    def close(self):
+        """Releases the mapping; the view must not be used afterwards."""
+        for name in ("hosts", "extensions", "names", "extras"):
+            if name in self.__dict__:
+                getattr(self, name).release()
+        directories = self.__dict__.get("directories")
+        if directories is not None and isinstance(directories.components, SnapshotStrings):
+            directories.components.release()
+        positions = self.__dict__.get("positions")
+        trigrams = self.__dict__.get("trigrams")
+        if trigrams is not None and isinstance(trigrams.keys, SnapshotStrings):
+            trigrams.keys.release()
+        for values in [self.__dict__.get(column) for column in NUMERIC_COLUMNS] + (
+                [directories.parents, directories.component_ids] if directories is not None else []) + (
+                [positions.slots] if positions is not None else []) + (
+                [trigrams.offsets, trigrams.rows] if trigrams is not None else []):
+            if isinstance(values, memoryview):
+                values.release()
+        for raw in self.__dict__.get("raw_columns", {}).values():
+            raw.release()
+        self.buffer.release()
+        self.map.close()
+        self.file.close()
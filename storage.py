@@ -0,0 +1,1586 @@
+# This is version Point2N Branch, developed by arrfour
+
+import os
+import re
+import json
+import heapq
+import fnmatch
+import sqlite3
+import hashlib
+import itertools
+import threading
+from columnar import ColumnarInventory, RECORD_FIELDS, ADDED, UPDATED, UNCHANGED, REMOVED
+from delta_log import DeltaLog
+from snapshot import (SnapshotView, write_snapshot, read_generation, read_published, current_snapshot, generation_file,
+                      generation_files, register_reader, unregister_reader, has_readers)
+
+# Output file extensions that select the SQLite backend
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+# Output file extensions that select the binary snapshot backend
+SNAPSHOT_EXTENSIONS = (".inv",)
+
+# Output directory extensions that select the sharded backend
+SHARDED_EXTENSIONS = (".shards",)
+
+# File in a sharded inventory directory that lists the shards and their totals
+MANIFEST_FILE = "manifest.json"
+
+# Record fields the largest files can be grouped by, and the SQLite column holding each
+LARGEST_GROUPS = {"hostname": "hostname", "extension": "file_extension", "drive": "drive"}
+
+# Logged changes after which the JSON snapshot is compacted in the background
+DEFAULT_COMPACT_THRESHOLD = 100000
+
+# Rows written per executemany call when upserting into SQLite
+UPSERT_BATCH_SIZE = 5000
+
+def record_drive(full_path):
+    """Returns the drive a record is grouped under: its drive or share on Windows, "/" elsewhere."""
+    return os.path.splitdrive(full_path)[0] if os.name == 'nt' else "/"
+
+def record_group(item, group):
+    """Returns the value of a record for one of the LARGEST_GROUPS."""
+    if group == "hostname":
+        return item.get("hostname", "Unknown Host")
+    if group == "extension":
+        return item.get("file_extension", "")
+    return record_drive(item["full_path"])
+
+def sort_records(records, order=None, limit=None):
+    """Applies an order ((field, descending) or None) and a limit to a stream of records.
+
+    With a limit only that many records are held while sorting; without an
+    order the stream is cut short without being held at all.
+    """
+    if order is None:
+        return records if limit is None else itertools.islice(records, limit)
+    field, descending = order
+    key = lambda item: item.get(field, "")
+    if limit is None:
+        return iter(sorted(records, key=key, reverse=descending))
+    return iter((heapq.nlargest if descending else heapq.nsmallest)(limit, records, key=key))
+
+def path_prefix_range(root_dir):
+    """Returns (low, high) such that every path under root_dir sorts in [low, high)."""
+    prefix = os.path.join(root_dir, "")
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def keep_filter(keep):
+    """Returns a predicate telling whether a path is one of keep, or lies under one of them."""
+    paths = set(keep)
+    prefixes = tuple(os.path.join(path, "") for path in paths)
+    return lambda full_path: full_path in paths or full_path.startswith(prefixes)
+
+def merge_totals(grouped, totals):
+    """Adds {key: {"count", "size"}} totals into grouped and returns it."""
+    for key, stats in totals.items():
+        merged = grouped.setdefault(key, {"count": 0, "size": 0})
+        merged["count"] += stats["count"]
+        merged["size"] += stats["size"]
+    return grouped
+
+def merge_counts():
+    """Returns zeroed {"added", "updated", "unchanged"} counts for an upsert."""
+    return {ADDED: 0, UPDATED: 0, UNCHANGED: 0}
+
+def write_json_records(records, json_file):
+    """Writes records as a JSON list, one record per line, without building the whole document in memory.
+
+    The list is written to a temporary file that then replaces json_file, so a
+    crash mid-write can never leave a truncated file behind.
+    """
+    temp_file = json_file + ".tmp"
+    with open(temp_file, "w") as f:
+        f.write("[\n")
+        for i, item in enumerate(records):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(item))
+        f.write("\n]\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, json_file)
+
+class InventoryBackend:
+    """Common interface of the inventory storage backends.
+
+    A backend stores the records and answers the queries the menus need. The
+    query implementations here scan every record; backends override the ones
+    they can answer from an index.
+    """
+
+    def load(self):
+        """Loads (or opens) the stored inventory."""
+        raise NotImplementedError
+
+    def save(self):
+        """Persists the inventory."""
+        raise NotImplementedError
+
+    def iter_records(self):
+        """Yields every record."""
+        raise NotImplementedError
+
+    def records(self):
+        """Returns the records as a sequence that supports len() and iteration."""
+        raise NotImplementedError
+
+    def upsert(self, records):
+        """Inserts or replaces records by full_path; returns how many were added, updated and unchanged (see merge_counts)."""
+        raise NotImplementedError
+
+    def remove_where(self, predicate):
+        """Removes every record matching predicate; returns how many were removed."""
+        raise NotImplementedError
+
+    def replace_under(self, root_dir, hostname, records, keep=(), admitted=None):
+        """Replaces hostname's records under root_dir with records, the result of a rescan of root_dir.
+
+        Records are upserted as usual; stored records of hostname under root_dir
+        that the rescan did not return are removed, unless their path is in keep
+        or lies under a path in keep (e.g. directories that could not be read),
+        or admitted(full_path, size) is false (the scan's filter skipped them).
+        Returns the merge counts with REMOVED added.
+        """
+        seen = set()
+        def scanned():
+            for item in records:
+                seen.add(item["full_path"])
+                yield item
+        counts = self.upsert(scanned())
+        prefix = os.path.join(root_dir, "")
+        kept = keep_filter(keep)
+        counts[REMOVED] = self.remove_where(
+            lambda item: item["full_path"].startswith(prefix) and item.get("hostname", "Unknown Host") == hostname
+            and item["full_path"] not in seen and not kept(item["full_path"])
+            and (admitted is None or admitted(item["full_path"], item["file_size_bytes"])))
+        return counts
+
+    def replace(self, records):
+        """Replaces the whole inventory with records."""
+        self.remove_where(lambda item: True)
+        self.upsert(records)
+
+    def compact(self, wait=False):
+        """Rewrites the stored inventory compactly; nothing to do for most backends."""
+
+    def close(self):
+        """Leaves the stored inventory up to date and releases it, on a clean shutdown."""
+
+    def add_root(self, root):
+        """Registers a scan root before its records are merged; only the sharded backend uses it."""
+
+    def refresh(self):
+        """Picks up changes another process has published; nothing to do for most backends."""
+
+    def location(self):
+        """Returns the path the inventory is stored at."""
+        return os.path.join(os.getcwd(), self.output_file)
+
+    def count(self):
+        return sum(1 for _ in self.iter_records())
+
+    def total_size(self):
+        return sum(item["file_size_bytes"] for item in self.iter_records())
+
+    def hostnames(self):
+        return sorted(set(item["hostname"] for item in self.iter_records() if "hostname" in item))
+
+    def drives(self):
+        if os.name != 'nt':
+            return []
+        return sorted(set(os.path.splitdrive(item["full_path"])[0] for item in self.iter_records()))
+
+    def remove_host(self, hostname):
+        return self.remove_where(lambda item: item.get("hostname") == hostname)
+
+    def remove_drive(self, drive):
+        return self.remove_where(lambda item: item["full_path"].startswith(drive))
+
+    def records_under(self, root_dir):
+        prefix = os.path.join(root_dir, "")
+        return [item for item in self.iter_records() if item["full_path"].startswith(prefix)]
+
+    def search_by_name(self, term):
+        term = term.lower()
+        return [item for item in self.iter_records() if term in item["file_name"].lower()]
+
+    def filter_by_extension(self, extension):
+        extension = extension.lower()
+        return [item for item in self.iter_records() if item["file_extension"].lower() == extension]
+
+    def find(self, query, order=None, limit=None):
+        """Streams the records matching a FileQuery (see query.py), in order ((field, descending) or None), up to limit.
+
+        Returns (plan, records), where plan says how the backend found them.
+        Backends push whatever predicates, order and limit they can down to
+        their indexes; this one checks every record.
+        """
+        return "full scan", sort_records((item for item in self.iter_records() if query.matches(item)), order, limit)
+
+    def largest_files(self, top_n, hostname=None, extension=None, directory=None):
+        """Returns the top_n largest files, largest first; optionally only a host's, one extension's, or those under a directory."""
+        prefix = os.path.join(directory, "") if directory is not None else None
+        records = (item for item in self.iter_records()
+                   if (hostname is None or item.get("hostname", "Unknown Host") == hostname)
+                   and (extension is None or item["file_extension"].lower() == extension.lower())
+                   and (prefix is None or item["full_path"].startswith(prefix)))
+        return heapq.nlargest(top_n, records, key=lambda x: x["file_size_bytes"])
+
+    def largest_files_by(self, top_n, group):
+        """Returns {value: records} with the top_n largest files for every value of a group in LARGEST_GROUPS."""
+        heaps = {}
+        if top_n <= 0:
+            return heaps
+        for position, item in enumerate(self.iter_records()):
+            heap = heaps.setdefault(record_group(item, group), [])
+            # The position breaks ties between equal sizes, so records are never compared
+            entry = (item["file_size_bytes"], -position, item)
+            if len(heap) < top_n:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+        return {value: [item for size, position, item in sorted(heap, reverse=True)] for value, heap in heaps.items()}
+
+    def most_recent_file(self):
+        return max(self.iter_records(), key=lambda x: x.get("last_modified_timestamp", 0), default=None)
+
+    def directory_totals(self):
+        """Returns {directory: {"count", "size"}} for the files directly in each directory."""
+        directory_groups = {}
+        for item in self.iter_records():
+            stats = directory_groups.setdefault(os.path.dirname(item["full_path"]), {"count": 0, "size": 0})
+            stats["count"] += 1
+            stats["size"] += item["file_size_bytes"]
+        return directory_groups
+
+    def recursive_directory_totals(self):
+        """Returns {directory: {"count", "size"}} for the files in each directory and everything below it."""
+        totals = {}
+        for directory, stats in self.directory_totals().items():
+            while True:
+                merge_totals(totals, {directory: stats})
+                parent = os.path.dirname(directory)
+                if parent == directory:
+                    break
+                directory = parent
+        return totals
+
+    def directory_total(self, directory):
+        """Returns {"count", "size"} for the files in a directory and everything below it."""
+        return self.recursive_directory_totals().get(directory, {"count": 0, "size": 0})
+
+    def subdirectory_totals(self, directory):
+        """Returns {subdirectory: {"count", "size"}} with the recursive totals of each directory directly below one."""
+        return {path: stats for path, stats in self.recursive_directory_totals().items()
+                if os.path.dirname(path) == directory and path != directory}
+
+    def host_drive_totals(self):
+        """Returns {hostname: {drive: {"count", "size"}}}."""
+        grouped_data = {}
+        for item in self.iter_records():
+            drives = grouped_data.setdefault(item.get("hostname", "Unknown Host"), {})
+            stats = drives.setdefault(record_drive(item.get("full_path", "")), {"count": 0, "size": 0})
+            stats["count"] += 1
+            stats["size"] += item.get("file_size_bytes", 0)
+        return grouped_data
+
+class ColumnarBackend(InventoryBackend):
+    """Keeps the inventory in a columnar in-memory container, stored as a snapshot plus a delta log.
+
+    Queries run over the columns (sizes, timestamps, interned host, extension
+    and directory ids) without building a record dict per file. Changes are
+    appended to the delta log as they are made, so saving only flushes the new
+    changes instead of rewriting the snapshot. Loading replays the log on top of
+    the snapshot, and once the log passes compact_threshold changes the snapshot
+    is rewritten in a background thread. Subclasses choose the snapshot format.
+    """
+
+    def __init__(self, output_file, compact_threshold=DEFAULT_COMPACT_THRESHOLD):
+        self.output_file = output_file
+        self.columns = ColumnarInventory()
+        self.log = DeltaLog(output_file + ".log")
+        self.compact_threshold = compact_threshold
+        self.compactor = None
+
+    def read_snapshot(self, snapshot_file):
+        """Returns the rows stored in the snapshot file."""
+        raise NotImplementedError
+
+    def write_snapshot_file(self, columns, snapshot_file):
+        """Writes rows to the snapshot file atomically."""
+        raise NotImplementedError
+
+    def writable(self):
+        """Returns the columns, ready to be modified."""
+        return self.columns
+
+    def load(self):
+        self.wait_for_compaction()
+        self.log.close()
+        local_path = self.location()
+        self.columns = ColumnarInventory()
+        if os.path.exists(local_path):
+            self.columns = self.read_snapshot(local_path)
+        self.apply_changes(self.log.replay())
+        return self.columns
+
+    def apply_changes(self, changes):
+        """Applies logged changes in order, batching runs of deletes into one pass."""
+        deleted = []
+        for change in changes:
+            columns = self.writable()
+            op = change["op"]
+            if op == "delete":
+                deleted.append(change["path"])
+                continue
+            if deleted:
+                columns.delete_paths(deleted)
+                deleted = []
+            if op == "upsert":
+                columns.upsert(change["record"])
+            elif op == "delete_host":
+                self.remove_host_rows(change["hostname"])
+            elif op == "delete_drive":
+                self.remove_drive_rows(change["drive"])
+        if deleted:
+            self.writable().delete_paths(deleted)
+
+    def save(self):
+        self.log.flush()
+        if self.log.entries >= self.compact_threshold:
+            self.compact()
+
+    def compact(self, wait=False):
+        """Rewrites the snapshot from the current rows and drops the changes it now contains."""
+        if self.compactor is not None and self.compactor.is_alive():
+            if wait:
+                self.compactor.join()
+            return
+        snapshot = self.writable().copy()
+        self.log.seal()
+        self.compactor = threading.Thread(target=self.write_snapshot, args=(snapshot,), name="inventory-compactor")
+        self.compactor.start()
+        if wait:
+            self.compactor.join()
+
+    def write_snapshot(self, snapshot):
+        try:
+            self.write_snapshot_file(snapshot, self.location())
+            self.log.discard_sealed()
+        except Exception as e:
+            print(f"Error compacting inventory: {e}")
+
+    def wait_for_compaction(self):
+        if self.compactor is not None:
+            self.compactor.join()
+            self.compactor = None
+
+    def close(self):
+        # Only a log past the threshold is folded into the snapshot; a shorter one is replayed on the next load
+        self.wait_for_compaction()
+        self.log.flush()
+        if self.log.entries >= self.compact_threshold:
+            self.compact(wait=True)
+            self.wait_for_compaction()
+        self.log.close()
+
+    def iter_records(self):
+        return iter(self.columns)
+
+    def records(self):
+        return self.columns
+
+    def replace(self, records):
+        """Replaces every record and writes a fresh snapshot straight away."""
+        self.wait_for_compaction()
+        self.writable()
+        self.columns = ColumnarInventory(records)
+        self.write_snapshot_file(self.columns, self.location())
+        self.log.reset()
+
+    def count(self):
+        return len(self.columns)
+
+    def total_size(self):
+        return self.columns.total_size()
+
+    def upsert(self, records, seen=None):
+        counts = merge_counts()
+        for new_item in records:
+            outcome = self.writable().upsert(new_item, seen)
+            # Records that are already stored unchanged are not logged again
+            if outcome != UNCHANGED:
+                self.log.append({"op": "upsert", "record": new_item})
+            counts[outcome] += 1
+        return counts
+
+    def remove_paths(self, paths):
+        """Removes the records of the given full paths; returns how many were removed."""
+        columns = self.writable()
+        doomed = set(row for row in (columns.find(path) for path in paths) if row is not None)
+        for row in sorted(doomed):
+            self.log.append({"op": "delete", "path": columns.full_path(row)})
+        return columns.drop_rows(doomed)
+
+    def remove_where(self, predicate):
+        columns = self.writable()
+        doomed = set(row for row in range(len(columns)) if predicate(columns.record(row)))
+        for row in sorted(doomed):
+            self.log.append({"op": "delete", "path": columns.full_path(row)})
+        return columns.drop_rows(doomed)
+
+    def replace_under(self, root_dir, hostname, records, keep=(), admitted=None):
+        seen = self.scan_marks()
+        counts = self.upsert(records, seen)
+        counts[REMOVED] = self.remove_unseen(root_dir, hostname, seen, keep, admitted)
+        return counts
+
+    def scan_marks(self):
+        """Returns a bytearray with a byte per current row, for upsert to mark the rows a rescan matched."""
+        return bytearray(len(self.writable()))
+
+    def remove_unseen(self, root_dir, hostname, seen, keep=(), admitted=None):
+        """Removes hostname's rows under root_dir that are not marked in seen (see replace_under).
+
+        The directory trie gives the directories under root_dir and the
+        DirectoryRows index their rows, so only those rows are checked, and full
+        paths are only built for the unmarked ones.
+        """
+        columns = self.writable()
+        host_id = columns.hosts.get(hostname)
+        wanted = columns.directories.under_prefix(os.path.join(root_dir, "")) if host_id is not None else None
+        if not wanted:
+            return 0
+        host_ids, sizes = columns.host_ids, columns.sizes
+        kept = keep_filter(keep)
+        doomed = set()
+        for row in columns.directory_rows().rows_in(wanted):
+            # Rows appended by the rescan itself have no mark and are always current
+            if row >= len(seen) or seen[row] or host_ids[row] != host_id:
+                continue
+            full_path = columns.full_path(row)
+            if not kept(full_path) and (admitted is None or admitted(full_path, sizes[row])):
+                doomed.add(row)
+        for row in sorted(doomed):
+            self.log.append({"op": "delete", "path": columns.full_path(row)})
+        return columns.drop_rows(doomed)
+
+    # Hosts and drives are read from the running totals, which only hold groups that still have files
+    def hostnames(self):
+        return self.columns.hostnames()
+
+    def drives(self):
+        if os.name != 'nt':
+            return []
+        directories = self.columns.directories
+        roots = set(root for host_id, root in self.columns.summary_totals().groups)
+        return sorted(set(os.path.splitdrive(directories[root])[0] for root in roots))
+
+    def remove_host(self, hostname):
+        removed = self.remove_host_rows(hostname)
+        if removed:
+            self.log.append({"op": "delete_host", "hostname": hostname})
+        return removed
+
+    def remove_drive(self, drive):
+        removed = self.remove_drive_rows(drive)
+        if removed:
+            self.log.append({"op": "delete_drive", "drive": drive})
+        return removed
+
+    def remove_host_rows(self, hostname):
+        host_id = self.columns.hosts.get(hostname)
+        if host_id is None:
+            return 0
+        columns = self.writable()
+        host_ids = columns.host_ids
+        return columns.remove_rows(lambda row: host_ids[row] == host_id)
+
+    def remove_drive_rows(self, drive):
+        columns = self.writable()
+        doomed = columns.directories.under_prefix(drive)
+        dir_ids = columns.dir_ids
+        return columns.remove_rows(lambda row: dir_ids[row] in doomed)
+
+    def records_under(self, root_dir):
+        columns = self.columns
+        wanted = columns.directories.under_prefix(os.path.join(root_dir, ""))
+        return [columns.record(row) for row, dir_id in enumerate(columns.dir_ids) if dir_id in wanted]
+
+    def search_by_name(self, term):
+        columns = self.columns
+        return [columns.record(row) for row in columns.search_names(term)]
+
+    def filter_by_extension(self, extension):
+        extension = extension.lower()
+        columns = self.columns
+        wanted = set(ext_id for ext_id, value in enumerate(columns.extensions.values) if value.lower() == extension)
+        return [columns.record(row) for row, ext_id in enumerate(columns.ext_ids) if ext_id in wanted]
+
+    def find(self, query, order=None, limit=None):
+        # Predicates are checked on the columns, and a record is only built for a matching row
+        columns = self.columns
+        checks = []
+        rows = None
+        plan = "column scan"
+        if query.hostname is not None:
+            host_id = columns.hosts.get(query.hostname)
+            if host_id is None:
+                return "unknown host", iter(())
+            host_ids = columns.host_ids
+            checks.append(lambda row: host_ids[row] == host_id)
+        if query.extension is not None:
+            extension = query.extension.lower()
+            wanted_extensions = set(ext_id for ext_id, value in enumerate(columns.extensions.values) if value.lower() == extension)
+            ext_ids = columns.ext_ids
+            checks.append(lambda row: ext_ids[row] in wanted_extensions)
+        if query.prefix is not None:
+            wanted_directories = columns.directories.under_prefix(os.path.join(query.prefix, ""))
+            dir_ids = columns.dir_ids
+            checks.append(lambda row: dir_ids[row] in wanted_directories)
+            plan = "directory trie"
+        if query.min_size is not None or query.max_size is not None:
+            sizes = columns.sizes
+            checks.append(lambda row: query.size_matches(sizes[row]))
+        if query.modified_after is not None or query.modified_before is not None:
+            mtimes = columns.mtimes
+            checks.append(lambda row: query.time_matches(mtimes[row]))
+        term = query.index_term()
+        if term is not None:
+            rows = columns.search_names(term)
+            plan = "trigram index"
+        if query.name is not None or query.glob is not None or query.pattern is not None:
+            names = columns.names
+            checks.append(lambda row: query.name_matches(names[row]))
+        row_filter = (lambda row: all(check(row) for check in checks)) if checks else None
+        if rows is None and order == ("file_size_bytes", True):
+            # Walk the size index largest first, so a limit stops the walk early
+            rows = columns.size_index().descending()
+            if row_filter is not None:
+                rows = filter(row_filter, rows)
+            if limit is not None:
+                rows = itertools.islice(rows, limit)
+            return "size index, " + plan, (columns.record(row) for row in rows)
+        if rows is None:
+            rows = range(len(columns))
+        if row_filter is not None:
+            rows = filter(row_filter, rows)
+        return plan, sort_records((columns.record(row) for row in rows), order, limit)
+
+    def largest_files(self, top_n, hostname=None, extension=None, directory=None):
+        # Rows are walked largest first through the size index, checking only the id columns
+        columns = self.columns
+        checks = []
+        if hostname is not None:
+            host_id = columns.hosts.get(hostname)
+            if host_id is None:
+                return []
+            host_ids = columns.host_ids
+            checks.append(lambda row: host_ids[row] == host_id)
+        if extension is not None:
+            extension = extension.lower()
+            wanted_extensions = set(ext_id for ext_id, value in enumerate(columns.extensions.values) if value.lower() == extension)
+            if not wanted_extensions:
+                return []
+            ext_ids = columns.ext_ids
+            checks.append(lambda row: ext_ids[row] in wanted_extensions)
+        if directory is not None:
+            wanted_directories = columns.directories.under_prefix(os.path.join(directory, ""))
+            if not wanted_directories:
+                return []
+            dir_ids = columns.dir_ids
+            checks.append(lambda row: dir_ids[row] in wanted_directories)
+        row_filter = (lambda row: all(check(row) for check in checks)) if checks else None
+        return [columns.record(row) for row in columns.largest_rows(top_n, row_filter)]
+
+    def largest_files_by(self, top_n, group):
+        columns = self.columns
+        if group == "drive":
+            directories, dir_ids, drives = columns.directories, columns.dir_ids, {}
+            def group_of(row):
+                dir_id = dir_ids[row]
+                if dir_id not in drives:
+                    drives[dir_id] = record_drive(directories[dir_id])
+                return drives[dir_id]
+            found = columns.largest_rows_by(top_n, group_of, len(self.drives()) if os.name == 'nt' else 1)
+        else:
+            column, table = (columns.host_ids, columns.hosts) if group == "hostname" else (columns.ext_ids, columns.extensions)
+            found = columns.largest_rows_by(top_n, column.__getitem__, len(set(column)))
+            found = {table[value_id]: rows for value_id, rows in found.items()}
+        return {value: [columns.record(row) for row in rows] for value, rows in found.items()}
+
+    def most_recent_file(self):
+        row = self.columns.most_recent_row()
+        return None if row is None else self.columns.record(row)
+
+    # Directory totals are read from the rollup the container keeps current as rows change
+    def directory_totals(self):
+        rollup = self.columns.directory_rollup()
+        directories = self.columns.directories
+        return {directories[node]: {"count": count, "size": rollup.file_sizes[node]}
+                for node, count in enumerate(rollup.file_counts) if count}
+
+    def recursive_directory_totals(self):
+        rollup = self.columns.directory_rollup()
+        directories = self.columns.directories
+        return {directories[node]: {"count": count, "size": rollup.total_sizes[node]}
+                for node, count in enumerate(rollup.total_counts) if count}
+
+    def directory_total(self, directory):
+        node = self.columns.directories.get(directory)
+        count, size = (0, 0) if node is None else self.columns.directory_rollup().totals(node)
+        return {"count": count, "size": size}
+
+    def subdirectory_totals(self, directory):
+        node = self.columns.directories.get(directory)
+        if node is None:
+            return {}
+        rollup = self.columns.directory_rollup()
+        directories = self.columns.directories
+        return {directories[child]: {"count": rollup.total_counts[child], "size": rollup.total_sizes[child]}
+                for child in rollup.subdirectories(node)}
+
+    def host_drive_totals(self):
+        columns = self.columns
+        grouped_data = {}
+        for (host_id, root), (count, size) in columns.summary_totals().groups.items():
+            drive = record_drive(columns.directories[root])
+            merge_totals(grouped_data.setdefault(columns.hosts[host_id], {}), {drive: {"count": count, "size": size}})
+        return grouped_data
+
+class JsonBackend(ColumnarBackend):
+    """Columnar backend whose snapshot is the classic JSON list of records."""
+
+    def read_snapshot(self, snapshot_file):
+        with open(snapshot_file, "r") as f:
+            return ColumnarInventory(json.load(f))
+
+    def write_snapshot_file(self, columns, snapshot_file):
+        write_json_records(columns, snapshot_file)
+
+class BinaryBackend(ColumnarBackend):
+    """Columnar backend whose snapshot is a memory-mapped binary file (see snapshot.py).
+
+    Loading maps the snapshot instead of parsing it, so counts and totals are
+    available immediately and records are decoded only when they are read. The
+    first change copies the mapped snapshot into regular columns and releases
+    the mapping. Changes go to the delta log and are compacted at the usual
+    threshold; only while a read-only process has registered to share the
+    snapshot does every save publish a new snapshot generation (written in the
+    background), so the reader sees the changes.
+    """
+
+    def read_snapshot(self, snapshot_file):
+        return SnapshotView(current_snapshot(snapshot_file))
+
+    def write_snapshot_file(self, columns, snapshot_file):
+        write_snapshot(columns, snapshot_file)
+
+    def writable(self):
+        if isinstance(self.columns, SnapshotView):
+            view = self.columns
+            self.columns = view.materialize()
+            view.close()
+        return self.columns
+
+    def load(self):
+        if isinstance(self.columns, SnapshotView):
+            self.columns.close()
+            self.columns = ColumnarInventory()
+        return super().load()
+
+    def close(self):
+        super().close()
+        if isinstance(self.columns, SnapshotView):
+            self.columns.close()
+            self.columns = ColumnarInventory()
+
+    def save(self):
+        super().save()
+        if not os.path.exists(self.location()):
+            # Start the snapshot right away so the next load can map it
+            self.compact(wait=True)
+        elif self.log.entries and has_readers(self.location()):
+            self.compact()
+
+class SharedSnapshotBackend(BinaryBackend):
+    """Read-only access to a binary snapshot, for processes that share it with a writer.
+
+    The snapshot is only ever mapped, never copied into private columns, so any
+    number of readers share one copy of it through the page cache. Changes the
+    writer has logged but not yet published are not visible. refresh() checks
+    the snapshot generation and remaps the new snapshot once the writer has
+    published one, which costs about as much as opening it. Every change
+    raises PermissionError. Loading registers the process as a reader (see
+    snapshot.register_reader), which makes the writer publish every save;
+    close() unregisters it.
+    """
+
+    def __init__(self, output_file):
+        super().__init__(output_file)
+        self.generation = None
+
+    def load(self):
+        self.close_view()
+        register_reader(self.location())
+        if not os.path.exists(self.location()):
+            self.generation = read_generation(self.location())
+            return self.columns
+        while True:
+            # Read the generation first: a snapshot newer than it only causes one extra remap later
+            self.generation, snapshot_file = read_published(self.location())
+            try:
+                self.columns = SnapshotView(snapshot_file)
+                return self.columns
+            except FileNotFoundError:
+                if read_generation(self.location()) == self.generation:
+                    raise
+                # The writer published a newer generation and removed this one in between
+
+    def close_view(self):
+        if isinstance(self.columns, SnapshotView):
+            self.columns.close()
+        self.columns = ColumnarInventory()
+
+    def close(self):
+        self.close_view()
+        unregister_reader(self.location())
+
+    def refresh(self):
+        if read_generation(self.location()) != self.generation:
+            self.load()
+
+    def writable(self):
+        raise PermissionError(f"{self.output_file} is open read-only")
+
+    def save(self):
+        pass
+
+    def compact(self, wait=False):
+        pass
+
+class ShardedRecords:
+    """Sequence-like view over every shard, for callers that len() or iterate the inventory."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __len__(self):
+        return self.backend.count()
+
+    def __iter__(self):
+        return self.backend.iter_records()
+
+class ShardedBackend(InventoryBackend):
+    """Splits the inventory into one binary shard per hostname and scan root, listed in a manifest.
+
+    output_file is a directory holding manifest.json and the shards, each a
+    BinaryBackend (snapshot plus delta log). Scan roots are registered with
+    add_root() and never overlap: a root inside a registered one is ignored,
+    and one that contains registered roots absorbs their records. Records
+    outside every registered root (e.g. from an imported file) go to a
+    per-host shard without a root. As in the other backends a full_path is
+    stored once: upserting a path held by another host's shard of the same
+    root moves the record, and counts as an update.
+
+    Shards are opened only when a query or change needs them. Counts, totals,
+    hostnames and the newest file are answered from the manifest, queries with
+    a path (records_under, remove_drive) open only the shards whose root can
+    match, removing a host deletes its shard files, and saving writes only the
+    shards that changed, so a rescan of one root rewrites only its shard.
+    """
+
+    def __init__(self, output_file, compact_threshold=DEFAULT_COMPACT_THRESHOLD):
+        self.output_file = output_file
+        self.compact_threshold = compact_threshold
+        self.roots = []
+        self.entries = {}
+        self.shards = {}
+        self.dirty = set()
+        self.route_cache = (None, None)
+
+    # Manifest and shard files
+    def manifest_path(self):
+        return os.path.join(self.location(), MANIFEST_FILE)
+
+    def load(self):
+        self.close_shards()
+        self.roots = []
+        self.entries = {}
+        if os.path.exists(self.manifest_path()):
+            with open(self.manifest_path(), "r") as f:
+                manifest = json.load(f)
+            self.roots = manifest["roots"]
+            self.entries = {(entry["hostname"], entry["root"]): entry for entry in manifest["shards"]}
+        return self.records()
+
+    def write_manifest(self):
+        os.makedirs(self.location(), exist_ok=True)
+        temp_file = self.manifest_path() + ".tmp"
+        with open(temp_file, "w") as f:
+            json.dump({"roots": self.roots, "shards": list(self.entries.values())}, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.manifest_path())
+
+    def close_shards(self):
+        for shard in self.shards.values():
+            shard.wait_for_compaction()
+            shard.log.close()
+            if isinstance(shard.columns, SnapshotView):
+                shard.columns.close()
+        self.shards = {}
+        self.dirty = set()
+
+    def shard(self, key):
+        """Returns the backend of a shard, opening it (or creating its entry) on first use."""
+        shard = self.shards.get(key)
+        if shard is None:
+            entry = self.entries.get(key)
+            if entry is None:
+                hostname, root = key
+                digest = hashlib.sha1(f"{hostname}\0{root}".encode("utf-8", "surrogateescape")).hexdigest()[:16]
+                entry = self.entries[key] = {"hostname": hostname, "root": root, "file": digest + ".inv",
+                                             "count": 0, "size": 0, "newest": None}
+            os.makedirs(self.location(), exist_ok=True)
+            shard = self.shards[key] = BinaryBackend(os.path.join(self.location(), entry["file"]), self.compact_threshold)
+            shard.load()
+        return shard
+
+    def changed(self, key):
+        self.dirty.add(key)
+        return self.shards[key]
+
+    def delete_shard(self, key):
+        """Deletes a shard's files and its manifest entry."""
+        shard = self.shards.pop(key, None)
+        if shard is not None:
+            shard.wait_for_compaction()
+            shard.log.reset()
+            if isinstance(shard.columns, SnapshotView):
+                shard.columns.close()
+        entry = self.entries.pop(key)
+        snapshot_file = os.path.join(self.location(), entry["file"])
+        for path in [snapshot_file, snapshot_file + ".log", snapshot_file + ".log.sealed", generation_file(snapshot_file)] + generation_files(snapshot_file):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.dirty.discard(key)
+
+    def save(self):
+        for key in list(self.dirty):
+            shard = self.shards[key]
+            if not shard.count():
+                self.delete_shard(key)
+                continue
+            shard.save()
+            newest = shard.columns.most_recent_row()
+            self.entries[key].update(count=shard.count(), size=shard.total_size(),
+                                     newest=None if newest is None else shard.columns.mtimes[newest])
+        self.dirty = set()
+        self.write_manifest()
+
+    def compact(self, wait=False):
+        for shard in self.shards.values():
+            shard.compact(wait)
+
+    def close(self):
+        for shard in self.shards.values():
+            shard.close()
+        self.shards = {}
+        self.dirty = set()
+
+    # Routing records to shards
+    def root_of(self, full_path):
+        """Returns the registered root full_path lies under, or None."""
+        directory = os.path.dirname(full_path)
+        cached_directory, cached_root = self.route_cache
+        if directory == cached_directory:
+            return cached_root
+        root = next((root for root in self.roots if full_path.startswith(os.path.join(root, ""))), None)
+        self.route_cache = (directory, root)
+        return root
+
+    def shard_key(self, item):
+        return item.get("hostname", "Unknown Host"), self.root_of(item["full_path"])
+
+    def add_root(self, root):
+        prefix = os.path.join(root, "")
+        if any(prefix.startswith(os.path.join(existing, "")) for existing in self.roots):
+            return
+        absorbed = [existing for existing in self.roots if os.path.join(existing, "").startswith(prefix)]
+        self.roots = [existing for existing in self.roots if existing not in absorbed] + [root]
+        self.route_cache = (None, None)
+        # Move records of absorbed roots, and rootless records under the new root, into its shards
+        moved = []
+        for key in [key for key in self.entries if key[1] in absorbed or key[1] is None]:
+            shard = self.shard(key)
+            records = shard.records_under(root)
+            if records:
+                moved.extend(records)
+                shard.remove_where(lambda item: item["full_path"].startswith(prefix))
+                self.changed(key)
+        self.upsert(moved)
+
+    def upsert(self, records, seen=None):
+        """Upserts records into their shards; seen optionally maps shard keys to scan marks (see replace_under)."""
+        counts = merge_counts()
+        batches = {}
+        pending = {}  # Shard key of the batch waiting with each path
+
+        def flush(key):
+            batch = batches[key]
+            self.upsert_batch(key, batch, counts, seen)
+            for item in batch:
+                pending.pop(item["full_path"], None)
+            batches[key] = []
+
+        for item in records:
+            key = self.shard_key(item)
+            waiting = pending.get(item["full_path"])
+            if waiting is not None and waiting != key:
+                # The path changes host within this upsert: store the earlier record first, so the later one wins
+                flush(waiting)
+            batch = batches.setdefault(key, [])
+            batch.append(item)
+            pending[item["full_path"]] = key
+            if len(batch) >= UPSERT_BATCH_SIZE:
+                flush(key)
+        for key, batch in batches.items():
+            if batch:
+                flush(key)
+        return counts
+
+    def upsert_batch(self, key, batch, counts, seen=None):
+        moved = self.take_from_other_hosts(key, batch, seen)
+        marks = (seen or {}).get(key)
+        shard = self.shard(key)
+        for outcome, count in shard.upsert([item for item in batch if item["full_path"] not in moved], marks).items():
+            counts[outcome] += count
+        if moved:
+            # The record replaced the other host's one, so it was updated rather than added
+            for outcome, count in shard.upsert([item for item in batch if item["full_path"] in moved], marks).items():
+                counts[UPDATED if outcome == ADDED else outcome] += count
+        self.changed(key)
+
+    def take_from_other_hosts(self, key, batch, seen=None):
+        """Removes the batch's paths from other hosts' shards of the same root; returns the paths removed.
+
+        Shards carrying scan marks are left alone: dropping rows would shift the
+        marks, and replace_under removes their unmatched rows anyway.
+        """
+        hostname, root = key
+        others = [other for other in self.entries if other[1] == root and other[0] != hostname and other not in (seen or {})]
+        if not others:
+            return set()
+        paths = set(item["full_path"] for item in batch)
+        moved = set()
+        for other in others:
+            shard = self.shard(other)
+            found = [path for path in paths if shard.columns.find(path) is not None]
+            if found:
+                shard.remove_paths(found)
+                self.changed(other)
+                moved.update(found)
+        return moved
+
+    def replace_under(self, root_dir, hostname, records, keep=(), admitted=None):
+        # Only the host's shards whose root can hold paths under root_dir need checking for deletions
+        keys = [key for key in self.keys_for_path(os.path.join(root_dir, "")) if key[0] == hostname]
+        seen = {key: self.shard(key).scan_marks() for key in keys}
+        counts = self.upsert(records, seen)
+        removed = 0
+        for key in keys:
+            count = self.shards[key].remove_unseen(root_dir, hostname, seen[key], keep, admitted)
+            if count:
+                self.changed(key)
+                removed += count
+        counts[REMOVED] = removed
+        return counts
+
+    # Reads and removals, fanned out to the shards that can hold matches
+    def keys_for_path(self, prefix):
+        """Returns the shards that may hold records whose full_path starts with prefix."""
+        return [key for key in self.entries if key[1] is None or os.path.join(key[1], "").startswith(prefix)
+                or prefix.startswith(os.path.join(key[1], ""))]
+
+    def all_shards(self):
+        return [self.shard(key) for key in list(self.entries)]
+
+    def iter_records(self):
+        return itertools.chain.from_iterable(shard.iter_records() for shard in self.all_shards())
+
+    def records(self):
+        return ShardedRecords(self)
+
+    def replace(self, records):
+        for key in list(self.entries):
+            self.delete_shard(key)
+        self.upsert(records)
+
+    def remove_where(self, predicate):
+        removed = 0
+        for key in list(self.entries):
+            count = self.shard(key).remove_where(predicate)
+            if count:
+                self.changed(key)
+                removed += count
+        return removed
+
+    def shard_count(self, key):
+        return self.shards[key].count() if key in self.dirty else self.entries[key]["count"]
+
+    def count(self):
+        return sum(self.shard_count(key) for key in self.entries)
+
+    def total_size(self):
+        return sum(self.shards[key].total_size() if key in self.dirty else entry["size"] for key, entry in self.entries.items())
+
+    def hostnames(self):
+        return sorted(set(hostname for hostname, root in self.entries))
+
+    def drives(self):
+        if os.name != 'nt':
+            return []
+        return sorted(set(drive for hostname, drives in self.host_drive_totals().items() for drive in drives))
+
+    def remove_host(self, hostname):
+        removed = 0
+        for key in [key for key in self.entries if key[0] == hostname]:
+            removed += self.shard_count(key)
+            self.delete_shard(key)
+        return removed
+
+    def remove_drive(self, drive):
+        removed = 0
+        candidates = self.keys_for_path(drive)
+        for key in candidates:
+            root = key[1]
+            if root is not None and root.startswith(drive):
+                removed += self.shard_count(key)
+                self.delete_shard(key)
+            else:
+                count = self.shard(key).remove_drive(drive)
+                if count:
+                    self.changed(key)
+                    removed += count
+        return removed
+
+    def records_under(self, root_dir):
+        prefix = os.path.join(root_dir, "")
+        return [item for key in self.keys_for_path(prefix) for item in self.shard(key).records_under(root_dir)]
+
+    def search_by_name(self, term):
+        return [item for shard in self.all_shards() for item in shard.search_by_name(term)]
+
+    def filter_by_extension(self, extension):
+        return [item for shard in self.all_shards() for item in shard.filter_by_extension(extension)]
+
+    def largest_files(self, top_n, hostname=None, extension=None, directory=None):
+        keys = self.keys_for_path(os.path.join(directory, "")) if directory is not None else list(self.entries)
+        candidates = [item for key in keys if hostname is None or key[0] == hostname
+                      for item in self.shard(key).largest_files(top_n, hostname, extension, directory)]
+        return heapq.nlargest(top_n, candidates, key=lambda x: x["file_size_bytes"])
+
+    def find(self, query, order=None, limit=None):
+        # Only shards of the host and under the prefix are searched; each returns its matches in order
+        keys = self.keys_for_path(os.path.join(query.prefix, "")) if query.prefix is not None else list(self.entries)
+        keys = [key for key in keys if query.hostname is None or key[0] == query.hostname]
+        plans, streams = set(), []
+        for key in keys:
+            plan, records = self.shard(key).find(query, order, limit)
+            plans.add(plan)
+            streams.append(records)
+        plan = f"{len(keys)} of {len(self.entries)} shards: {', '.join(sorted(plans)) or 'none'}"
+        if order is None:
+            records = itertools.chain.from_iterable(streams)
+        else:
+            field, descending = order
+            records = heapq.merge(*streams, key=lambda item: item.get(field, ""), reverse=descending)
+        return plan, records if limit is None else itertools.islice(records, limit)
+
+    def largest_files_by(self, top_n, group):
+        grouped = {}
+        for shard in self.all_shards():
+            for value, items in shard.largest_files_by(top_n, group).items():
+                grouped.setdefault(value, []).extend(items)
+        return {value: heapq.nlargest(top_n, items, key=lambda x: x["file_size_bytes"]) for value, items in grouped.items()}
+
+    def most_recent_file(self):
+        # Only the shard with the newest file needs to be opened
+        newest = {}
+        for key, entry in self.entries.items():
+            if key in self.dirty:
+                row = self.shards[key].columns.most_recent_row()
+                mtime = None if row is None else self.shards[key].columns.mtimes[row]
+            else:
+                mtime = entry["newest"]
+            if mtime is not None:
+                newest[key] = mtime
+        if not newest:
+            return None
+        return self.shard(max(newest, key=newest.get)).most_recent_file()
+
+    def directory_totals(self):
+        directory_groups = {}
+        for shard in self.all_shards():
+            merge_totals(directory_groups, shard.directory_totals())
+        return directory_groups
+
+    def recursive_directory_totals(self):
+        directory_groups = {}
+        for shard in self.all_shards():
+            merge_totals(directory_groups, shard.recursive_directory_totals())
+        return directory_groups
+
+    def directory_total(self, directory):
+        totals = {"count": 0, "size": 0}
+        for key in self.keys_for_path(os.path.join(directory, "")):
+            stats = self.shard(key).directory_total(directory)
+            totals["count"] += stats["count"]
+            totals["size"] += stats["size"]
+        return totals
+
+    def subdirectory_totals(self, directory):
+        directory_groups = {}
+        for key in self.keys_for_path(os.path.join(directory, "")):
+            merge_totals(directory_groups, self.shard(key).subdirectory_totals(directory))
+        return directory_groups
+
+    def host_drive_totals(self):
+        # A shard holds one host's files under one root, so a saved shard's manifest entry is its only group
+        grouped_data = {}
+        for key, entry in self.entries.items():
+            hostname, root = key
+            if key in self.dirty or root is None:
+                for hostname, drives in self.shard(key).host_drive_totals().items():
+                    merge_totals(grouped_data.setdefault(hostname, {}), drives)
+            elif entry["count"]:
+                merge_totals(grouped_data.setdefault(hostname, {}), {record_drive(root): {"count": entry["count"], "size": entry["size"]}})
+        return grouped_data
+
+class SqliteRecords:
+    """Sequence-like view over the SQLite files table, for callers that len() or iterate the inventory."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __len__(self):
+        return self.backend.count()
+
+    def __iter__(self):
+        return self.backend.iter_records()
+
+class SqliteBackend(InventoryBackend):
+    """Stores the inventory in an indexed SQLite database and pushes queries down to it.
+
+    Records are rows keyed by full_path, with indexes on size, modification
+    time and directory, and on hostname, extension and drive each followed by
+    size, so top-N queries per host, extension or drive read an index in order. The database runs in WAL mode so
+    readers are not blocked while a scan is being merged. Fields beyond the
+    standard ones (e.g. content_hash) are kept as JSON in the extra column.
+    File names are also indexed in an FTS5 trigram table that triggers keep
+    current, so name searches do not scan every row; SQLite builds without
+    FTS5 fall back to LIKE.
+    """
+
+    COLUMNS = "file_name, file_extension, file_size_bytes, last_modified_timestamp, last_modified_iso, full_path, hostname, extra"
+
+    NAME_INDEX = """
+        CREATE VIRTUAL TABLE file_names USING fts5 (file_name, content='files', content_rowid='rowid', tokenize='trigram');
+        CREATE TRIGGER file_names_insert AFTER INSERT ON files BEGIN
+            INSERT INTO file_names (rowid, file_name) VALUES (new.rowid, new.file_name);
+        END;
+        CREATE TRIGGER file_names_delete AFTER DELETE ON files BEGIN
+            INSERT INTO file_names (file_names, rowid, file_name) VALUES ('delete', old.rowid, old.file_name);
+        END;
+        CREATE TRIGGER file_names_update AFTER UPDATE OF file_name ON files WHEN old.file_name IS NOT new.file_name BEGIN
+            INSERT INTO file_names (file_names, rowid, file_name) VALUES ('delete', old.rowid, old.file_name);
+            INSERT INTO file_names (rowid, file_name) VALUES (new.rowid, new.file_name);
+        END;
+        INSERT INTO file_names (file_names) VALUES ('rebuild');
+    """
+
+    # Files and bytes directly in each directory, kept current by triggers; recursive
+    # totals are summed over the directories in a path range rather than over files
+    DIRECTORY_SIZES = """
+        CREATE TABLE directory_sizes (
+            directory TEXT PRIMARY KEY,
+            file_count INTEGER NOT NULL,
+            total_size INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE TRIGGER directory_sizes_insert AFTER INSERT ON files BEGIN
+            INSERT INTO directory_sizes VALUES (new.directory, 1, new.file_size_bytes)
+                ON CONFLICT (directory) DO UPDATE SET file_count = file_count + 1, total_size = total_size + excluded.total_size;
+        END;
+        CREATE TRIGGER directory_sizes_delete AFTER DELETE ON files BEGIN
+            UPDATE directory_sizes SET file_count = file_count - 1, total_size = total_size - old.file_size_bytes WHERE directory = old.directory;
+            DELETE FROM directory_sizes WHERE directory = old.directory AND file_count = 0;
+        END;
+        CREATE TRIGGER directory_sizes_update AFTER UPDATE OF file_size_bytes ON files
+            WHEN old.file_size_bytes != new.file_size_bytes BEGIN
+            UPDATE directory_sizes SET total_size = total_size + new.file_size_bytes - old.file_size_bytes WHERE directory = new.directory;
+        END;
+        INSERT INTO directory_sizes SELECT directory, COUNT(*), SUM(file_size_bytes) FROM files GROUP BY directory;
+    """
+
+    # Files and bytes per host and drive, kept current by triggers, so the totals the menus
+    # show (file count, bytes, hosts and drives) are read from a handful of rows
+    HOST_DRIVE_SIZES = """
+        CREATE TABLE host_drive_sizes (
+            hostname TEXT NOT NULL,
+            drive TEXT NOT NULL,
+            file_count INTEGER NOT NULL,
+            total_size INTEGER NOT NULL,
+            PRIMARY KEY (hostname, drive)
+        ) WITHOUT ROWID;
+        CREATE TRIGGER host_drive_sizes_insert AFTER INSERT ON files BEGIN
+            INSERT INTO host_drive_sizes VALUES (new.hostname, new.drive, 1, new.file_size_bytes)
+                ON CONFLICT (hostname, drive) DO UPDATE SET file_count = file_count + 1, total_size = total_size + excluded.total_size;
+        END;
+        CREATE TRIGGER host_drive_sizes_delete AFTER DELETE ON files BEGIN
+            UPDATE host_drive_sizes SET file_count = file_count - 1, total_size = total_size - old.file_size_bytes
+                WHERE hostname = old.hostname AND drive = old.drive;
+            DELETE FROM host_drive_sizes WHERE hostname = old.hostname AND drive = old.drive AND file_count = 0;
+        END;
+        CREATE TRIGGER host_drive_sizes_update AFTER UPDATE OF file_size_bytes, hostname ON files
+            WHEN old.file_size_bytes != new.file_size_bytes OR old.hostname != new.hostname BEGIN
+            UPDATE host_drive_sizes SET file_count = file_count - 1, total_size = total_size - old.file_size_bytes
+                WHERE hostname = old.hostname AND drive = old.drive;
+            DELETE FROM host_drive_sizes WHERE hostname = old.hostname AND drive = old.drive AND file_count = 0;
+            INSERT INTO host_drive_sizes VALUES (new.hostname, new.drive, 1, new.file_size_bytes)
+                ON CONFLICT (hostname, drive) DO UPDATE SET file_count = file_count + 1, total_size = total_size + excluded.total_size;
+        END;
+        INSERT INTO host_drive_sizes SELECT hostname, drive, COUNT(*), SUM(file_size_bytes) FROM files GROUP BY hostname, drive;
+    """
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.connection = None
+        self.name_index = False
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def load(self):
+        if self.connection is not None:
+            self.connection.close()
+        self.connection = sqlite3.connect(self.location(), check_same_thread=False)
+        # Used by find() for file name patterns; regexp() backs the REGEXP operator
+        self.connection.create_function("regexp", 2, lambda pattern, value: re.search(pattern, value) is not None, deterministic=True)
+        self.connection.create_function("name_glob", 2, lambda pattern, value: fnmatch.fnmatchcase(value.lower(), pattern.lower()),
+                                        deterministic=True)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                full_path TEXT PRIMARY KEY,
+                file_name TEXT NOT NULL,
+                file_extension TEXT NOT NULL,
+                file_size_bytes INTEGER NOT NULL,
+                last_modified_timestamp REAL NOT NULL,
+                last_modified_iso TEXT NOT NULL,
+                hostname TEXT NOT NULL,
+                directory TEXT NOT NULL,
+                drive TEXT NOT NULL,
+                extra TEXT
+            );
+            DROP INDEX IF EXISTS idx_files_hostname;
+            DROP INDEX IF EXISTS idx_files_extension;
+            CREATE INDEX IF NOT EXISTS idx_files_host_size ON files (hostname, file_size_bytes);
+            CREATE INDEX IF NOT EXISTS idx_files_extension_size ON files (file_extension COLLATE NOCASE, file_size_bytes);
+            CREATE INDEX IF NOT EXISTS idx_files_drive_size ON files (drive, file_size_bytes);
+            CREATE INDEX IF NOT EXISTS idx_files_size ON files (file_size_bytes);
+            CREATE INDEX IF NOT EXISTS idx_files_mtime ON files (last_modified_timestamp);
+            CREATE INDEX IF NOT EXISTS idx_files_directory ON files (directory);
+        """)
+        self.connection.commit()
+        for table, script in (("directory_sizes", self.DIRECTORY_SIZES), ("host_drive_sizes", self.HOST_DRIVE_SIZES)):
+            if not self.scalar("SELECT COUNT(*) FROM sqlite_master WHERE name = ?", (table,)):
+                # Filled from the files already stored, in a transaction of its own
+                self.connection.executescript("BEGIN;" + script + "COMMIT;")
+        self.name_index = self.create_name_index()
+        return self.records()
+
+    def create_name_index(self):
+        """Creates the trigram index of file names if it is missing; returns False if SQLite cannot provide one."""
+        if self.scalar("SELECT COUNT(*) FROM sqlite_master WHERE name = 'file_names'"):
+            return True
+        try:
+            # executescript commits first, so the index and its triggers are created in one transaction of their own
+            self.connection.executescript("BEGIN;" + self.NAME_INDEX + "COMMIT;")
+            return True
+        except sqlite3.OperationalError as e:
+            self.connection.rollback()
+            print(f"DEBUG: No trigram name index ({e}); name searches will scan every row.")
+            return False
+
+    def save(self):
+        self.connection.commit()
+
+    @staticmethod
+    def row_to_record(row):
+        record = dict(zip(RECORD_FIELDS, row[:7]))
+        if row[7]:
+            record.update(json.loads(row[7]))
+        return record
+
+    @staticmethod
+    def record_to_row(item):
+        extra = {key: value for key, value in item.items() if key not in RECORD_FIELDS}
+        full_path = item["full_path"]
+        return (
+            full_path, item["file_name"], item["file_extension"], item["file_size_bytes"],
+            item["last_modified_timestamp"], item["last_modified_iso"], item.get("hostname", "Unknown Host"),
+            os.path.dirname(full_path), record_drive(full_path), json.dumps(extra) if extra else None
+        )
+
+    def select(self, where="", params=(), suffix=""):
+        """Yields records from a SELECT over the files table."""
+        cursor = self.connection.execute(f"SELECT {self.COLUMNS} FROM files {where} {suffix}", params)
+        for row in cursor:
+            yield self.row_to_record(row)
+
+    def iter_records(self):
+        return self.select()
+
+    def records(self):
+        return SqliteRecords(self)
+
+    def upsert(self, records, scanned=False):
+        """Upserts records; with scanned=True their paths are also recorded in the scanned table (see replace_under)."""
+        sql = """
+            INSERT INTO files (full_path, file_name, file_extension, file_size_bytes, last_modified_timestamp,
+                               last_modified_iso, hostname, directory, drive, extra)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (full_path) DO UPDATE SET
+                file_name = excluded.file_name, file_extension = excluded.file_extension,
+                file_size_bytes = excluded.file_size_bytes, last_modified_timestamp = excluded.last_modified_timestamp,
+                last_modified_iso = excluded.last_modified_iso, hostname = excluded.hostname,
+                directory = excluded.directory, drive = excluded.drive, extra = excluded.extra
+            WHERE (files.file_name, files.file_extension, files.file_size_bytes, files.last_modified_timestamp,
+                   files.last_modified_iso, files.hostname, files.extra)
+               IS NOT (excluded.file_name, excluded.file_extension, excluded.file_size_bytes,
+                       excluded.last_modified_timestamp, excluded.last_modified_iso, excluded.hostname, excluded.extra)
+        """
+        # Unchanged rows are skipped by the WHERE clause, so they do not count as database changes
+        merged = 0
+        changes = 0
+        count_before = self.count()
+        batch = []
+        with self.connection:
+            for item in records:
+                batch.append(self.record_to_row(item))
+                if len(batch) >= UPSERT_BATCH_SIZE:
+                    changes += self.upsert_batch(sql, batch, scanned)
+                    merged += len(batch)
+                    batch = []
+            if batch:
+                changes += self.upsert_batch(sql, batch, scanned)
+                merged += len(batch)
+        counts = merge_counts()
+        counts[ADDED] = self.count() - count_before
+        counts[UPDATED] = changes - counts[ADDED]
+        counts[UNCHANGED] = merged - counts[ADDED] - counts[UPDATED]
+        return counts
+
+    def upsert_batch(self, sql, batch, scanned):
+        """Runs one batch of the upsert and returns how many rows it changed."""
+        # rowcount counts the rows the upsert itself changed, not the ones the index triggers wrote
+        changes = self.connection.executemany(sql, batch).rowcount
+        if scanned:
+            self.connection.executemany("INSERT OR IGNORE INTO scanned (full_path) VALUES (?)", [(row[0],) for row in batch])
+        return changes
+
+    def replace_under(self, root_dir, hostname, records, keep=(), admitted=None):
+        # The rescanned paths go into a temporary table, so stale rows are found with one range scan of the primary key
+        self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS scanned (full_path TEXT PRIMARY KEY)")
+        self.connection.execute("DELETE FROM scanned")
+        counts = self.upsert(records, scanned=True)
+        kept = keep_filter(keep)
+        stale = self.connection.execute("""
+            SELECT full_path, file_size_bytes FROM files
+            WHERE full_path >= ? AND full_path < ? AND hostname = ? AND full_path NOT IN (SELECT full_path FROM scanned)
+        """, path_prefix_range(root_dir) + (hostname,))
+        doomed = [(full_path,) for full_path, size in stale
+                  if not kept(full_path) and (admitted is None or admitted(full_path, size))]
+        with self.connection:
+            self.connection.executemany("DELETE FROM files WHERE full_path = ?", doomed)
+            self.connection.execute("DELETE FROM scanned")
+        counts[REMOVED] = len(doomed)
+        return counts
+
+    def delete(self, where, params=()):
+        with self.connection:
+            return self.connection.execute(f"DELETE FROM files {where}", params).rowcount
+
+    def remove_where(self, predicate):
+        doomed = [(item["full_path"],) for item in self.iter_records() if predicate(item)]
+        with self.connection:
+            self.connection.executemany("DELETE FROM files WHERE full_path = ?", doomed)
+        return len(doomed)
+
+    def replace(self, records):
+        self.delete("")
+        self.upsert(records)
+
+    def scalar(self, sql, params=()):
+        return self.connection.execute(sql, params).fetchone()[0]
+
+    def count(self):
+        return self.scalar("SELECT COALESCE(SUM(file_count), 0) FROM host_drive_sizes")
+
+    def total_size(self):
+        return self.scalar("SELECT COALESCE(SUM(total_size), 0) FROM host_drive_sizes")
+
+    def hostnames(self):
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT hostname FROM host_drive_sizes ORDER BY hostname")]
+
+    def drives(self):
+        if os.name != 'nt':
+            return []
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT drive FROM host_drive_sizes ORDER BY drive")]
+
+    def remove_host(self, hostname):
+        return self.delete("WHERE hostname = ?", (hostname,))
+
+    def remove_drive(self, drive):
+        return self.delete("WHERE drive = ?", (drive,))
+
+    def records_under(self, root_dir):
+        return list(self.select("WHERE full_path >= ? AND full_path < ?", path_prefix_range(root_dir)))
+
+    def search_by_name(self, term):
+        if self.name_index and len(term) >= 3:
+            # A quoted phrase matches the term as a substring, ignoring case
+            phrase = '"' + term.replace('"', '""') + '"'
+            return list(self.select("WHERE rowid IN (SELECT rowid FROM file_names WHERE file_names MATCH ?)", (phrase,),
+                                    "ORDER BY rowid"))
+        pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return list(self.select("WHERE file_name LIKE ? ESCAPE '\\'", (pattern,)))
+
+    def filter_by_extension(self, extension):
+        return list(self.select("WHERE file_extension = ? COLLATE NOCASE", (extension,)))
+
+    def largest_files(self, top_n, hostname=None, extension=None, directory=None):
+        conditions, params = [], []
+        if hostname is not None:
+            conditions.append("hostname = ?")
+            params.append(hostname)
+        if extension is not None:
+            conditions.append("file_extension = ? COLLATE NOCASE")
+            params.append(extension)
+        if directory is not None:
+            conditions.append("full_path >= ? AND full_path < ?")
+            params.extend(path_prefix_range(directory))
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        return list(self.select(where, params + [top_n], "ORDER BY file_size_bytes DESC LIMIT ?"))
+
+    def find(self, query, order=None, limit=None):
+        # Every predicate, the order and the limit become SQL, and SQLite reports the plan it picked
+        conditions, params = [], []
+        term = query.index_term()
+        if self.name_index and term is not None:
+            conditions.append("rowid IN (SELECT rowid FROM file_names WHERE file_names MATCH ?)")
+            params.append('"' + term.replace('"', '""') + '"')
+        if query.name is not None:
+            conditions.append("instr(lower(file_name), ?) > 0")
+            params.append(query.name.lower())
+        if query.glob is not None:
+            conditions.append("name_glob(?, file_name)")
+            params.append(query.glob)
+        if query.regex is not None:
+            conditions.append("file_name REGEXP ?")
+            params.append(query.regex)
+        if query.extension is not None:
+            conditions.append("file_extension = ? COLLATE NOCASE")
+            params.append(query.extension)
+        if query.hostname is not None:
+            conditions.append("hostname = ?")
+            params.append(query.hostname)
+        if query.prefix is not None:
+            conditions.append("full_path >= ? AND full_path < ?")
+            params.extend(path_prefix_range(query.prefix))
+        for column, operator, value in (("file_size_bytes", ">=", query.min_size), ("file_size_bytes", "<=", query.max_size),
+                                        ("last_modified_timestamp", ">=", query.modified_after),
+                                        ("last_modified_timestamp", "<", query.modified_before)):
+            if value is not None:
+                conditions.append(f"{column} {operator} ?")
+                params.append(value)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        suffix = ""
+        if order is not None:
+            field, descending = order
+            if field not in RECORD_FIELDS:
+                raise ValueError(f"Cannot sort by {field}")
+            suffix = f"ORDER BY {field} {'DESC' if descending else 'ASC'}"
+        if limit is not None:
+            suffix += " LIMIT ?"
+            params.append(limit)
+        details = self.connection.execute(f"EXPLAIN QUERY PLAN SELECT {self.COLUMNS} FROM files {where} {suffix}", params)
+        plan = "; ".join(row[-1] for row in details)
+        return plan, self.select(where, params, suffix)
+
+    def largest_files_by(self, top_n, group):
+        column = LARGEST_GROUPS[group]
+        rows = self.connection.execute(f"""
+            SELECT {column}, {self.COLUMNS} FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY {column} ORDER BY file_size_bytes DESC) AS size_rank FROM files
+            ) WHERE size_rank <= ? ORDER BY {column}, size_rank
+        """, (top_n,))
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row[0], []).append(self.row_to_record(row[1:]))
+        return grouped
+
+    def most_recent_file(self):
+        return next(self.select(suffix="ORDER BY last_modified_timestamp DESC LIMIT 1"), None)
+
+    def directory_totals(self):
+        rows = self.connection.execute("SELECT directory, file_count, total_size FROM directory_sizes")
+        return {directory: {"count": count, "size": size} for directory, count, size in rows}
+
+    def directory_total(self, directory):
+        count, size = self.connection.execute(
+            "SELECT SUM(file_count), SUM(total_size) FROM directory_sizes WHERE directory = ? OR (directory >= ? AND directory < ?)",
+            (directory, *path_prefix_range(directory))).fetchone()
+        return {"count": count or 0, "size": size or 0}
+
+    def subdirectory_totals(self, directory):
+        low, high = path_prefix_range(directory)
+        rows = self.connection.execute("SELECT directory, file_count, total_size FROM directory_sizes WHERE directory >= ? AND directory < ?", (low, high))
+        directory_groups = {}
+        for path, count, size in rows:
+            child = os.path.join(low, path[len(low):].split(os.sep, 1)[0])
+            merge_totals(directory_groups, {child: {"count": count, "size": size}})
+        return directory_groups
+
+    def host_drive_totals(self):
+        grouped_data = {}
+        rows = self.connection.execute("SELECT hostname, drive, file_count, total_size FROM host_drive_sizes")
+        for hostname, drive, count, size in rows:
+            grouped_data.setdefault(hostname, {})[drive] = {"count": count, "size": size}
+        return grouped_data
+
+def open_backend(output_file, read_only=False):
+    """Picks the storage backend from the output file's extension.
+
+    read_only opens a binary snapshot for sharing with a writer in another
+    process (see SharedSnapshotBackend); it is only supported for .inv files.
+    """
+    if read_only:
+        if not output_file.lower().endswith(SNAPSHOT_EXTENSIONS):
+            raise ValueError(f"Read-only sharing needs a binary snapshot ({', '.join(SNAPSHOT_EXTENSIONS)}), not {output_file}")
+        return SharedSnapshotBackend(output_file)
+    if output_file.lower().endswith(SQLITE_EXTENSIONS):
+        return SqliteBackend(output_file)
+    if output_file.lower().endswith(SNAPSHOT_EXTENSIONS):
+        return BinaryBackend(output_file)
+    if output_file.lower().rstrip("/\\").endswith(SHARDED_EXTENSIONS):
+        return ShardedBackend(output_file.rstrip("/\\"))
+    return JsonBackend(output_file)
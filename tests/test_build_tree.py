@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from build_tree import build_directory_tree
+from storage import open_backend
+
+class BuildTreeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.inventory = os.path.join(self.tmp.name, "inventory.inv")
+        backend = open_backend(self.inventory)
+        backend.load()
+        backend.upsert([{"file_name": name, "file_extension": ".txt", "file_size_bytes": size,
+                         "last_modified_timestamp": 0.0, "last_modified_iso": "1970-01-01T00:00:00",
+                         "full_path": os.path.join(os.sep, "data", *parts, name), "hostname": "host"}
+                        for parts, name, size in ((("a",), "1.txt", 10), (("a", "b"), "2.txt", 5), ((), "3.txt", 1))])
+        backend.save()
+        backend.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_tree_holds_directories_with_totals(self):
+        data = build_directory_tree(self.inventory)[os.sep]["children"]["data"]
+        self.assertEqual((data["count"], data["size"]), (3, 16))
+        self.assertEqual(list(data["children"]), ["a"])
+        a = data["children"]["a"]
+        self.assertEqual((a["count"], a["size"]), (2, 15))
+        self.assertEqual(list(a["children"]), ["b"])
+
+    def test_files_are_only_listed_on_request(self):
+        data = build_directory_tree(self.inventory, include_files=True)[os.sep]["children"]["data"]
+        self.assertEqual(sorted(data["children"]), ["3.txt", "a"])
+        self.assertEqual(data["children"]["3.txt"], {"size": 1})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import random
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from columnar import ColumnarInventory
+from snapshot import SnapshotView, write_snapshot
+
+def make_record(full_path, size):
+    name = os.path.basename(full_path)
+    return {"file_name": name, "file_extension": os.path.splitext(name)[1], "file_size_bytes": size,
+            "last_modified_timestamp": 1700000000.0, "last_modified_iso": "2023-11-14T22:13:20",
+            "full_path": full_path, "hostname": "host"}
+
+class CopyTest(unittest.TestCase):
+    def test_copy_is_independent_of_later_changes(self):
+        columns = ColumnarInventory([make_record(os.path.join(os.sep, "data", f"dir{i}", "file.txt"), i) for i in range(5)])
+        snapshot = columns.copy()
+        columns.upsert(make_record(os.path.join(os.sep, "data", "dir1", "file.txt"), 100))
+        columns.upsert(make_record(os.path.join(os.sep, "data", "new", "file.txt"), 7))
+        columns.delete_paths([os.path.join(os.sep, "data", "dir0", "file.txt")])
+
+        self.assertEqual(sorted((item["full_path"], item["file_size_bytes"]) for item in snapshot),
+                         [(os.path.join(os.sep, "data", f"dir{i}", "file.txt"), i) for i in range(5)])
+        self.assertEqual(len(columns), 5)
+
+    def test_copy_has_its_own_path_caches(self):
+        columns = ColumnarInventory([make_record(os.path.join(os.sep, "data", f"dir{i}", "file.txt"), i) for i in range(5)])
+        snapshot = columns.copy()
+        self.assertIsNot(snapshot.directories.paths, columns.directories.paths)
+        self.assertIsNot(snapshot.directories.ids, columns.directories.ids)
+        cached = list(columns.directories.paths.items())
+        list(snapshot)
+        snapshot.find(os.path.join(os.sep, "data", "dir3", "file.txt"))
+        self.assertEqual(list(columns.directories.paths.items()), cached)
+
+class DirectoryRowsTest(unittest.TestCase):
+    def test_rows_in_matches_a_scan_of_the_rows(self):
+        rng = random.Random(20)
+        columns = ColumnarInventory()
+        columns.directory_rows()
+        for step in range(3000):
+            path = os.path.join(os.sep, "data", f"dir{rng.randrange(8)}", f"file{rng.randrange(60)}.txt")
+            if rng.random() < 0.3:
+                columns.delete_paths([path])
+            else:
+                columns.upsert(make_record(path, rng.randrange(100)))
+            if step % 100 == 0:
+                wanted = set(rng.sample(range(len(columns.directories)), min(3, len(columns.directories))))
+                expected = sorted(row for row, dir_id in enumerate(columns.dir_ids) if dir_id in wanted)
+                self.assertEqual(sorted(columns.directory_rows().rows_in(wanted)), expected)
+
+class SnapshotViewTest(unittest.TestCase):
+    def test_header_answers_hosts_and_newest_file(self):
+        rng = random.Random(14)
+        columns = ColumnarInventory()
+        for i in range(200):
+            record = make_record(os.path.join(os.sep, "data", f"dir{i % 7}", f"file{i}.txt"), i)
+            record["hostname"] = f"host{i % 5}"
+            record["last_modified_timestamp"] = float(rng.randrange(50))
+            columns.append(record)
+        host3 = columns.hosts.get("host3")
+        columns.remove_rows(lambda row: columns.host_ids[row] == host3)
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot_file = os.path.join(tmp, "inventory.inv")
+            write_snapshot(columns, snapshot_file)
+            view = SnapshotView(snapshot_file)
+            try:
+                self.assertEqual(view.hostnames(), ["host0", "host1", "host2", "host4"])
+                self.assertEqual(view.hostnames(), columns.hostnames())
+                self.assertEqual(view.most_recent_row(), columns.most_recent_row())
+                self.assertIsNone(view.summary)
+            finally:
+                view.close()
+
+if __name__ == "__main__":
+    unittest.main()
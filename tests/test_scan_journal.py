@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scanner
+from scan_journal import ScanJournal
+
+class ScanJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "root")
+        for sub in ("sub", "later"):
+            os.makedirs(os.path.join(self.root, sub))
+            with open(os.path.join(self.root, sub, "file.txt"), "w") as f:
+                f.write(sub)
+        self.journal = ScanJournal(os.path.join(self.tmp.name, "journal.ndjson"))
+
+    def tearDown(self):
+        self.journal.close()
+        self.tmp.cleanup()
+
+    def test_resume_returns_errors_of_completed_directories(self):
+        sub = os.path.join(self.root, "sub")
+        list_directory = scanner.list_directory
+
+        def fail_on_sub(dir_path, *args):
+            if dir_path == sub:
+                raise PermissionError("Permission denied")
+            return list_directory(dir_path, *args)
+        self.journal.start(self.root, {})
+        read_directory = scanner.make_directory_reader("host", [], journal=self.journal)
+        with mock.patch.object(scanner, "list_directory", fail_on_sub):
+            read_directory(self.root)
+            read_directory(sub)
+        # Interrupted before "later" was listed
+        self.journal.close()
+
+        self.journal = ScanJournal(self.journal.journal_file)
+        header, pending, files, total_size, errors = self.journal.resume()
+        self.assertEqual(pending, [os.path.join(self.root, "later")])
+        self.assertEqual([error["file_path"] for error in errors], [sub])
+
+if __name__ == "__main__":
+    unittest.main()
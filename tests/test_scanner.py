@@ -0,0 +1,176 @@
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scanner
+from inventory import InventoryManager
+from scan_journal import ScanJournal
+from scan_filter import ScanFilter
+
+class ScanFailureTest(unittest.TestCase):
+    """A directory that could not be listed must never look empty to the merge."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "root")
+        self.sub = os.path.join(self.root, "sub")
+        os.makedirs(self.sub)
+        for path in (os.path.join(self.root, "a.txt"), os.path.join(self.sub, "b.txt"), os.path.join(self.sub, "c.txt")):
+            with open(path, "w") as f:
+                f.write(path)
+        with redirect_stdout(StringIO()):
+            self.manager = InventoryManager(os.path.join(self.tmp.name, "inventory.json"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def scan(self, engine):
+        """Scans the root with the engine and merges it; returns (merge counts, error log)."""
+        error_log = []
+        records = list(scanner.iter_scan(self.root, engine, 4, error_log))
+        keep = [error["file_path"] for error in error_log]
+        with redirect_stdout(StringIO()):
+            counts = self.manager.replace_scan(self.root, scanner.path_hostname(self.root), records, keep, save=False)
+        return counts, error_log
+
+    def paths(self):
+        return sorted(item["full_path"] for item in self.manager.inventory)
+
+    def failing_list_directory(self):
+        """Patches list_directory so that listing sub/ raises something other than OSError."""
+        list_directory = scanner.list_directory
+
+        def fail_on_sub(dir_path, *args):
+            if dir_path == self.sub:
+                raise ValueError("year 33658 is out of range")
+            return list_directory(dir_path, *args)
+        return mock.patch.object(scanner, "list_directory", fail_on_sub)
+
+    def check_engine_keeps_failed_directory(self, engine):
+        self.scan(engine)
+        before = self.paths()
+        self.assertEqual(len(before), 3)
+        with self.failing_list_directory():
+            counts, error_log = self.scan(engine)
+        self.assertEqual([error["file_path"] for error in error_log], [self.sub])
+        self.assertEqual(counts["removed"], 0)
+        self.assertEqual(self.paths(), before)
+
+    def test_walk_engine_keeps_failed_directory(self):
+        self.check_engine_keeps_failed_directory("walk")
+
+    def test_threads_engine_keeps_failed_directory(self):
+        self.check_engine_keeps_failed_directory("threads")
+
+    def test_async_engine_keeps_failed_directory(self):
+        self.check_engine_keeps_failed_directory("async")
+
+    def test_failed_traversal_removes_nothing(self):
+        self.scan("walk")
+        before = self.paths()
+
+        def broken_scan(*args):
+            yield from scanner.iter_scan(self.root)
+            raise RuntimeError("event loop died")
+        journal = ScanJournal(os.path.join(self.tmp.name, "journal.ndjson"))
+        journal.start(self.root, {})
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)  # error_log.json is written to the working directory
+        try:
+            with mock.patch.object(scanner, "iter_scan", broken_scan), redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+                files, total_size, error_log, complete = scanner.traverse_and_stream(self.root, journal)
+        finally:
+            os.chdir(cwd)
+            journal.close()
+        self.assertFalse(complete)
+        self.assertEqual([error["file_path"] for error in error_log], [self.root])
+        with redirect_stdout(StringIO()):
+            counts = self.manager.replace_scan(self.root, scanner.path_hostname(self.root), [self.manager.inventory[0]],
+                                               complete=complete)
+        self.assertEqual(counts["removed"], 0)
+        self.assertEqual(self.paths(), before)
+
+    def test_fingerprinting_only_reads_the_scanned_folder_of_its_host(self):
+        with open(os.path.join(self.sub, "copy.txt"), "w") as f:
+            f.write(os.path.join(self.sub, "c.txt"))
+        elsewhere = os.path.join(self.tmp.name, "elsewhere.txt")
+        with open(elsewhere, "w") as f:
+            f.write(os.path.join(self.sub, "c.txt"))
+        other_host = {"file_name": "elsewhere.txt", "file_extension": ".txt", "file_size_bytes": os.path.getsize(elsewhere),
+                      "last_modified_timestamp": 0.0, "last_modified_iso": "1970-01-01T00:00:00", "full_path": elsewhere,
+                      "hostname": "otherhost"}
+        with redirect_stdout(StringIO()):
+            self.manager.merge_inventory([other_host], save=False)
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)  # The scan writes its journal and caches to the working directory
+        try:
+            with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+                scanner.start_scan(self.root, self.manager, fingerprint=True)
+        finally:
+            os.chdir(cwd)
+        hashes = {item["full_path"]: item.get("content_hash") for item in self.manager.inventory}
+        self.assertIsNotNone(hashes[os.path.join(self.sub, "c.txt")])
+        self.assertEqual(hashes[os.path.join(self.sub, "c.txt")], hashes[os.path.join(self.sub, "copy.txt")])
+        self.assertIsNone(hashes[elsewhere])
+
+    def test_deleted_file_is_still_removed(self):
+        self.scan("async")
+        os.remove(os.path.join(self.sub, "c.txt"))
+        counts, error_log = self.scan("async")
+        self.assertEqual(error_log, [])
+        self.assertEqual(counts["removed"], 1)
+        self.assertEqual(len(self.paths()), 2)
+
+class FilteredRescanTest(unittest.TestCase):
+    """A filtered rescan only removes files its filter would have listed."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "root")
+        for relative in ("a/1.txt", "b/3.log", "b/4.iso", "b/deep/5.iso", "node_modules/6.iso"):
+            path = os.path.join(self.root, *relative.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(relative)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def scan(self, manager, scan_filter=None):
+        records = list(scanner.iter_scan(self.root, scan_filter=scan_filter))
+        with redirect_stdout(StringIO()):
+            return manager.replace_scan(self.root, scanner.path_hostname(self.root), records, save=False,
+                                        scan_filter=scan_filter)
+
+    def test_filtered_rescan_keeps_skipped_files(self):
+        for file_name in ("inventory.json", "inventory.inv", "inventory.db", "inventory.shards"):
+            with self.subTest(backend=file_name), redirect_stdout(StringIO()):
+                manager = InventoryManager(os.path.join(self.tmp.name, file_name))
+                manager.add_scan_root(self.root)
+                self.scan(manager, ScanFilter(exclude_dirs=[]))
+                self.assertEqual(len(manager.inventory), 5)
+
+                for scan_filter in (ScanFilter(extensions=[".iso"]), ScanFilter(include_globs=["*.log"]),
+                                    ScanFilter(min_size=100), ScanFilter(max_depth=1), ScanFilter()):
+                    counts = self.scan(manager, scan_filter)
+                    self.assertEqual(counts["removed"], 0, scan_filter.describe())
+                    self.assertEqual(len(manager.inventory), 5)
+
+                os.remove(os.path.join(self.root, "b", "4.iso"))
+                os.remove(os.path.join(self.root, "a", "1.txt"))
+                counts = self.scan(manager, ScanFilter(extensions=[".iso"]))
+                self.assertEqual(counts["removed"], 1)
+                self.assertEqual(len(manager.inventory), 4)
+                with open(os.path.join(self.root, "b", "4.iso"), "w") as f:
+                    f.write("b/4.iso")
+                with open(os.path.join(self.root, "a", "1.txt"), "w") as f:
+                    f.write("a/1.txt")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+import os
+import sys
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snapshot
+from storage import open_backend
+from snapshot import current_snapshot, generation_files, has_readers, read_generation
+
+BACKEND_FILES = ["inventory.json", "inventory.inv", "inventory.db", "inventory.shards"]
+
+def make_record(full_path, hostname, size):
+    name = os.path.basename(full_path)
+    return {"file_name": name, "file_extension": os.path.splitext(name)[1], "file_size_bytes": size,
+            "last_modified_timestamp": 1700000000.0, "last_modified_iso": "2023-11-14T22:13:20",
+            "full_path": full_path, "hostname": hostname}
+
+class BackendIdentityTest(unittest.TestCase):
+    """Every backend identifies a record by its full_path alone."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, "share")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open(self, file_name):
+        backend = open_backend(os.path.join(self.tmp.name, file_name))
+        backend.load()
+        backend.add_root(self.root)
+        return backend
+
+    def test_upsert_under_another_host_replaces_the_record(self):
+        for file_name in BACKEND_FILES:
+            with self.subTest(backend=file_name):
+                backend = self.open(file_name)
+                paths = [os.path.join(self.root, f"file{i}.txt") for i in range(3)]
+                backend.upsert([make_record(path, "alpha", 10) for path in paths])
+                counts = backend.upsert([make_record(path, "beta", 10) for path in paths[:2]]
+                                        + [make_record(os.path.join(self.root, "new.txt"), "beta", 5)])
+                self.assertEqual((counts["added"], counts["updated"], counts["unchanged"]), (1, 2, 0))
+                self.assertEqual(backend.count(), 4)
+                backend.save()
+                reopened = self.open(file_name)
+                hosts = {item["full_path"]: item["hostname"] for item in reopened.iter_records()}
+                self.assertEqual(hosts, {paths[0]: "beta", paths[1]: "beta", paths[2]: "alpha",
+                                         os.path.join(self.root, "new.txt"): "beta"})
+
+    def test_random_upserts_agree_across_backends(self):
+        rng = random.Random(16)
+        batches = [[make_record(os.path.join(self.root, f"dir{rng.randrange(3)}", f"file{rng.randrange(12)}.txt"),
+                                rng.choice(["alpha", "beta", "gamma"]), rng.randrange(4))
+                    for _ in range(rng.randrange(1, 10))] for _ in range(40)]
+        results = {}
+        for file_name in BACKEND_FILES:
+            backend = self.open(file_name)
+            totals = [backend.upsert(batch) for batch in batches]
+            results[file_name] = (totals, backend.count(), sorted((item["full_path"], item["hostname"], item["file_size_bytes"])
+                                                                  for item in backend.iter_records()))
+        for file_name in BACKEND_FILES[1:]:
+            self.assertEqual(results[file_name], results[BACKEND_FILES[0]], file_name)
+
+class CloseTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_close_keeps_a_short_change_log(self):
+        for file_name in BACKEND_FILES:
+            with self.subTest(backend=file_name):
+                path = os.path.join(self.tmp.name, file_name)
+                backend = open_backend(path)
+                backend.load()
+                backend.save()
+                backend.upsert([make_record(os.path.join(self.tmp.name, f"file{i}.txt"), "alpha", i) for i in range(3)])
+                backend.save()
+                backend.close()
+                if file_name in ("inventory.json", "inventory.inv"):
+                    self.assertTrue(os.path.exists(path + ".log"))
+                reopened = open_backend(path)
+                reopened.load()
+                self.assertEqual(reopened.count(), 3)
+                reopened.close()
+
+    def test_close_folds_a_change_log_past_the_threshold(self):
+        for file_name in ("inventory.json", "inventory.inv"):
+            with self.subTest(backend=file_name):
+                path = os.path.join(self.tmp.name, file_name)
+                backend = open_backend(path)
+                backend.compact_threshold = 5
+                backend.load()
+                backend.save()
+                backend.upsert([make_record(os.path.join(self.tmp.name, f"file{i}.txt"), "alpha", i) for i in range(5)])
+                backend.close()
+                self.assertFalse(os.path.exists(path + ".log"))
+                reopened = open_backend(path)
+                reopened.load()
+                self.assertEqual(reopened.count(), 5)
+                reopened.close()
+
+    def test_saving_a_new_empty_sharded_inventory(self):
+        path = os.path.join(self.tmp.name, "fresh.shards")
+        backend = open_backend(path)
+        backend.load()
+        backend.save()
+        self.assertTrue(os.path.exists(os.path.join(path, "manifest.json")))
+        counts = backend.replace_under(os.path.join(self.tmp.name, "share"), "alpha", [])
+        backend.save()
+        self.assertEqual(counts["removed"], 0)
+        reopened = open_backend(path)
+        reopened.load()
+        self.assertEqual(reopened.count(), 0)
+
+class SharedSnapshotTest(unittest.TestCase):
+    """A writer keeps publishing while a read-only reader maps the snapshot, even where that blocks a rename."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.snapshot_file = os.path.join(self.tmp.name, "inventory.inv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def locked_replace(self):
+        """Patches os.replace in snapshot.py to fail like Windows does for a file another process has mapped."""
+        replace = os.replace
+
+        def refuse_mapped(source, target):
+            if target == self.snapshot_file:
+                raise PermissionError(f"The process cannot access the file: {target}")
+            return replace(source, target)
+        return mock.patch.object(snapshot.os, "replace", refuse_mapped)
+
+    def publish(self, writer, path):
+        writer.upsert([make_record(path, "alpha", 1)])
+        writer.save()
+        writer.compact(wait=True)
+
+    def test_saves_publish_only_while_a_reader_is_registered(self):
+        writer = open_backend(self.snapshot_file)
+        writer.load()
+        self.publish(writer, os.path.join(self.tmp.name, "first.txt"))
+        generation = read_generation(self.snapshot_file)
+        writer.upsert([make_record(os.path.join(self.tmp.name, "second.txt"), "alpha", 1)])
+        writer.save()
+        writer.wait_for_compaction()
+        self.assertEqual(read_generation(self.snapshot_file), generation)
+        self.assertTrue(os.path.exists(self.snapshot_file + ".log"))
+
+        reader = open_backend(self.snapshot_file, read_only=True)
+        reader.load()
+        self.assertTrue(has_readers(self.snapshot_file))
+        writer.upsert([make_record(os.path.join(self.tmp.name, "third.txt"), "alpha", 1)])
+        writer.save()
+        writer.wait_for_compaction()
+        reader.refresh()
+        self.assertEqual(reader.count(), 3)
+        reader.close()
+        self.assertFalse(has_readers(self.snapshot_file))
+        writer.log.close()
+
+    def test_generation_is_published_under_its_own_name_while_mapped(self):
+        writer = open_backend(self.snapshot_file)
+        writer.load()
+        self.publish(writer, os.path.join(self.tmp.name, "first.txt"))
+        reader = open_backend(self.snapshot_file, read_only=True)
+        reader.load()
+        self.assertEqual(reader.count(), 1)
+
+        with self.locked_replace():
+            self.publish(writer, os.path.join(self.tmp.name, "second.txt"))
+        self.assertNotEqual(current_snapshot(self.snapshot_file), self.snapshot_file)
+        reader.refresh()
+        self.assertEqual(reader.count(), 2)
+
+        self.publish(writer, os.path.join(self.tmp.name, "third.txt"))
+        reader.refresh()
+        self.assertEqual(reader.count(), 3)
+        self.assertEqual(current_snapshot(self.snapshot_file), self.snapshot_file)
+        self.assertEqual(generation_files(self.snapshot_file), [])
+        reader.close()
+        writer.log.close()
+
+if __name__ == "__main__":
+    unittest.main()
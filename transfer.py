@@ -0,0 +1,168 @@
+# This is version Point2N Branch, developed by arrfour
+
+import os
+import csv
+import gzip
+import json
+import lzma
+
+from columnar import RECORD_FIELDS
+
+# Inventories are shipped between sites as newline-delimited JSON or CSV, optionally compressed.
+# The format is taken from the file name, e.g. site_a.ndjson.gz or site_b.csv.xz.
+COMPRESSORS = {".gz": gzip.open, ".xz": lzma.open, ".lzma": lzma.open}
+FORMATS = {".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv", ".json": "json"}
+
+# Records are written in chunks of this many lines, and JSON lists are decoded from reads of this many characters
+CHUNK_RECORDS = 10000
+CHUNK_CHARS = 1 << 20
+
+CSV_FIELDS = RECORD_FIELDS + ["extra"]
+
+def transfer_format(path):
+    """Returns (format, opener) for a transfer file name, or raises ValueError if the format is unknown."""
+    base, suffix = os.path.splitext(path.lower())
+    opener = COMPRESSORS.get(suffix)
+    if opener:
+        base, suffix = os.path.splitext(base)
+    if suffix not in FORMATS:
+        raise ValueError(f"Unknown inventory file format: {path} (expected .ndjson, .jsonl, .csv or .json, optionally .gz or .xz)")
+    return FORMATS[suffix], opener or open
+
+def open_text(path, mode, opener):
+    """Opens a plain or compressed file in text mode, leaving line endings to the csv module."""
+    if opener is gzip.open:
+        # The default level 9 costs a lot of time for very little over 6 on inventory data
+        return gzip.open(path, mode + "t", compresslevel=6, encoding="utf-8", newline="")
+    return opener(path, mode + "t", encoding="utf-8", newline="")
+
+def ndjson_lines(records):
+    for item in records:
+        yield json.dumps(item) + "\n"
+
+def json_list_lines(records):
+    yield "["
+    for i, item in enumerate(records):
+        yield ("," if i else "") + "\n" + json.dumps(item)
+    yield "\n]\n"
+
+def csv_rows(records):
+    """Flattens records into CSV rows; fields beyond RECORD_FIELDS go into a JSON "extra" column."""
+    for item in records:
+        row = [item.get(field, "") for field in RECORD_FIELDS]
+        extra = {key: value for key, value in item.items() if key not in RECORD_FIELDS}
+        row.append(json.dumps(extra) if extra else "")
+        yield row
+
+def chunked(iterable, size=CHUNK_RECORDS):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def write_records(records, path):
+    """Streams records to path in the format its name selects and returns how many were written.
+
+    Records are written CHUNK_RECORDS at a time, so memory stays bounded however
+    large the inventory is. The file is written under a temporary name and then
+    moved into place, so an interrupted export never leaves a truncated file.
+    """
+    file_format, opener = transfer_format(path)
+    temp_file = path + ".tmp"
+    written = 0
+    with open_text(temp_file, "w", opener) as f:
+        if file_format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            for chunk in chunked(csv_rows(records)):
+                writer.writerows(chunk)
+                written += len(chunk)
+        else:
+            lines = ndjson_lines(records) if file_format == "ndjson" else json_list_lines(records)
+            for chunk in chunked(lines):
+                f.writelines(chunk)
+                written += len(chunk)
+            if file_format == "json":
+                written -= 2  # The opening and closing brackets
+    os.replace(temp_file, path)
+    return written
+
+def read_ndjson(f):
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+def read_csv(f):
+    for row in csv.DictReader(f):
+        extra = row.pop("extra", None)
+        item = {field: row[field] for field in RECORD_FIELDS if field in row}
+        item["file_size_bytes"] = int(item["file_size_bytes"])
+        item["last_modified_timestamp"] = float(item["last_modified_timestamp"])
+        if extra:
+            item.update(json.loads(extra))
+        yield item
+
+def read_json_list(f):
+    """Decodes a JSON list of records one element at a time.
+
+    Only the record being decoded is held in memory, so the indented lists that
+    earlier versions wrote can be merged however large they are.
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(CHUNK_CHARS).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("A JSON inventory file must contain a list of records")
+    position = 1
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            # The record runs past the end of what has been read so far
+            chunk = f.read(CHUNK_CHARS)
+            if not chunk:
+                raise ValueError("The JSON inventory file is truncated or malformed")
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv, "json": read_json_list}
+
+def read_records(path):
+    """Streams the records of an inventory file in the format its name selects."""
+    file_format, opener = transfer_format(path)
+    with open_text(path, "r", opener) as f:
+        yield from READERS[file_format](f)
+
+if __name__ == "__main__":
+    import sys
+    from inventory import InventoryManager, format_merge_counts
+
+    # Ship an inventory from a remote site and merge it centrally:
+    #   python transfer.py export file_inventory.inv site_a.ndjson.gz
+    #   python transfer.py import file_inventory.inv site_a.ndjson.gz site_b.csv.xz
+    if len(sys.argv) < 4 or sys.argv[1] not in ("export", "import") or (sys.argv[1] == "export" and len(sys.argv) != 4):
+        print("Usage: python transfer.py export <inventory> <file>")
+        print("       python transfer.py import <inventory> <file> [<file> ...]")
+        print("Files may be .ndjson, .jsonl, .csv or .json, optionally compressed as .gz or .xz")
+        sys.exit(2)
+    command, inventory_file, files = sys.argv[1], sys.argv[2], sys.argv[3:]
+    manager = InventoryManager(inventory_file)
+    if command == "export":
+        written = manager.export_file(files[0])
+        print(f"Exported {written} records to {files[0]}")
+    else:
+        for path in files:
+            counts = manager.import_file(path, save=False)
+            if counts is None:
+                sys.exit(1)
+            print(f"{path}: {format_merge_counts(counts)}")
+        manager.save_inventory()
@@ -1,16 +1,87 @@
 # This is version Point2N Branch, developed by arrfour
 
 from utils import clear_screen, print_header, header_fg, text_fg, highlight_fg, paginate_output, human_readable_size, format_relative_time
-from inventory import InventoryManager
-from scanner import start_scan, discover_drives, discover_network_hosts
+from inventory import InventoryManager, format_merge_counts
+from scan_journal import ScanJournal
+from scan_filter import ScanFilter, load_target_filter, save_target_filter
+from fingerprint import find_duplicates
+from scanner import start_scan, scan_roots, resume_scan, discover_drives, discover_network_hosts, SCAN_ENGINES, DEFAULT_WORKERS
 import os
 from pathlib import Path
 from colorama import Style
 from datetime import datetime
 
+def edit_scan_settings(scan_settings):
+    """Prompts for the engine, worker count, incremental mode, fingerprinting and throttling used by subsequent scans."""
+    engine = input(highlight_fg + f"Scan engine ({'/'.join(SCAN_ENGINES)}) [{scan_settings['engine']}]: " + Style.RESET_ALL).strip().lower()
+    if engine:
+        if engine in SCAN_ENGINES:
+            scan_settings["engine"] = engine
+        else:
+            print(text_fg + "Unknown engine. Keeping the current one." + Style.RESET_ALL)
+    workers = input(highlight_fg + f"Workers (per-host listings for async) [{scan_settings['workers']}]: " + Style.RESET_ALL).strip()
+    if workers:
+        if workers.isdigit() and int(workers) > 0:
+            scan_settings["workers"] = int(workers)
+        else:
+            print(text_fg + "Invalid worker count. Keeping the current one." + Style.RESET_ALL)
+    incremental = input(highlight_fg + f"Incremental rescans (y/n) [{'y' if scan_settings['incremental'] else 'n'}]: " + Style.RESET_ALL).strip().lower()
+    if incremental in ("y", "n"):
+        scan_settings["incremental"] = incremental == "y"
+    fingerprint = input(highlight_fg + f"Fingerprint duplicate candidates (y/n) [{'y' if scan_settings['fingerprint'] else 'n'}]: " + Style.RESET_ALL).strip().lower()
+    if fingerprint in ("y", "n"):
+        scan_settings["fingerprint"] = fingerprint == "y"
+    scan_settings["latency_budget"] = prompt_number("Latency budget in ms per filesystem call (throttles the scan)", scan_settings["latency_budget"])
+
+def prompt_list(label, current):
+    """Prompts for a comma-separated list; blank keeps the current value and '-' clears it."""
+    value = input(highlight_fg + f"{label} (comma separated, '-' to clear) [{', '.join(current)}]: " + Style.RESET_ALL).strip()
+    if not value:
+        return current
+    if value == "-":
+        return []
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+def prompt_number(label, current):
+    """Prompts for an optional whole number; blank keeps the current value and '-' clears it."""
+    value = input(highlight_fg + f"{label} ('-' for no limit) [{'none' if current is None else current}]: " + Style.RESET_ALL).strip()
+    if not value:
+        return current
+    if value == "-":
+        return None
+    if value.isdigit():
+        return int(value)
+    print(text_fg + "Invalid number. Keeping the current value." + Style.RESET_ALL)
+    return current
+
+def edit_scan_filter():
+    """Edits the include/exclude filter saved for a scan target."""
+    target = input(highlight_fg + "Enter the scan target (folder or drive) to filter: " + Style.RESET_ALL).strip()
+    if not os.path.isdir(target):
+        print(text_fg + "Invalid path. Please try again." + Style.RESET_ALL)
+        return
+    scan_filter = load_target_filter(target) or ScanFilter()
+    print(text_fg + f"Current filter: {scan_filter.describe()}" + Style.RESET_ALL)
+    if input(highlight_fg + "Remove the filter for this target? (y/n): " + Style.RESET_ALL).strip().lower() == "y":
+        save_target_filter(target, None)
+        print(text_fg + "✔ Filter removed." + Style.RESET_ALL)
+        return
+    scan_filter = ScanFilter(
+        extensions=prompt_list("Extensions to include", scan_filter.extensions),
+        include_globs=prompt_list("File name globs to include", scan_filter.include_globs),
+        exclude_globs=prompt_list("File name globs to exclude", scan_filter.exclude_globs),
+        min_size=prompt_number("Minimum file size in bytes", scan_filter.min_size),
+        max_size=prompt_number("Maximum file size in bytes", scan_filter.max_size),
+        max_depth=prompt_number("Maximum directory depth", scan_filter.max_depth),
+        exclude_dirs=prompt_list("Directory names to skip", scan_filter.exclude_dirs)
+    )
+    save_target_filter(target, scan_filter)
+    print(text_fg + f"✔ Filter saved: {scan_filter.describe()}" + Style.RESET_ALL)
+
 def scan_menu(inventory_manager):
     """Displays the scan menu."""
     default_folder = Path.home() / "OneDrive" / "Documents"
+    scan_settings = {"engine": "walk", "workers": DEFAULT_WORKERS, "incremental": False, "fingerprint": False, "latency_budget": None}
 
     while True:
         clear_screen()
@@ -19,12 +90,18 @@ def scan_menu(inventory_manager):
         print(text_fg + "2. Discover and choose from available drives" + Style.RESET_ALL)
         print(text_fg + "3. Discover and choose from network hosts" + Style.RESET_ALL)
         print(text_fg + "4. Enter a custom path to scan" + Style.RESET_ALL)
+        print(text_fg + f"5. Scan settings (Engine: {scan_settings['engine']}, Workers: {scan_settings['workers']}, Incremental: {'on' if scan_settings['incremental'] else 'off'}, Fingerprint: {'on' if scan_settings['fingerprint'] else 'off'}, Latency budget: {scan_settings['latency_budget'] or 'off'})" + Style.RESET_ALL)
+        print(text_fg + "6. Scan multiple drives or paths at once" + Style.RESET_ALL)
+        interrupted = ScanJournal().read_header()
+        if interrupted:
+            print(text_fg + f"7. Resume last scan ({interrupted['root']}, started {interrupted['started'][:19]})" + Style.RESET_ALL)
+        print(text_fg + "8. Edit scan filters for a target" + Style.RESET_ALL)
         print(text_fg + "x. Back to Main Menu" + Style.RESET_ALL)
 
         choice = input(highlight_fg + "Enter your choice: " + Style.RESET_ALL).strip().lower()
 
         if choice == "1":
-            start_scan(str(default_folder), inventory_manager)
+            start_scan(str(default_folder), inventory_manager, **scan_settings)
         elif choice == "2":
             drives = discover_drives()
             if not drives:
@@ -36,7 +113,7 @@ def scan_menu(inventory_manager):
                 drive_choice = input(highlight_fg + "Select a drive to scan: " + Style.RESET_ALL).strip()
                 if drive_choice.isdigit() and 1 <= int(drive_choice) <= len(drives):
                     selected_drive = drives[int(drive_choice) - 1]
-                    start_scan(selected_drive, inventory_manager)
+                    start_scan(selected_drive, inventory_manager, **scan_settings)
                 else:
                     print(text_fg + "Invalid selection. Please try again." + Style.RESET_ALL)
         elif choice == "3":
@@ -57,9 +134,24 @@ def scan_menu(inventory_manager):
         elif choice == "4":
             custom_path = input(highlight_fg + "Enter the custom path to scan: " + Style.RESET_ALL).strip()
             if os.path.isdir(custom_path):
-                start_scan(custom_path, inventory_manager)
+                start_scan(custom_path, inventory_manager, **scan_settings)
             else:
                 print(text_fg + "Invalid path. Please try again." + Style.RESET_ALL)
+        elif choice == "5":
+            edit_scan_settings(scan_settings)
+        elif choice == "6":
+            paths = input(highlight_fg + "Enter paths separated by ';' (leave blank for all drives): " + Style.RESET_ALL).strip()
+            roots = [path.strip() for path in paths.split(";") if path.strip()] if paths else discover_drives()
+            invalid = [root for root in roots if not os.path.isdir(root)]
+            if not roots or invalid:
+                print(text_fg + f"Invalid path(s): {', '.join(invalid) or 'none given'}. Please try again." + Style.RESET_ALL)
+            else:
+                scan_roots(roots, inventory_manager, engine=scan_settings["engine"], workers=scan_settings["workers"],
+                           latency_budget=scan_settings["latency_budget"])
+        elif choice == "7" and interrupted:
+            resume_scan(inventory_manager)
+        elif choice == "8":
+            edit_scan_filter()
         elif choice == "x":
             break
         else:
@@ -76,14 +168,15 @@ def inventory_menu(inventory_manager):
         print(text_fg + "4. Display largest files" + Style.RESET_ALL)
         print(text_fg + "5. Group files by directory" + Style.RESET_ALL)
         print(text_fg + "6. Group files by hostname and drive" + Style.RESET_ALL)
+        print(text_fg + "7. Find duplicate files" + Style.RESET_ALL)
         print(text_fg + "x. Back to Main Menu" + Style.RESET_ALL)
 
         choice = input(highlight_fg + "Enter your choice: " + Style.RESET_ALL).strip().lower()
 
         if choice == "1":
             total_files, total_size = inventory_manager.get_summary_statistics()
-            total_hosts = len(set(item.get("hostname", "Unknown Host") for item in inventory_manager.inventory))
-            most_recent_file = max(inventory_manager.inventory, key=lambda x: x.get("last_modified_timestamp", 0), default=None)
+            total_hosts = len(inventory_manager.hostnames())
+            most_recent_file = inventory_manager.most_recent_file()
 
             if most_recent_file:
                 recent_file_name = most_recent_file["file_name"][:30] + ("..." if len(most_recent_file["file_name"]) > 30 else "")
@@ -110,47 +203,62 @@ def inventory_menu(inventory_manager):
             input(highlight_fg + "Press Enter to return to the menu..." + Style.RESET_ALL)
         elif choice == "2":
             search_term = input(highlight_fg + "Enter the file name or partial name to search: " + Style.RESET_ALL).strip()
-            results = [item for item in inventory_manager.inventory if search_term.lower() in item["file_name"].lower()]
+            results = inventory_manager.search_by_name(search_term)
             lines = [f"{item['file_name']} ({human_readable_size(item['file_size_bytes'])}) - {item['full_path']}" for item in results]
             paginate_output(lines)
         elif choice == "3":
             extension = input(highlight_fg + "Enter the file extension to filter by (e.g., .txt): " + Style.RESET_ALL).strip()
-            results = [item for item in inventory_manager.inventory if item["file_extension"].lower() == extension.lower()]
+            results = inventory_manager.filter_by_extension(extension)
             lines = [f"{item['file_name']} ({human_readable_size(item['file_size_bytes'])}) - {item['full_path']}" for item in results]
             paginate_output(lines)
         elif choice == "4":
             top_n = int(input(highlight_fg + "Enter the number of largest files to display: " + Style.RESET_ALL).strip())
-            sorted_files = sorted(inventory_manager.inventory, key=lambda x: x["file_size_bytes"], reverse=True)
-            lines = [f"{item['file_name']} ({human_readable_size(item['file_size_bytes'])}) - {item['full_path']}" for item in sorted_files[:top_n]]
+            scope = input(highlight_fg + "Show them overall (Enter), per host (h), per extension (e), per drive (d), or under a directory (its path): " + Style.RESET_ALL).strip()
+            group = {"h": "hostname", "e": "extension", "d": "drive"}.get(scope.lower())
+            if group:
+                lines = []
+                for value, largest in sorted(inventory_manager.largest_files_by(top_n, group).items()):
+                    lines.append(f"{value or '(none)'}:")
+                    lines.extend(f"  {item['file_name']} ({human_readable_size(item['file_size_bytes'])}) - {item['full_path']}" for item in largest)
+            else:
+                largest = inventory_manager.largest_files(top_n, directory=scope or None)
+                lines = [f"{item['file_name']} ({human_readable_size(item['file_size_bytes'])}) - {item['full_path']}" for item in largest]
             paginate_output(lines)
         elif choice == "5":
-            directory_groups = {}
-            for item in inventory_manager.inventory:
-                directory = os.path.dirname(item["full_path"])
-                if directory not in directory_groups:
-                    directory_groups[directory] = {"count": 0, "size": 0}
-                directory_groups[directory]["count"] += 1
-                directory_groups[directory]["size"] += item["file_size_bytes"]
-            lines = [f"{directory}: {stats['count']} file(s), {human_readable_size(stats['size'])}" for directory, stats in directory_groups.items()]
+            directory = input(highlight_fg + "Enter a directory to break down (Enter to list every directory): " + Style.RESET_ALL).strip()
+            if directory:
+                total = inventory_manager.directory_total(directory)
+                subdirectories = inventory_manager.subdirectory_totals(directory)
+                lines = [f"{directory}: {total['count']} file(s), {human_readable_size(total['size'])} in total"]
+                for subdirectory, stats in sorted(subdirectories.items(), key=lambda entry: entry[1]["size"], reverse=True):
+                    lines.append(f"  {subdirectory}: {stats['count']} file(s), {human_readable_size(stats['size'])}")
+                direct_count = total["count"] - sum(stats["count"] for stats in subdirectories.values())
+                direct_size = total["size"] - sum(stats["size"] for stats in subdirectories.values())
+                lines.append(f"  (files directly in it): {direct_count} file(s), {human_readable_size(direct_size)}")
+            else:
+                direct_totals = inventory_manager.directory_totals()
+                lines = []
+                for directory, stats in inventory_manager.recursive_directory_totals().items():
+                    direct = direct_totals.get(directory, {"count": 0, "size": 0})
+                    lines.append(f"{directory}: {direct['count']} file(s), {human_readable_size(direct['size'])} directly; "
+                                 f"{stats['count']} file(s), {human_readable_size(stats['size'])} in total")
             paginate_output(lines)
         elif choice == "6":
-            grouped_data = {}
-            for item in inventory_manager.inventory:
-                full_path = item.get("full_path", "")
-                drive = os.path.splitdrive(full_path)[0] if os.name == 'nt' else "/"
-                hostname = item.get("hostname", "Unknown Host")
-                if hostname not in grouped_data:
-                    grouped_data[hostname] = {}
-                if drive not in grouped_data[hostname]:
-                    grouped_data[hostname][drive] = {"count": 0, "size": 0}
-                grouped_data[hostname][drive]["count"] += 1
-                grouped_data[hostname][drive]["size"] += item.get("file_size_bytes", 0)
+            grouped_data = inventory_manager.host_drive_totals()
             lines = []
             for hostname, drives in grouped_data.items():
                 lines.append(f"Hostname: {hostname}")
                 for drive, stats in drives.items():
                     lines.append(f"  Drive: {drive} - {stats['count']} file(s), {human_readable_size(stats['size'])}")
             paginate_output(lines)
+        elif choice == "7":
+            lines = []
+            for group in find_duplicates(list(inventory_manager.inventory)):
+                lines.append(f"{len(group)} copies of {human_readable_size(group[0]['file_size_bytes'])}:")
+                lines.extend(f"  {item['full_path']}" for item in group)
+            if not lines:
+                lines = ["No duplicates found. Enable fingerprinting in the scan settings and rescan."]
+            paginate_output(lines)
         elif choice == "x":
             break
         else:
@@ -163,6 +271,8 @@ def inventory_management_menu(inventory_manager):
         print_header("Inventory Management Menu")
         print(text_fg + "1. Remove a drive or host" + Style.RESET_ALL)
         print(text_fg + "2. Reload inventory" + Style.RESET_ALL)
+        print(text_fg + "3. Import an inventory file (.json, .ndjson or .csv, optionally .gz/.xz)" + Style.RESET_ALL)
+        print(text_fg + "4. Export inventory to a file (.json, .ndjson or .csv, optionally .gz/.xz)" + Style.RESET_ALL)
         print(text_fg + "x. Back to Main Menu" + Style.RESET_ALL)
 
         choice = input(highlight_fg + "Enter your choice: " + Style.RESET_ALL).strip().lower()
@@ -172,6 +282,22 @@ def inventory_management_menu(inventory_manager):
         elif choice == "2":
             inventory_manager.load_inventory()
             print(text_fg + "✔ Inventory successfully reloaded." + Style.RESET_ALL)
+        elif choice == "3":
+            import_file = input(highlight_fg + "Enter the inventory file to import: " + Style.RESET_ALL).strip()
+            if os.path.isfile(import_file):
+                counts = inventory_manager.import_file(import_file)
+                if counts is not None:
+                    print(text_fg + f"✔ Imported {import_file}: {format_merge_counts(counts)}." + Style.RESET_ALL)
+            else:
+                print(text_fg + "Invalid file. Please try again." + Style.RESET_ALL)
+        elif choice == "4":
+            export_file = input(highlight_fg + "Enter the file to export to: " + Style.RESET_ALL).strip()
+            if export_file:
+                try:
+                    written = inventory_manager.export_file(export_file)
+                    print(text_fg + f"✔ Exported {written} records to {export_file}." + Style.RESET_ALL)
+                except ValueError as e:
+                    print(text_fg + f"{e}" + Style.RESET_ALL)
         elif choice == "x":
             break
         else:
@@ -179,16 +305,13 @@ def inventory_management_menu(inventory_manager):
 
 def remove_drive_or_host(inventory_manager):
     """Allows the user to remove a drive or an entire host's entries from the inventory."""
-    hosts = set(item["hostname"] for item in inventory_manager.inventory if "hostname" in item)
-    drives = set(os.path.splitdrive(item["full_path"])[0] for item in inventory_manager.inventory if os.name == 'nt')
-
     print(header_fg + "Available Hosts:" + Style.RESET_ALL)
-    hosts_list = list(hosts)
+    hosts_list = inventory_manager.hostnames()
     for i, host in enumerate(hosts_list, start=1):
         print(text_fg + f"  {i}. {host}" + Style.RESET_ALL)
 
     print(header_fg + "Available Drives:" + Style.RESET_ALL)
-    drives_list = list(drives)
+    drives_list = inventory_manager.drives()
     for i, drive in enumerate(drives_list, start=1):
         print(text_fg + f"  {i + len(hosts_list)}. {drive}" + Style.RESET_ALL)
 
@@ -197,13 +320,11 @@ def remove_drive_or_host(inventory_manager):
         choice = int(choice)
         if 1 <= choice <= len(hosts_list):
             selected_host = hosts_list[choice - 1]
-            inventory_manager.inventory = [item for item in inventory_manager.inventory if item["hostname"] != selected_host]
-            inventory_manager.save_inventory()
+            inventory_manager.remove_host(selected_host)
             print(text_fg + f"✔ Host {selected_host} and its files have been removed from the inventory." + Style.RESET_ALL)
         elif len(hosts_list) < choice <= len(hosts_list) + len(drives_list):
             selected_drive = drives_list[choice - len(hosts_list) - 1]
-            inventory_manager.inventory = [item for item in inventory_manager.inventory if not item["full_path"].startswith(selected_drive)]
-            inventory_manager.save_inventory()
+            inventory_manager.remove_drive(selected_drive)
             print(text_fg + f"✔ Drive {selected_drive} and its files have been removed from the inventory." + Style.RESET_ALL)
         else:
             print(text_fg + "Invalid selection. Please try again." + Style.RESET_ALL)
@@ -215,14 +336,16 @@ def display_main_menu(inventory_manager):
         clear_screen()
         total_files, total_size = inventory_manager.get_summary_statistics()
         print_header("Main Menu")
-        print(text_fg + f"Inventory: {total_files} files, {total_size}" + Style.RESET_ALL)
+        print(text_fg + f"Inventory: {total_files} files, {total_size}{' (read-only)' if inventory_manager.read_only else ''}" + Style.RESET_ALL)
         print(text_fg + "1. Scan for new files" + Style.RESET_ALL)
         print(text_fg + "2. View inventory" + Style.RESET_ALL)
         print(text_fg + "3. Manage inventory" + Style.RESET_ALL)
         print(text_fg + "x. Exit" + Style.RESET_ALL)
 
         choice = input(highlight_fg + "Enter your choice: " + Style.RESET_ALL).strip().lower()
-        if choice == "1":
+        if choice in ("1", "3") and inventory_manager.read_only:
+            print(text_fg + "The inventory is open read-only. Restart without --read-only to change it." + Style.RESET_ALL)
+        elif choice == "1":
             scan_menu(inventory_manager)
         elif choice == "2":
             inventory_menu(inventory_manager)